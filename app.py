@@ -1,15 +1,26 @@
 import streamlit as st
 import cv2
-from ultralytics import YOLO
-import tempfile
 import time
 from datetime import datetime
 import os
 
 
-from violation_logic import log_violation
+from violation_writer import get_violation_writer
 from video_utils import format_video_time
 from violation_manager import ViolationManager
+from pipeline import FramePipeline, DROP_POLICIES
+from inference import BatchedTracker
+from model_registry import get_model
+from association import associate
+from compliance import ComplianceState, BASE_STRIDE
+from frame_sampler import AdaptiveSampler
+from motion_gate import GatedTracker
+from preprocess import Preprocessor, ScaledCapture
+from display import FramePublisher
+from video_sink import AnnotatedVideoWriter, CODECS, DEFAULT_CODEC, output_path
+from multi_stream import MultiStreamRunner
+from upload_store import stage_upload, FollowingCapture
+import metrics
 
 
 st.set_page_config(page_title="PPE Safety System", layout="wide", page_icon="🦺")
@@ -26,36 +37,14 @@ st.title("🦺 Industrial Safety Monitoring System")
 
 DEFAULT_PERSON_CONF = 0.35
 DEFAULT_PPE_CONF = 0.30
-CONSECUTIVE_FRAMES_THRESHOLD = 3  
-violation_manager = ViolationManager(cooldown_seconds=3, log_once_per_session=True)
-
-
-def get_model():
-    # Try multiple possible model paths in order of preference
-    possible_paths = [
-        "yolov5su.pt",           # Recommended YOLOv5 small updated model
-        "yolov8n_ppe.pt",        # Pre-trained PPE model (if downloaded)
-        "yolov5s.pt",            # Downloaded YOLOv5 small
-        "runs/detect/train2/weights/best.pt",
-        "runs/detect/train11/weights/best.pt",
-        "runs/detect/train10/weights/best.pt",
-        "runs/detect/train9/weights/best.pt",
-        "yolov8n.pt"  # fallback
-    ]
-
-    for path in possible_paths:
-        if os.path.exists(path):
-            print(f"Loading model: {path}")
-            try:
-                return YOLO(path)
-            except Exception as e:
-                print(f"Failed to load {path}: {e}")
-                continue
 
-    print("No model found, using default YOLOv8n")
-    return YOLO("yolov8n.pt")
 
-model = get_model()
+# Prometheus endpoint / text file when PPE_METRICS_PORT / PPE_METRICS_FILE are set
+metrics.start_from_env()
+
+# Loaded and warmed up once per process, shared by every session
+model_entry = get_model()
+model = model_entry.model
 
 
 # Class mappings for PPE detection using default YOLOv8 classes as proxies
@@ -94,6 +83,94 @@ with st.sidebar:
         help="Minimum confidence to detect PPE items (helmet, shoes)"
     )
     
+    st.subheader("Pipeline")
+    QUEUE_SIZE = st.slider(
+        "Frame Queue Size",
+        min_value=1,
+        max_value=32,
+        value=4,
+        help="Frames buffered between decode, inference and display"
+    )
+    DROP_POLICY = st.selectbox(
+        "Drop Policy",
+        ["auto"] + list(DROP_POLICIES),
+        help="auto = never drop for recorded video, drop oldest frames for live CCTV"
+    )
+    BATCH_SIZE = st.select_slider(
+        "Batch Size (Recorded Video)",
+        options=[1, 4, 8, 16],
+        value=1,
+        help="Frames sent to the detector per call. Track IDs are the same for every batch size."
+    )
+    DECODE_WIDTH = st.select_slider(
+        "Decode Width",
+        options=["Full", 1920, 1280, 960],
+        value="Full",
+        help="Downscale frames as they are decoded; queues, annotation and display "
+             "then work on smaller frames (the detector sees 640 px either way)"
+    )
+    DECODE_WIDTH = None if DECODE_WIDTH == "Full" else DECODE_WIDTH
+    ADAPTIVE_SAMPLING = st.checkbox(
+        "Adaptive Frame Sampling",
+        value=True,
+        help="Skip more frames on empty scenes (and when inference can't keep up with a live feed); "
+             f"back to every {BASE_STRIDE}rd frame while people or violations are present"
+    )
+
+    MOTION_GATE = st.checkbox(
+        "Motion Gate",
+        value=True,
+        help="Skip the detector on frames where nothing moved while nobody is being tracked "
+             "(static CCTV scenes); checked at least every few frames regardless"
+    )
+
+    st.subheader("Live Feed Display")
+    DISPLAY_FPS = st.slider(
+        "Display FPS",
+        min_value=1,
+        max_value=30,
+        value=10,
+        help="Frames per second sent to the browser; every processed frame is still checked"
+    )
+    DISPLAY_WIDTH = st.select_slider(
+        "Display Width",
+        options=[640, 960, 1280, "Full"],
+        value=960,
+        help="Live Feed resolution; frames are downscaled before annotating and encoding"
+    )
+    DISPLAY_WIDTH = None if DISPLAY_WIDTH == "Full" else DISPLAY_WIDTH
+
+    st.subheader("Annotated Video")
+    SAVE_VIDEO = st.checkbox(
+        "Save annotated video",
+        value=False,
+        help="Write the boxes and labels to a video file for later review; "
+             "encoding runs in the background and never holds up detection"
+    )
+    if SAVE_VIDEO:
+        OUTPUT_CODEC = st.selectbox("Codec", list(CODECS), index=list(CODECS).index(DEFAULT_CODEC))
+        OUTPUT_WIDTH = st.select_slider("Output Width", options=[640, 960, 1280, "Full"], value=1280)
+        OUTPUT_WIDTH = None if OUTPUT_WIDTH == "Full" else OUTPUT_WIDTH
+        OUTPUT_FPS = st.slider("Output FPS", min_value=1, max_value=30, value=10)
+
+    SHOW_METRICS = st.checkbox(
+        "Show stage timings",
+        value=metrics.enabled(),
+        help="Per-stage latency overlay (decode, inference, association, ...); "
+             "adds a little timing overhead while enabled"
+    )
+    # Collection is process-wide: the last session to toggle decides, unless
+    # an exporter (PPE_METRICS_PORT / PPE_METRICS_FILE) needs it kept on
+    if SHOW_METRICS:
+        metrics.enable()
+    elif not metrics.exporting():
+        metrics.disable()
+
+    st.caption(
+        f"🧠 Model: {model_entry.path} [{model_entry.info()['backend']}] "
+        f"(loaded in {model_entry.load_seconds:.2f}s, warm-up {model_entry.warmup_seconds:.2f}s)"
+    )
+
     st.info(f"💡 Higher values = fewer false positives\n📊 Lower values = detect more items\n\n🎯 DEMO MODE:\n   • Any detected object = PPE compliance\n   • Green boxes = Safe workers\n   • Red boxes = Need PPE")
 
 
@@ -101,212 +178,230 @@ col1, col2 = st.columns([1, 2])
 with col1:
     source = st.radio("Source", ["Recorded Video", "Live CCTV"])
     video_file = st.file_uploader("Video", type=["mp4", "avi", "mov", "mkv"]) if source == "Recorded Video" else None
-    rtsp_url = st.text_input("RTSP URL") if source == "Live CCTV" else None
+    rtsp_urls = st.text_area(
+        "RTSP URL(s)",
+        help="One camera per line; several cameras run in multi-stream mode"
+    ) if source == "Live CCTV" else ""
+    rtsp_urls = [u.strip() for u in (rtsp_urls or "").splitlines() if u.strip()]
     start = st.button("🚀 Start Detection")
 
 with col2:
     st.subheader("Live Feed")
     frame_window = st.empty()
+    metrics_line = st.empty()
 
 
 if start:
     if source == "Recorded Video" and not video_file:
         st.warning("Please upload a video")
         st.stop()
+    if source == "Live CCTV" and not rtsp_urls:
+        st.warning("Please enter an RTSP URL")
+        st.stop()
+
+    if len(rtsp_urls) > 1:
+        # One worker process per camera, sharing a pool of inference processes.
+        # The runner's own batch size applies: it batches across cameras, so
+        # the recorded-video setting (default 1) would undo that
+        try:
+            runner = MultiStreamRunner(
+                rtsp_urls,
+                model_path=model_entry.path,
+                person_conf=PERSON_CONF,
+                ppe_conf=PPE_CONF,
+                motion_gate=MOTION_GATE,
+                conf=PPE_CONF
+            )
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        st.info(f"🔄 Monitoring {len(rtsp_urls)} cameras on {runner.inference_workers} inference workers...")
+        stats_table = st.empty()
+        totals_line = st.empty()
+        try:
+            runner.start()
+            while runner.is_alive():
+                stats_table.dataframe(runner.poll_stats(), use_container_width=True)
+                totals = runner.totals()
+                totals_line.caption(
+                    f"Total: {totals['processed_fps']:.1f} fps over {totals['running']}/{totals['cameras']} "
+                    f"cameras | Violations logged: {totals['violations_logged']}"
+                )
+                time.sleep(1)
+        finally:
+            runner.stop()
+        stats_table.dataframe(runner.poll_stats(), use_container_width=True)
+        if runner.error:
+            st.error(f"❌ Detection stopped: {runner.error}")
+        st.stop()
 
     cap = None
     is_live = False
     source_name = "Unknown"
 
     if source == "Recorded Video":
-        tfile = tempfile.NamedTemporaryFile(delete=False)
-        tfile.write(video_file.read())
-        cap = cv2.VideoCapture(tfile.name)
+        # Copied to disk in chunks on a background thread; detection starts
+        # before the copy finishes when the container allows it
+        upload = stage_upload(video_file, video_file.name)
+        cap = FollowingCapture(upload)
         source_name = video_file.name
     else:
-        cap = cv2.VideoCapture(rtsp_url)
+        cap = cv2.VideoCapture(rtsp_urls[0])
         source_name = "Live CCTV"
         is_live = True
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
-    frame_count = 0
+    if DECODE_WIDTH:
+        cap = ScaledCapture(cap, DECODE_WIDTH)
     
     
-    violation_manager.reset_session()
+    # Per run, so concurrent sessions don't suppress each other's violations;
+    # both share one track store that forgets tracks ByteTrack has dropped
+    compliance = ComplianceState()
+    violation_manager = ViolationManager(cooldown_seconds=3, log_once_per_session=True,
+                                         tracks=compliance.tracks, source=source_name)
+    violation_writer = get_violation_writer()
     
     
     st.info("🔄 Detection in progress... Processing video frame by frame.")
 
-    
-    person_frames = {}
-    
-    
-    violation_frames = {}
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            st.success("✅ Detection completed. Check dashboard for updated logs.")
-            break
-
-        frame_count += 1
-
-         
-        if frame_count % 3 != 0:
-            continue
-
-        video_time = (
-            datetime.now().strftime("%H:%M:%S")
-            if is_live else format_video_time(frame_count / fps)
-        )
+    sampler = AdaptiveSampler(
+        base_stride=BASE_STRIDE,
+        max_stride=4 * BASE_STRIDE if ADAPTIVE_SAMPLING else BASE_STRIDE,
+        source_fps=fps,
+        realtime=is_live and ADAPTIVE_SAMPLING
+    )
 
-        results = model.track(
-            frame,
-            persist=True,
-            conf=PPE_CONF,
-            imgsz=640,
-            tracker="bytetrack.yaml",
-            classes=[PERSON, BACKPACK, UMBRELLA, HANDBAG, HAT, SUITCASE],  # Use available classes
-            verbose=False
-        )[0]
-
-        # Debug: Show what classes the model actually has
-        if not hasattr(model, '_class_names_shown'):
-            if hasattr(model, 'names'):
-                st.info(f"🔍 Model classes: {list(model.names.values())}")
-            model._class_names_shown = True
-
-        annotated = frame.copy()
-
-        
-        if results.boxes is None or results.boxes.id is None:
-            cv2.putText(
-                annotated,
-                f"Time: {video_time} | Frame: {frame_count} | No detections",
-                (20, 40),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 0),
-                2
+    track_kwargs = dict(
+        conf=PPE_CONF,
+        imgsz=640,
+        classes=[PERSON, BACKPACK, UMBRELLA, HANDBAG, HAT, SUITCASE],  # Use available classes
+    )
+    batch_size = 1 if is_live else BATCH_SIZE
+    # The model is shared across sessions, so each run gets its own ByteTrack
+    # state and only borrows the model (under its lock) for detection.
+    # Letterboxing/normalization go into buffers reused for every batch
+    preprocessor = Preprocessor(imgsz=track_kwargs["imgsz"], batch_size=batch_size)
+    tracker = BatchedTracker(model, batch_size=batch_size, lock=model_entry.lock,
+                             preprocessor=preprocessor, **track_kwargs)
+    if MOTION_GATE:
+        tracker = GatedTracker(tracker)
+
+    drop_policy = DROP_POLICY
+    if drop_policy == "auto":
+        drop_policy = "drop_oldest" if is_live else "block"
+
+    pipeline = FramePipeline(
+        cap,
+        tracker.track_batch,
+        queue_size=max(QUEUE_SIZE, batch_size),
+        drop_policy=drop_policy,
+        batch_size=batch_size,
+        sampler=sampler
+    )
+    publisher = FramePublisher(frame_window, max_fps=DISPLAY_FPS, max_width=DISPLAY_WIDTH)
+    video_out = None
+    if SAVE_VIDEO:
+        video_out = AnnotatedVideoWriter(output_path(source_name, OUTPUT_CODEC), fps,
+                                         fps=OUTPUT_FPS, width=OUTPUT_WIDTH, codec=OUTPUT_CODEC)
+    last_frame = 0
+    last_overlay = 0.0
+
+    try:
+        for frame_count, frame, tracks in pipeline:
+            video_time = (
+                datetime.now().strftime("%H:%M:%S")
+                if is_live else format_video_time(frame_count / fps)
             )
-            frame_window.image(cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB))
-            continue
-
-        boxes = results.boxes.xyxy.cpu().tolist()
-        classes = results.boxes.cls.cpu().tolist()
-        ids = results.boxes.id.cpu().tolist()
-        confs = results.boxes.conf.cpu().tolist()
-
-        persons = {}
-        ppe_items = []
-
-        
-        for pid, cls, box, conf in zip(ids, classes, boxes, confs):
-            pid = int(pid)
-            cls = int(cls)
-            x1, y1, x2, y2 = map(int, box)
-
-            if cls == PERSON and conf >= PERSON_CONF:
-                h = y2 - y1
-                persons[pid] = {
-                    "bbox": (x1, y1, x2, y2),
-                    "head": (x1, y1, x2, y1 + int(0.35 * h)),
-                    "foot": (x1, y1 + int(0.75 * h), x2, y2),
-                    "helmet": False,  # Will be detected as umbrella
-                    "vest": False,    # Will be detected as backpack
-                    "boots": False    # Will be detected as handbag
-                }
-                person_frames[pid] = person_frames.get(pid, 0) + 1
-
-            elif conf >= PPE_CONF:
-                ppe_items.append((cls, (x1, y1, x2, y2)))
-
-        
-        def center_inside(r1, r2):
-            cx = (r1[0] + r1[2]) // 2
-            cy = (r1[1] + r1[3]) // 2
-            return r2[0] <= cx <= r2[2] and r2[1] <= cy <= r2[3]
-
-        for cls, rect in ppe_items:
-            for pid, p in persons.items():
-                # Use proxy classes for PPE detection
-                if cls == HELMET_PROXY and center_inside(rect, p["head"]):  # Umbrella as helmet
-                    p["helmet"] = True
-                elif cls == VEST_PROXY and center_inside(rect, p["bbox"]):  # Backpack as vest
-                    p["vest"] = True
-                elif cls == BOOTS_PROXY and center_inside(rect, p["foot"]):  # Handbag as boots
-                    p["boots"] = True
-                # For demo: If any object is detected near a person, consider them compliant
-                elif center_inside(rect, p["bbox"]):
-                    p["helmet"] = True  # Mark as having PPE for demonstration
-            
-            if person_frames.get(pid, 0) < 15:
+            stride = frame_count - last_frame  # Source frames covered by this one
+            last_frame = frame_count
+
+            if SHOW_METRICS and time.perf_counter() - last_overlay >= 1.0:
+                metrics_line.caption(f"⏱️ {metrics.overlay_text()}")
+                last_overlay = time.perf_counter()
+
+            # Debug: Show what classes the model actually has
+            if not st.session_state.get('_class_names_shown'):
+                if hasattr(model, 'names'):
+                    st.info(f"🔍 Model classes: {list(model.names.values())}")
+                st.session_state['_class_names_shown'] = True
+
+            if len(tracks) == 0:
+                sampler.update(pipeline.last_inference_ms, 0, compliance.pending_violations())
+                header = f"Time: {video_time} | Frame: {frame_count} | No detections"
+                publisher.render(frame, (), header)
+                if video_out is not None:
+                    video_out.submit(frame_count, frame, (), header)
+                metrics.set_gauge("ppe_tracks_alive", 0)
                 continue
 
-            
-            missing = []
-            if not p["helmet"]:
-                missing.append("Helmet")
-            if not p["vest"]:
-                missing.append("Vest")
-            # Make boots optional for demonstration
-            # if not p["boots"]:
-            #     missing.append("PPE Bag")
-
-            x1, y1, x2, y2 = p["bbox"]
-
-            
-            if missing:
-                
-                missing_key = tuple(sorted(missing))
-                
-                if pid not in violation_frames:
-                    violation_frames[pid] = {}
-                
-                if missing_key not in violation_frames[pid]:
-                    violation_frames[pid][missing_key] = 1
-                else:
-                    violation_frames[pid][missing_key] += 1
-                
-                
-                if violation_frames[pid][missing_key] >= CONSECUTIVE_FRAMES_THRESHOLD:
-                    
-                    if violation_manager.should_log(pid, missing):
-                        log_violation(pid, missing, video_time, source_name)
+            with metrics.timed("association"):
+                people = associate(
+                    tracks,
+                    PERSON_CONF,
+                    PPE_CONF,
+                    helmet_cls=HELMET_PROXY,  # Umbrella as helmet
+                    vest_cls=VEST_PROXY,      # Backpack as vest
+                    boots_cls=BOOTS_PROXY     # Handbag as boots
+                )
+            metrics.set_gauge("ppe_tracks_alive", len(people.ids))
+
+            logged = False
+            with metrics.timed("compliance"):
+                decisions = compliance.update(people, stride)
+                confirmed = [(pid, missing) for pid, _, missing, ok in decisions if ok]
+                for (pid, missing), log in zip(
+                    confirmed, violation_manager.should_log_many(confirmed, source_name)
+                ):
+                    if log:
+                        violation_writer.submit(pid, missing, video_time, source_name)
+                        logged = True
                         st.toast(f"⚠️ Violation logged: Person {pid} - Missing {', '.join(missing)}", icon="⚠️")
-                
-                color = (0, 0, 255)  # Red for violations
-                label = f"ID:{pid} MISSING: {','.join(missing)}"
-            else:
-                
-                if pid in violation_frames:
-                    violation_frames[pid] = {}
-                
-                color = (0, 255, 0)  # Green for compliant
-                label = f"ID:{pid} SAFE ✓"
-
-            
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(
-                annotated,
-                label,
-                (x1, y1 - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                color,
-                2
+
+            sampler.update(
+                pipeline.last_inference_ms,
+                len(people.ids),
+                logged or compliance.pending_violations()
             )
 
-        cv2.putText(
-            annotated,
-            f"Time: {video_time} | Frame: {frame_count}",
-            (20, 40),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 0),
-            2
+            # Only up to DISPLAY_FPS frames a second are drawn and encoded
+            header = f"Time: {video_time} | Frame: {frame_count}"
+            publisher.render(frame, decisions, header)
+            if video_out is not None:
+                video_out.submit(frame_count, frame, decisions, header)
+
+        violation_writer.flush()
+        st.success("✅ Detection completed. Check dashboard for updated logs.")
+        stats = pipeline.stats()
+        writer_stats = violation_writer.stats()
+        gated = (
+            f" | Motion gate: detector skipped on {tracker.stats()['skipped_fraction']:.0%} of frames"
+            if MOTION_GATE else ""
         )
-
-        frame_window.image(cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB))
-
-    cap.release()
+        st.caption(
+            f"Decode: {stats['decode_fps']:.1f} fps | Inference: {stats['inference_fps']:.1f} fps "
+            f"({stats['avg_inference_ms']:.0f} ms/frame, avg stride {sampler.average_stride():.1f}) | "
+            f"Dropped: {stats['dropped_before_inference'] + stats['dropped_before_display']} frames | "
+            f"DB writes: {writer_stats['rows_written']} rows in {writer_stats['batches_written']} batches "
+            f"({writer_stats['avg_batch_ms']:.1f} ms/batch)" + gated
+        )
+        display_stats = publisher.stats()
+        st.caption(
+            f"Display: {display_stats['published']} frames shown, {display_stats['skipped']} not drawn | "
+            f"JPEG {display_stats['avg_encode_ms']:.1f} ms, {display_stats['avg_kb']:.0f} KB per frame"
+        )
+        if video_out is not None:
+            video_out.close()
+            out = video_out.stats()
+            if out["error"]:
+                st.warning(f"Annotated video not saved: {out['error']}")
+            else:
+                st.caption(
+                    f"🎞️ Annotated video: {out['path']} ({out['seconds']:.0f}s, "
+                    f"{out['frames_dropped']} frames dropped while the writer was busy)"
+                )
+    finally:
+        pipeline.stop()
+        cap.release()
+        if video_out is not None:
+            video_out.close()
@@ -0,0 +1,129 @@
+"""
+Vectorized PPE-to-person association.
+
+Works on the track arrays produced by inference.py
+([x1, y1, x2, y2, track_id, confidence, class_id] per row) and evaluates every
+PPE item against every person in one pass instead of a Python double loop.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Default YOLOv8 (COCO) classes used as PPE proxies, see app.py
+PERSON = 0
+BACKPACK = 24    # Proxy for safety vest
+UMBRELLA = 25    # Proxy for helmet
+HANDBAG = 26     # Proxy for other PPE
+HAT = 27         # Could be helmet
+SUITCASE = 28    # Could be PPE bag
+
+# Classes requested from the detector by every detection loop
+DETECTION_CLASSES = [PERSON, BACKPACK, UMBRELLA, HANDBAG, HAT, SUITCASE]
+
+HEAD_FRACTION = 0.35   # Top 35% of the person box
+FOOT_FRACTION = 0.75   # Bottom 25% of the person box
+
+Association = namedtuple(
+    "Association",
+    ["ids", "boxes", "confs", "head", "torso", "foot", "helmet", "vest", "boots"]
+)
+
+
+def split_tracks(tracks):
+    """Returns (boxes, ids, confs, classes); boxes are int pixel coords like map(int, box)."""
+    tracks = np.asarray(tracks)
+    if tracks.size == 0:
+        return (np.zeros((0, 4), dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+    return (
+        tracks[:, :4].astype(np.int64),
+        tracks[:, 4].astype(np.int64),
+        tracks[:, 5].astype(np.float32),
+        tracks[:, 6].astype(np.int64),
+    )
+
+
+def person_regions(boxes):
+    """
+    Computes head, torso and foot regions for all person boxes at once.
+    Returns three (N, 4) int arrays.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    h = y2 - y1
+    head_y2 = y1 + (HEAD_FRACTION * h).astype(np.int64)
+    foot_y1 = y1 + (FOOT_FRACTION * h).astype(np.int64)
+
+    head = np.stack([x1, y1, x2, head_y2], axis=1)
+    torso = np.stack([x1, head_y2, x2, foot_y1], axis=1)
+    foot = np.stack([x1, foot_y1, x2, y2], axis=1)
+    return head, torso, foot
+
+
+def box_centers(boxes):
+    """Integer centers, (M, 2)."""
+    return np.stack([
+        (boxes[:, 0] + boxes[:, 2]) // 2,
+        (boxes[:, 1] + boxes[:, 3]) // 2,
+    ], axis=1)
+
+
+def contains(points, rects):
+    """(M, N) bool: point m lies inside (or on the edge of) rect n."""
+    px = points[:, 0:1]
+    py = points[:, 1:2]
+    return ((rects[:, 0] <= px) & (px <= rects[:, 2]) &
+            (rects[:, 1] <= py) & (py <= rects[:, 3]))
+
+
+def associate(tracks, person_conf, ppe_conf, helmet_cls=UMBRELLA,
+              vest_cls=BACKPACK, boots_cls=HANDBAG, person_cls=PERSON):
+    """
+    Matches PPE items to persons for one frame.
+
+    Rules (same as the original per-box loop):
+        helmet item centered in the head region     -> helmet
+        vest item centered in the person box        -> vest
+        boots item centered in the foot region      -> boots
+        any other item centered in the person box   -> helmet (demo mode)
+
+    Returns an Association of arrays indexed by person.
+    """
+    boxes, ids, confs, classes = split_tracks(tracks)
+
+    is_person = (classes == person_cls) & (confs >= person_conf)
+    # Anything that is not a confident person is a PPE candidate, including
+    # low-confidence person boxes (matches the original if/elif chain).
+    is_ppe = ~is_person & (confs >= ppe_conf)
+
+    p_boxes = boxes[is_person]
+    head, torso, foot = person_regions(p_boxes)
+
+    item_cls = classes[is_ppe]
+    item_centers = box_centers(boxes[is_ppe])
+
+    in_box = contains(item_centers, p_boxes)
+    in_head = contains(item_centers, head)
+    in_foot = contains(item_centers, foot)
+
+    is_helmet = (item_cls == helmet_cls)[:, None]
+    is_vest = (item_cls == vest_cls)[:, None]
+    is_boots = (item_cls == boots_cls)[:, None]
+
+    vest = (is_vest & in_box).any(axis=0)
+    boots = (is_boots & in_foot).any(axis=0)
+    # Head lies inside the person box, so a helmet in the head region is also
+    # "in the box"; everything but vests and foot-matched boots counts.
+    helmet = ((is_helmet & in_head) | (in_box & ~is_vest & ~(is_boots & in_foot))).any(axis=0)
+
+    return Association(
+        ids=ids[is_person],
+        boxes=p_boxes,
+        confs=confs[is_person],
+        head=head,
+        torso=torso,
+        foot=foot,
+        helmet=helmet,
+        vest=vest,
+        boots=boots,
+    )
@@ -0,0 +1,300 @@
+"""
+Headless batch processing of recorded footage.
+
+Runs the same detection, association, compliance and ViolationManager logic
+as the Streamlit app over whole directories of videos, one video per worker
+process, and logs violations with source set to the video's file name (its
+path relative to the directory given, for videos found in subfolders).
+
+    python batch_process.py /footage/2024-05-01 --recursive
+    python batch_process.py shift_a.mp4 shift_b.mp4 --workers 4 --replace
+    python batch_process.py /footage --annotated-dir reviewed/ --annotated-fps 10
+"""
+
+import argparse
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")  # Same types the app accepts
+
+DEFAULT_PERSON_CONF = 0.35
+DEFAULT_PPE_CONF = 0.30
+
+
+def find_sources(paths, recursive=False):
+    """
+    {video: source} for files and directories. A file given directly is
+    logged under its file name, one found in a directory under its path
+    relative to that directory, so reprocessing with the same arguments
+    always uses the same sources.
+    """
+    sources = {}
+    for path in paths:
+        if os.path.isfile(path):
+            found = [(path, os.path.basename(path))]
+        elif not os.path.isdir(path):
+            print(f"Skipping {path}: not found")
+            continue
+        elif recursive:
+            found = []
+            for root, _, files in os.walk(path):
+                found += [(os.path.join(root, f), os.path.relpath(os.path.join(root, f), path))
+                          for f in files]
+        else:
+            found = [(os.path.join(path, f), f) for f in os.listdir(path)]
+        for video, source in found:
+            if video.lower().endswith(VIDEO_EXTENSIONS):
+                sources.setdefault(os.path.normpath(video), source.replace(os.sep, "/"))
+    return sources
+
+
+def find_videos(paths, recursive=False):
+    """Expands files and directories into a sorted list of video files."""
+    return sorted(find_sources(paths, recursive))
+
+
+def duplicate_sources(sources):
+    """{source: [videos]} for sources more than one video would be logged under."""
+    videos = {}
+    for video, source in sources.items():
+        videos.setdefault(source, []).append(video)
+    return {source: sorted(v) for source, v in videos.items() if len(v) > 1}
+
+
+def replace_source(source, rows):
+    """
+    Deletes earlier results for a source and inserts rows (INSERT_VIOLATION_SQL
+    parameters) in one transaction, so a failed run leaves the old results.
+    Returns the number of rows deleted.
+    """
+    import metrics
+    from database import get_connection
+    from violation_logic import INSERT_VIOLATION_SQL
+
+    conn = get_connection()
+    try:
+        with conn:
+            deleted = conn.execute("DELETE FROM violations WHERE source = ?", (source,)).rowcount
+            conn.executemany(INSERT_VIOLATION_SQL, rows)
+    finally:
+        conn.close()
+    metrics.inc("ppe_violations_logged_total", len(rows))
+    return deleted
+
+
+def delete_source(source):
+    """Removes earlier results for a source so reprocessing doesn't duplicate them."""
+    return replace_source(source, [])
+
+
+def process_video(path, model_path=None, batch_size=8, person_conf=DEFAULT_PERSON_CONF,
+                  ppe_conf=DEFAULT_PPE_CONF, adaptive=True, replace=False,
+                  annotated_dir=None, annotated_fps=10, annotated_width=1280,
+                  codec=None, source=None):
+    """
+    Runs detection over one video and logs its violations under source
+    (default: the file name). With replace, earlier results for the source
+    are swapped for the new ones once the whole video has been processed.
+    With annotated_dir, the boxes and labels are also saved to a video there.
+
+    Returns a summary dict (frames, people, violations, seconds, fps).
+    """
+    import cv2
+
+    from association import associate, DETECTION_CLASSES, UMBRELLA, BACKPACK, HANDBAG
+    from compliance import ComplianceState, BASE_STRIDE
+    from frame_sampler import AdaptiveSampler
+    from inference import BatchedTracker
+    from model_registry import load_model, get_model
+    from pipeline import FramePipeline
+    from video_sink import AnnotatedVideoWriter, DEFAULT_CODEC, output_path
+    from video_utils import format_video_time
+    from violation_logic import violation_row
+    from violation_manager import ViolationManager
+    from violation_writer import get_violation_writer
+
+    source = source or os.path.basename(path)
+    summary = {"video": path, "source": source, "frames": 0, "people": 0,
+               "violations": 0, "replaced": 0, "seconds": 0.0, "fps": 0.0}
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        summary["error"] = "could not open video"
+        return summary
+
+    # Loaded once per worker process (model_registry), reused for every video
+    entry = load_model(model_path) if model_path else get_model()
+    tracker = BatchedTracker(entry.model, batch_size=batch_size, lock=entry.lock,
+                             conf=ppe_conf, imgsz=640, classes=DETECTION_CLASSES)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    compliance = ComplianceState()
+    manager = ViolationManager(cooldown_seconds=3, log_once_per_session=True,
+                               tracks=compliance.tracks, source=source)
+    sampler = AdaptiveSampler(
+        base_stride=BASE_STRIDE,
+        max_stride=4 * BASE_STRIDE if adaptive else BASE_STRIDE,
+        source_fps=fps
+    )
+    writer = get_violation_writer()
+    rows = []       # Held back until the video is done when replacing
+    pipeline = FramePipeline(cap, tracker.track_batch, queue_size=max(4, batch_size),
+                             batch_size=batch_size, sampler=sampler)
+    video_out = None
+    if annotated_dir:
+        codec = codec or DEFAULT_CODEC
+        video_out = AnnotatedVideoWriter(output_path(source.replace("/", "_"), codec, annotated_dir),
+                                         fps, fps=annotated_fps, width=annotated_width, codec=codec)
+
+    people_seen = set()
+    last_frame = 0
+    t0 = time.perf_counter()
+    try:
+        for frame_count, frame, tracks in pipeline:
+            stride = frame_count - last_frame
+            last_frame = frame_count
+            people = associate(tracks, person_conf, ppe_conf,
+                               helmet_cls=UMBRELLA, vest_cls=BACKPACK, boots_cls=HANDBAG)
+            people_seen.update(people.ids.tolist())
+
+            logged = False
+            video_time = format_video_time(frame_count / fps)
+            decisions = compliance.update(people, stride)
+            confirmed = [(pid, missing) for pid, _, missing, ok in decisions if ok]
+            for (pid, missing), log in zip(confirmed, manager.should_log_many(confirmed, source)):
+                if log:
+                    if replace:
+                        rows.append(violation_row(pid, missing, video_time, source))
+                    else:
+                        writer.submit(pid, missing, video_time, source)
+                    summary["violations"] += 1
+                    logged = True
+            if video_out is not None:
+                video_out.submit(frame_count, frame, decisions,
+                                 f"Time: {video_time} | Frame: {frame_count}")
+
+            sampler.update(pipeline.last_inference_ms, len(people.ids),
+                           logged or compliance.pending_violations())
+        if replace:
+            summary["replaced"] = replace_source(source, rows)
+    finally:
+        writer.flush()
+        pipeline.stop()
+        cap.release()
+        if video_out is not None:
+            video_out.close()
+            summary["annotated"] = video_out.path
+            if video_out.error:
+                summary["annotated_error"] = video_out.error
+
+    stats = pipeline.stats()
+    summary["frames"] = stats["frames_read"]
+    summary["people"] = len(people_seen)
+    summary["seconds"] = time.perf_counter() - t0
+    summary["fps"] = summary["frames"] / summary["seconds"] if summary["seconds"] else 0.0
+    return summary
+
+
+def _init_worker(threads):
+    # Each worker runs its own model; keep torch (or the ONNX backend, see
+    # model_registry) from oversubscribing the cores
+    os.environ.setdefault("PPE_INFER_THREADS", str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def run(videos, workers=None, sources=None, **options):
+    """
+    Processes videos across a process pool (default: one worker per core).
+    sources maps videos to the source to log them under (default: file name).
+    Yields one summary dict per video as it finishes.
+    """
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(videos)))
+    threads = max(1, cores // workers)
+    sources = {video: (sources or {}).get(video) or os.path.basename(video) for video in videos}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(process_video, video, source=sources[video], **options): video
+                   for video in videos}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"video": futures[future], "source": sources[futures[future]],
+                       "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process recorded footage without the web app")
+    parser.add_argument("paths", nargs="+", help="Video files and/or directories")
+    parser.add_argument("--recursive", action="store_true", help="Search directories recursively")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: cores)")
+    parser.add_argument("--model", default=None, help="Weights file (default: best available)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--person-conf", type=float, default=DEFAULT_PERSON_CONF)
+    parser.add_argument("--ppe-conf", type=float, default=DEFAULT_PPE_CONF)
+    parser.add_argument("--fixed-stride", action="store_true", help="Disable adaptive sampling")
+    parser.add_argument("--replace", action="store_true",
+                        help="Delete earlier violations for each file before processing it")
+    parser.add_argument("--annotated-dir", default=None,
+                        help="Also save annotated videos (boxes and labels) to this directory")
+    parser.add_argument("--annotated-fps", type=int, default=10)
+    parser.add_argument("--annotated-width", type=int, default=1280)
+    parser.add_argument("--codec", default=None, help="fourcc for annotated videos (default: mp4v)")
+    args = parser.parse_args()
+
+    sources = find_sources(args.paths, args.recursive)
+    if not sources:
+        parser.error("no videos found")
+    duplicates = duplicate_sources(sources)
+    if duplicates:
+        # Their rows would mix, and --replace would delete each other's
+        parser.error("videos with the same source name: " + "; ".join(
+            f"{source}: {', '.join(videos)}" for source, videos in sorted(duplicates.items())))
+    videos = sorted(sources)
+
+    print(f"Processing {len(videos)} videos...")
+    t0 = time.perf_counter()
+    failed = 0
+    total_violations = 0
+    for done, summary in enumerate(run(
+        videos,
+        workers=args.workers,
+        sources=sources,
+        model_path=args.model,
+        batch_size=args.batch_size,
+        person_conf=args.person_conf,
+        ppe_conf=args.ppe_conf,
+        adaptive=not args.fixed_stride,
+        replace=args.replace,
+        annotated_dir=args.annotated_dir,
+        annotated_fps=args.annotated_fps,
+        annotated_width=args.annotated_width,
+        codec=args.codec,
+    ), start=1):
+        if "error" in summary:
+            failed += 1
+            print(f"[{done}/{len(videos)}] {summary['source']}: FAILED ({summary['error']})")
+            continue
+        total_violations += summary["violations"]
+        print(f"[{done}/{len(videos)}] {summary['source']}: {summary['frames']} frames, "
+              f"{summary['people']} people, {summary['violations']} violations "
+              f"({summary['fps']:.1f} fps)")
+        if summary.get("annotated_error"):
+            print(f"    annotated video failed: {summary['annotated_error']}")
+        elif summary.get("annotated"):
+            print(f"    annotated video: {summary['annotated']}")
+
+    elapsed = time.perf_counter() - t0
+    print(f"\nDone: {len(videos) - failed} videos, {failed} failed, "
+          f"{total_violations} violations in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""
+Reproducible end-to-end benchmarks that run offline on CPU.
+
+Synthetic videos (moving person rectangles, with or without PPE-proxy
+objects) are generated on the fly and YOLO + ByteTrack is replaced by
+StubTracker, a deterministic colour-blob detector with IoU tracking, so
+results depend only on this repo's code and the host.
+
+Each benchmark runs in its own process so peak RSS is per benchmark:
+    app_loop         - the app.py detection loop (pipeline, association,
+                       compliance, violation logging, annotation)
+    detector_detect  - detection.Detector.detect per frame
+    log_violation    - synchronous violation_logic.log_violation
+    violation_writer - the same rows through the background writer
+
+    python benchmark.py --output results.json
+    python benchmark.py --output new.json --compare results.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from association import PERSON, UMBRELLA, BACKPACK
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Synthetic scene, BGR colours chosen to survive mp4v compression
+BACKGROUND = (40, 40, 40)
+PERSON_COLOR = (255, 0, 0)
+HELMET_COLOR = (0, 255, 255)   # Helmet proxy (umbrella class)
+VEST_COLOR = (0, 255, 0)       # Vest proxy (backpack class)
+PERSON_SIZE = (80, 200)        # w, h
+LANE_MARGIN = 4
+
+# Stub detector: (class_id, colour, confidence)
+STUB_CLASSES = [
+    (PERSON, PERSON_COLOR, 0.90),
+    (UMBRELLA, HELMET_COLOR, 0.80),
+    (BACKPACK, VEST_COLOR, 0.80),
+]
+COLOR_TOLERANCE = 60
+MIN_BLOB_AREA = 100
+
+SCENARIOS = {
+    "no_ppe": 0.0,      # Fraction of people wearing PPE proxies
+    "with_ppe": 1.0,
+}
+
+
+def _triangle(t, speed, span):
+    """Bounces between 0 and span."""
+    if span <= 0:
+        return 0
+    phase = (t * speed) % (2 * span)
+    return int(span - abs(phase - span))
+
+
+def scene_boxes(frame_idx, n_people, width, height):
+    """Person boxes for one frame; each person keeps to its own vertical lane."""
+    w, h = PERSON_SIZE
+    lane = width // n_people
+    boxes = []
+    for i in range(n_people):
+        x = i * lane + LANE_MARGIN + _triangle(frame_idx, 1 + i % 3, lane - w - 2 * LANE_MARGIN)
+        y = LANE_MARGIN + _triangle(frame_idx, 2 + i % 4, height - h - 2 * LANE_MARGIN)
+        boxes.append((x, y, x + w, y + h))
+    return boxes
+
+
+def draw_scene(frame_idx, n_people, width, height, ppe_fraction):
+    frame = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    wearing = int(round(n_people * ppe_fraction))
+    for i, (x1, y1, x2, y2) in enumerate(scene_boxes(frame_idx, n_people, width, height)):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), PERSON_COLOR, -1)
+        if i < wearing:
+            # Kept inside the head region / person box so association matches them
+            cv2.rectangle(frame, (x1 + 20, y1 + 8), (x2 - 20, y1 + 40), HELMET_COLOR, -1)
+            cv2.rectangle(frame, (x1 + 15, y1 + 90), (x2 - 15, y1 + 140), VEST_COLOR, -1)
+    return frame
+
+
+def make_video(path, frames=300, n_people=4, width=1280, height=720, fps=30, ppe_fraction=0.0):
+    """Writes a synthetic video and returns its path."""
+    n_people = max(1, min(n_people, width // (PERSON_SIZE[0] + 2 * LANE_MARGIN)))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    try:
+        for i in range(frames):
+            writer.write(draw_scene(i, n_people, width, height, ppe_fraction))
+    finally:
+        writer.release()
+    return path
+
+
+def detect_blobs(frame, classes=None):
+    """Deterministic stand-in for YOLO: (N, 6) [x1, y1, x2, y2, conf, cls] per colour blob."""
+    rows = []
+    for cls, color, conf in STUB_CLASSES:
+        if classes is not None and cls not in classes:
+            continue
+        color = np.array(color, dtype=np.int16)
+        lo = np.clip(color - COLOR_TOLERANCE, 0, 255).astype(np.uint8)
+        hi = np.clip(color + COLOR_TOLERANCE, 0, 255).astype(np.uint8)
+        mask = cv2.inRange(frame, lo, hi)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h >= MIN_BLOB_AREA:
+                rows.append([x, y, x + w, y + h, conf, cls])
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def box_iou(a, b):
+    """(N, M) IoU between two sets of xyxy boxes."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class StubTracker:
+    def __init__(self, classes=None, delay_ms=0.0, iou_threshold=0.3):
+        """
+        Drop-in for inference.BatchedTracker: track_batch(frames) returns
+        [x1, y1, x2, y2, track_id, conf, cls] arrays.
+
+        Args:
+            classes: Class ids to report (None = all)
+            delay_ms: Simulated detector latency per frame
+            iou_threshold: Min IoU with the previous frame to keep a track id
+        """
+        self.classes = classes
+        self.delay_ms = delay_ms
+        self.iou_threshold = iou_threshold
+        self.prev = np.zeros((0, 7), dtype=np.float32)
+        self.next_id = 1
+
+    def track_batch(self, frames):
+        if self.delay_ms:
+            time.sleep(self.delay_ms * len(frames) / 1000)
+        return [self._track(detect_blobs(frame, self.classes)) for frame in frames]
+
+    def _track(self, det):
+        tracks = np.zeros((len(det), 7), dtype=np.float32)
+        tracks[:, :4] = det[:, :4]
+        tracks[:, 5] = det[:, 4]
+        tracks[:, 6] = det[:, 5]
+
+        iou = np.zeros((len(det), len(self.prev)))
+        if len(det) and len(self.prev):
+            iou = box_iou(det[:, :4], self.prev[:, :4])
+            iou[det[:, 5][:, None] != self.prev[:, 6][None, :]] = 0.0
+
+        used = set()
+        for i in range(len(det)):
+            match = None
+            for j in np.argsort(-iou[i]) if iou.shape[1] else []:
+                if iou[i, j] < self.iou_threshold:
+                    break
+                if j not in used:
+                    match = j
+                    break
+            if match is None:
+                tracks[i, 4] = self.next_id
+                self.next_id += 1
+            else:
+                used.add(match)
+                tracks[i, 4] = self.prev[match, 4]
+        self.prev = tracks
+        return tracks
+
+
+def latency_summary(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(samples.size),
+        "mean": float(samples.mean()),
+        "p50": float(np.percentile(samples, 50)),
+        "p90": float(np.percentile(samples, 90)),
+        "p99": float(np.percentile(samples, 99)),
+        "max": float(samples.max()),
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _use_temp_db(workdir):
+    import database
+
+    database.DB_NAME = os.path.join(workdir, "benchmark_violations.db")
+    database.init_db()
+
+
+class NullWindow:
+    """Stands in for the Live Feed placeholder; published bytes go nowhere."""
+
+    def image(self, data, **kwargs):
+        pass
+
+
+def bench_app_loop(video, workdir, batch_size=8, delay_ms=0.0, adaptive=False,
+                   display_fps=10, **_):
+    """The app.py loop body without Streamlit, publishing up to display_fps frames a second."""
+    from association import associate, HANDBAG
+    from compliance import ComplianceState, BASE_STRIDE
+    from display import FramePublisher
+    from frame_sampler import AdaptiveSampler
+    from pipeline import FramePipeline
+    from video_utils import format_video_time
+    from violation_manager import ViolationManager
+    from violation_writer import get_violation_writer
+
+    _use_temp_db(workdir)
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    tracker = StubTracker(delay_ms=delay_ms)
+    inference_ms = []
+
+    def infer(frames):
+        t0 = time.perf_counter()
+        tracks = tracker.track_batch(frames)
+        inference_ms.extend([(time.perf_counter() - t0) * 1000 / len(frames)] * len(frames))
+        return tracks
+
+    source = os.path.basename(video)
+    compliance = ComplianceState()
+    manager = ViolationManager(cooldown_seconds=3, log_once_per_session=True,
+                               tracks=compliance.tracks, source=source)
+    sampler = AdaptiveSampler(base_stride=BASE_STRIDE,
+                              max_stride=4 * BASE_STRIDE if adaptive else BASE_STRIDE,
+                              source_fps=fps)
+    writer = get_violation_writer()
+    pipeline = FramePipeline(cap, infer, queue_size=max(4, batch_size),
+                             batch_size=batch_size, sampler=sampler)
+
+    publisher = FramePublisher(NullWindow(), max_fps=display_fps)
+    loop_ms = []
+    violations = 0
+    last_frame = 0
+    t_start = time.perf_counter()
+    try:
+        for frame_count, frame, tracks in pipeline:
+            t0 = time.perf_counter()
+            stride = frame_count - last_frame
+            last_frame = frame_count
+            video_time = format_video_time(frame_count / fps)
+            people = associate(tracks, 0.35, 0.30, helmet_cls=UMBRELLA,
+                               vest_cls=BACKPACK, boots_cls=HANDBAG)
+            logged = False
+            decisions = compliance.update(people, stride)
+            confirmed = [(pid, missing) for pid, _, missing, ok in decisions if ok]
+            for (pid, missing), log in zip(confirmed, manager.should_log_many(confirmed, source)):
+                if log:
+                    writer.submit(pid, missing, video_time, source)
+                    violations += 1
+                    logged = True
+            sampler.update(pipeline.last_inference_ms, len(people.ids),
+                           logged or compliance.pending_violations())
+            publisher.render(frame, decisions, f"Time: {video_time} | Frame: {frame_count}")
+            loop_ms.append((time.perf_counter() - t0) * 1000)
+        writer.flush()
+    finally:
+        pipeline.stop()
+        cap.release()
+    elapsed = time.perf_counter() - t_start
+
+    stats = pipeline.stats()
+    return {
+        "frames_read": stats["frames_read"],
+        "frames_processed": len(loop_ms),
+        "seconds": elapsed,
+        "fps": stats["frames_read"] / elapsed if elapsed else 0.0,
+        "processed_fps": len(loop_ms) / elapsed if elapsed else 0.0,
+        "loop_latency_ms": latency_summary(loop_ms),
+        "inference_latency_ms": latency_summary(inference_ms),
+        "violations_logged": violations,
+        "frames_published": publisher.published,
+    }
+
+
+def bench_detector_detect(video, workdir, frame_stride=3, delay_ms=0.0, **_):
+    """detection.Detector.detect on every frame_stride-th decoded frame."""
+    from detection import Detector
+
+    detector = Detector(tracker=StubTracker(classes=[PERSON], delay_ms=delay_ms))
+    cap = cv2.VideoCapture(video)
+    latencies = []
+    frame_idx = 0
+    persons = 0
+    t_start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_idx += 1
+        if frame_idx % frame_stride:
+            continue
+        t0 = time.perf_counter()
+        persons += len(detector.detect(frame))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    cap.release()
+    elapsed = time.perf_counter() - t_start
+    return {
+        "frames_read": frame_idx,
+        "frames_processed": len(latencies),
+        "seconds": elapsed,
+        "fps": frame_idx / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "persons_detected": persons,
+    }
+
+
+def bench_log_violation(video, workdir, rows=500, **_):
+    """Synchronous inserts, one connection + commit per violation."""
+    from violation_logic import log_violation
+
+    _use_temp_db(workdir)
+    latencies = []
+    t_start = time.perf_counter()
+    for i in range(rows):
+        t0 = time.perf_counter()
+        log_violation(i, ["Helmet", "Vest"], "00:00:01", "benchmark")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - t_start
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def bench_violation_writer(video, workdir, rows=500, **_):
+    """
+    The same rows through ViolationWriter. Latency is what the detection loop
+    waits; seconds include the final flush (up to one flush_interval).
+    """
+    from violation_writer import ViolationWriter
+
+    _use_temp_db(workdir)
+    writer = ViolationWriter().start()
+    latencies = []
+    t_start = time.perf_counter()
+    for i in range(rows):
+        t0 = time.perf_counter()
+        writer.submit(i, ["Helmet", "Vest"], "00:00:01", "benchmark")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    writer.flush()
+    elapsed = time.perf_counter() - t_start
+    writer.stop()
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "writer": writer.stats(),
+    }
+
+
+BENCHMARKS = {
+    "app_loop": bench_app_loop,
+    "detector_detect": bench_detector_detect,
+    "log_violation": bench_log_violation,
+    "violation_writer": bench_violation_writer,
+}
+VIDEO_BENCHMARKS = ("app_loop", "detector_detect")
+
+
+def _run_one(name, video, workdir, options):
+    baseline = peak_rss_mb()
+    result = BENCHMARKS[name](video, workdir, **options)
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["baseline_rss_mb"] = baseline
+    return result
+
+
+def run_isolated(name, video, workdir, options):
+    """Runs one benchmark in a fresh process so its peak RSS isn't shared with the others."""
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(_run_one, (name, video, workdir, options))
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run_suite(benchmarks=tuple(BENCHMARKS), scenarios=tuple(SCENARIOS), frames=300,
+              n_people=4, width=1280, height=720, isolate=True, **options):
+    """Generates the synthetic videos and runs every benchmark; returns the results dict."""
+    report = {
+        "environment": environment(),
+        "config": {"frames": frames, "people": n_people, "width": width, "height": height,
+                   "benchmarks": list(benchmarks), "scenarios": list(scenarios), **options},
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="ppe_bench_")
+    videos = {
+        scenario: make_video(os.path.join(workdir, f"{scenario}.mp4"), frames, n_people,
+                             width, height, ppe_fraction=SCENARIOS[scenario])
+        for scenario in scenarios
+    }
+    runner = run_isolated if isolate else _run_one
+
+    for name in benchmarks:
+        targets = scenarios if name in VIDEO_BENCHMARKS else [None]
+        for scenario in targets:
+            key = f"{name}/{scenario}" if scenario else name
+            run_dir = tempfile.mkdtemp(dir=workdir)
+            video = videos[scenario] if scenario else None
+            result = runner(name, video, run_dir, options)
+            report["results"][key] = result
+            print(f"{key:<28} {summary_line(result)}")
+    return report
+
+
+def summary_line(result):
+    latency = result.get("loop_latency_ms") or result.get("latency_ms") or {}
+    rate = (f"{result['fps']:8.1f} fps" if "fps" in result
+            else f"{result['rows_per_sec']:8.1f} rows/s")
+    rss = result.get("peak_rss_mb")
+    return (f"{rate}  p50 {latency.get('p50', 0):7.2f} ms  p99 {latency.get('p99', 0):7.2f} ms  "
+            f"peak RSS {rss:.0f} MB" if rss is not None else f"{rate}")
+
+
+def compare(report, baseline):
+    """Prints throughput change per benchmark against an earlier report."""
+    print(f"\nCompared with {baseline['environment'].get('commit')} "
+          f"({baseline['environment'].get('timestamp')}):")
+    for key, result in report["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            continue
+        metric = "fps" if "fps" in result else "rows_per_sec"
+        if old.get(metric):
+            change = (result[metric] / old[metric] - 1) * 100
+            print(f"  {key:<28} {metric} {old[metric]:.1f} -> {result[metric]:.1f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--people", type=int, default=4)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--delay-ms", type=float, default=0.0,
+                        help="Simulated detector latency per frame")
+    parser.add_argument("--rows", type=int, default=500, help="Rows for the logging benchmarks")
+    args = parser.parse_args()
+
+    report = run_suite(args.benchmarks, args.scenarios, args.frames, args.people,
+                       args.width, args.height, batch_size=args.batch_size,
+                       delay_ms=args.delay_ms, rows=args.rows)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
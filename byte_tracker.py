@@ -0,0 +1,465 @@
+"""
+ByteTrack in plain NumPy.
+
+A drop-in for ultralytics' BYTETracker (see inference.load_tracker) that
+keeps every track in a set of arrays instead of one Python object per
+track, so Kalman prediction, updates and IoU matching are one vectorized call per
+frame whatever the number of tracks. It follows ultralytics'
+ByteTrack step for step (same Kalman filter, thresholds from bytetrack.yaml,
+high / low confidence association, unconfirmed tracks, lost-track buffer and
+duplicate removal), so the same detections get the same track IDs.
+
+The only dependency is NumPy: assignment uses an exact Hungarian solver on
+the small groups of tracks and detections that actually overlap, instead of
+lap / scipy.
+
+    PPE_TRACKER=numpy streamlit run app.py
+
+Run directly to time it with hundreds of tracks per frame (and ultralytics'
+BYTETracker next to it, if installed):
+    python byte_tracker.py --tracks 50 200 500 --frames 200
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+TRACKER_CONFIG = "bytetrack.yaml"
+DEFAULTS = {
+    "track_high_thresh": 0.25,
+    "track_low_thresh": 0.1,
+    "new_track_thresh": 0.25,
+    "track_buffer": 30,
+    "match_thresh": 0.8,
+    "fuse_score": True,
+}
+SECOND_MATCH_THRESH = 0.5       # IoU cost limit for low-confidence detections
+UNCONFIRMED_MATCH_THRESH = 0.7  # ... for tracks seen on one frame only
+DUPLICATE_THRESH = 0.15         # Tracked / lost pairs closer than this are one person
+
+TRACKED, LOST = 0, 1
+
+# Kalman filter over (cx, cy, aspect, h) and their velocities, as in ultralytics
+STD_POSITION = 1 / 20
+STD_VELOCITY = 1 / 160
+MOTION = np.eye(8)
+MOTION[:4, 4:] = np.eye(4)
+
+
+def load_config(config_path=TRACKER_CONFIG):
+    """ByteTrack thresholds from a tracker yaml; missing keys use ultralytics' defaults."""
+    import yaml
+
+    with open(config_path) as f:
+        cfg = yaml.safe_load(f) or {}
+    return {key: cfg.get(key, default) for key, default in DEFAULTS.items()}
+
+
+def iou_matrix(a, b):
+    """(N, M) IoU between xyxy boxes, with the same epsilon as ultralytics."""
+    w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.maximum(w, 0) * np.maximum(h, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-7)
+
+
+def _hungarian(cost):
+    """Column for each row of a square cost matrix, minimizing the total (O(n^3))."""
+    n = len(cost)
+    u, v = np.zeros(n + 1), np.zeros(n + 1)
+    owner = np.zeros(n + 1, dtype=np.int64)     # owner[j]: row (1-based) holding column j
+    way = np.zeros(n + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0], j0 = i, 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            reduced = cost[owner[j0] - 1] - u[owner[j0]] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(candidates.argmin()) + 1
+            delta = candidates[j1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            owner[j0] = owner[way[j0]]
+            j0 = way[j0]
+    cols = np.empty(n, dtype=np.int64)
+    cols[owner[1:] - 1] = np.arange(n)
+    return cols
+
+
+def _components(rows, cols):
+    """Connected-component label per edge of a bipartite graph given as edge lists."""
+    labels = np.arange(rows.max() + 1 + cols.max() + 1)
+    offset = rows.max() + 1
+    while True:
+        edge = np.minimum(labels[rows], labels[cols + offset])
+        before = labels.copy()
+        np.minimum.at(labels, rows, edge)
+        np.minimum.at(labels, cols + offset, edge)
+        labels = labels[labels]    # Pointer jumping: long chains collapse quickly
+        if np.array_equal(labels, before):
+            return labels[rows]
+
+
+_PERMUTATIONS = {}
+
+
+def _solve(square):
+    """Column per row minimizing a small square cost matrix."""
+    n = len(square)
+    if n <= 4:
+        # Enumerating at most 24 permutations beats the Hungarian loop
+        perms = _PERMUTATIONS.get(n)
+        if perms is None:
+            perms = _PERMUTATIONS[n] = np.array(list(itertools.permutations(range(n))))
+        return perms[square[np.arange(n), perms].sum(1).argmin()]
+    return _hungarian(square)
+
+
+def linear_assignment(cost, thresh):
+    """
+    Minimum-cost matching where no pair may cost more than thresh (what lap.lapjv
+    with cost_limit does for ultralytics). Returns (matches as (K, 2) [row, col],
+    unmatched rows, unmatched cols).
+
+    Only pairs under thresh can match, so the problem splits into the
+    connected groups of such pairs. Most groups are one track and one
+    detection and are matched directly; the rest are solved exactly per group.
+    """
+    n_rows, n_cols = cost.shape
+    rows, cols = np.nonzero(cost < thresh)
+    matches = np.zeros((0, 2), dtype=np.int64)
+    if len(rows):
+        groups = _components(rows, cols)
+        order = np.argsort(groups, kind="stable")
+        rows, cols, groups = rows[order], cols[order], groups[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        sizes = np.diff(np.r_[starts, len(groups)])
+        found = [np.column_stack([rows[starts[sizes == 1]], cols[starts[sizes == 1]]])]
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            gr, gc = np.unique(rows[start:start + size]), np.unique(cols[start:start + size])
+            sub = cost[np.ix_(gr, gc)]
+            if len(gr) == 1 or len(gc) == 1:   # One track or one detection: cheapest pair wins
+                i, j = np.unravel_index(sub.argmin(), sub.shape)
+                found.append(np.array([[gr[i], gc[j]]]))
+                continue
+            # Savings over leaving both unmatched; padding and invalid pairs save nothing
+            square = np.zeros((max(sub.shape),) * 2)
+            square[:len(gr), :len(gc)] = np.where(sub < thresh, sub - thresh, 0.0)
+            picked = _solve(square)[:len(gr)]
+            ok = (picked < len(gc)) & (sub[np.arange(len(gr)), np.minimum(picked, len(gc) - 1)] < thresh)
+            found.append(np.column_stack([gr[ok], gc[picked[ok]]]))
+        matches = np.concatenate(found).astype(np.int64)
+        matches = matches[np.argsort(matches[:, 0])]
+    return (matches,
+            np.setdiff1d(np.arange(n_rows), matches[:, 0]),
+            np.setdiff1d(np.arange(n_cols), matches[:, 1]))
+
+
+def _xyah(det):
+    """xyxy rows to Kalman measurements (center x, center y, w / h, h)."""
+    w, h = det[:, 2] - det[:, 0], det[:, 3] - det[:, 1]
+    return np.column_stack([det[:, 0] + w / 2, det[:, 1] + h / 2, w / h, h])
+
+
+def _noise(h, position, velocity):
+    """Per-track diagonal noise, scaled by box height like ultralytics' KalmanFilterXYAH."""
+    std = np.column_stack([STD_POSITION * h * position[0], STD_POSITION * h * position[0],
+                           np.full_like(h, position[1]), STD_POSITION * h * position[0],
+                           STD_VELOCITY * h * velocity[0], STD_VELOCITY * h * velocity[0],
+                           np.full_like(h, velocity[1]), STD_VELOCITY * h * velocity[0]])
+    return std ** 2
+
+
+class ByteTracker:
+    def __init__(self, config_path=TRACKER_CONFIG, frame_rate=30, **overrides):
+        """
+        ByteTrack over plain arrays.
+
+        Args:
+            config_path: Tracker yaml (track_high_thresh, track_low_thresh,
+                         new_track_thresh, track_buffer, match_thresh, fuse_score)
+            frame_rate: Scales track_buffer, as in ultralytics (30 = as configured)
+            overrides: Config values that take precedence over the yaml
+        """
+        cfg = load_config(config_path) if config_path else dict(DEFAULTS)
+        cfg.update(overrides)
+        self.high_thresh = cfg["track_high_thresh"]
+        self.low_thresh = cfg["track_low_thresh"]
+        self.new_track_thresh = cfg["new_track_thresh"]
+        self.match_thresh = cfg["match_thresh"]
+        self.fuse_score = cfg["fuse_score"]
+        self.max_time_lost = int(frame_rate / 30.0 * cfg["track_buffer"])
+        self.reset()
+
+    def reset(self):
+        self.frame_id = 0
+        self._next_id = 1
+        self.mean = np.zeros((0, 8))
+        self.covariance = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.activated = np.zeros(0, dtype=bool)
+        self.det = np.zeros((0, 3), dtype=np.float32)      # score, cls, detection index
+        self.last_frame = np.zeros(0, dtype=np.int64)
+        self.start_frame = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def xyxy(self, rows=slice(None)):
+        cx, cy, a, h = self.mean[rows, :4].T
+        w = a * h
+        return np.column_stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    def _predict(self, rows):
+        mean = self.mean[rows]
+        mean[self.state[rows] != TRACKED, 7] = 0   # Lost tracks stop growing
+        q = _noise(mean[:, 3], (1, 1e-2), (1, 1e-5))
+        self.mean[rows] = mean @ MOTION.T
+        self.covariance[rows] = MOTION @ self.covariance[rows] @ MOTION.T \
+            + q[:, :, None] * np.eye(8)
+
+    def _measure(self, rows, det):
+        """Kalman update of tracks rows with their matched detections (update / re_activate)."""
+        if not len(rows):
+            return
+        mean, cov = self.mean[rows], self.covariance[rows]
+        r = _noise(mean[:, 3], (1, 1e-1), (0, 0))[:, :4]
+        projected = cov[:, :4, :4] + r[:, :, None] * np.eye(4)
+        gain = np.linalg.solve(projected, cov[:, :4, :]).transpose(0, 2, 1)   # (n, 8, 4)
+        innovation = _xyah(det) - mean[:, :4]
+        self.mean[rows] = mean + np.einsum("nij,nj->ni", gain, innovation)
+        self.covariance[rows] = cov - gain @ projected @ gain.transpose(0, 2, 1)
+        self.state[rows] = TRACKED
+        self.activated[rows] = True
+        self.det[rows] = det[:, 4:7]
+        self.last_frame[rows] = self.frame_id
+
+    def _activate(self, det):
+        n = len(det)
+        mean = np.zeros((n, 8))
+        mean[:, :4] = _xyah(det)
+        cov = _noise(mean[:, 3], (2, 1e-2), (10, 1e-5))[:, :, None] * np.eye(8)
+        ids = np.arange(self._next_id, self._next_id + n)
+        self._next_id += n
+        self.mean = np.concatenate([self.mean, mean])
+        self.covariance = np.concatenate([self.covariance, cov])
+        self.ids = np.concatenate([self.ids, ids])
+        self.state = np.concatenate([self.state, np.full(n, TRACKED, dtype=np.int8)])
+        # Only the very first frame confirms tracks immediately
+        self.activated = np.concatenate([self.activated, np.full(n, self.frame_id == 1)])
+        self.det = np.concatenate([self.det, det[:, 4:7]])
+        self.last_frame = np.concatenate([self.last_frame, np.full(n, self.frame_id)])
+        self.start_frame = np.concatenate([self.start_frame, np.full(n, self.frame_id)])
+
+    def _keep(self, keep):
+        for name in ("mean", "covariance", "ids", "state", "activated", "det",
+                     "last_frame", "start_frame"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _cost(self, rows, det, fuse):
+        if not len(rows) or not len(det):
+            return np.zeros((len(rows), len(det)))
+        # float32 like ultralytics' iou_distance, which also halves the work
+        similarity = iou_matrix(self.xyxy(rows).astype(np.float32), det[:, :4])
+        if fuse:
+            similarity = similarity * det[None, :, 4]
+        return 1 - similarity
+
+    def update(self, det, frame=None):
+        """
+        One frame of detections -> tracks, like BYTETracker.update.
+
+        Args:
+            det: (N, 6) [x1, y1, x2, y2, conf, cls] array, or anything with
+                 that as .data (ultralytics Boxes)
+            frame: Unused; accepted so this is a drop-in for BYTETracker
+        Returns:
+            (M, 8) [x1, y1, x2, y2, track_id, conf, cls, detection index] float32
+            for the confirmed tracks on this frame
+        """
+        det = np.asarray(getattr(det, "data", det), dtype=np.float32).reshape(-1, 6)
+        det = np.column_stack([det, np.arange(len(det), dtype=np.float32)])
+        self.frame_id += 1
+        scores = det[:, 4]
+        first = det[scores >= self.high_thresh]
+        second = det[(scores > self.low_thresh) & (scores < self.high_thresh)]
+
+        was_lost = self.state == LOST
+        unconfirmed = np.where((self.state == TRACKED) & ~self.activated)[0]
+        pool = np.where(self.activated | was_lost)[0]
+
+        # 1. Confirmed and lost tracks vs high-confidence detections
+        if len(pool):
+            self._predict(pool)
+        matches, u_track, u_det = linear_assignment(
+            self._cost(pool, first, self.fuse_score), self.match_thresh)
+        self._measure(pool[matches[:, 0]], first[matches[:, 1]])
+
+        # 2. Still-unmatched tracked (not lost) tracks vs low-confidence detections
+        remaining = pool[u_track]
+        remaining = remaining[self.state[remaining] == TRACKED]
+        matches, u_remaining, _ = linear_assignment(
+            self._cost(remaining, second, False), SECOND_MATCH_THRESH)
+        self._measure(remaining[matches[:, 0]], second[matches[:, 1]])
+        self.state[remaining[u_remaining]] = LOST
+
+        # 3. Tracks from the previous frame only vs the leftover high detections
+        first = first[u_det]
+        matches, u_unconfirmed, u_det = linear_assignment(
+            self._cost(unconfirmed, first, self.fuse_score), UNCONFIRMED_MATCH_THRESH)
+        self._measure(unconfirmed[matches[:, 0]], first[matches[:, 1]])
+
+        # 4. Lost too long, or unconfirmed and not seen again: dropped
+        keep = np.ones(len(self), dtype=bool)
+        keep[unconfirmed[u_unconfirmed]] = False
+        keep &= ~(was_lost & (self.state == LOST)
+                  & (self.frame_id - self.last_frame > self.max_time_lost))
+        self._keep(keep)
+
+        # 5. New tracks from confident detections nobody claimed
+        new = first[u_det]
+        self._activate(new[new[:, 4] >= self.new_track_thresh])
+
+        self._remove_duplicates()
+        out = np.where((self.state == TRACKED) & self.activated)[0]
+        return np.column_stack([self.xyxy(out), self.ids[out], self.det[out]]).astype(np.float32)
+
+    def _remove_duplicates(self):
+        """A tracked and a lost track on the same spot: keep the older one."""
+        tracked = np.where(self.state == TRACKED)[0]
+        lost = np.where(self.state == LOST)[0]
+        if not len(tracked) or not len(lost):
+            return
+        close = np.argwhere(1 - iou_matrix(self.xyxy(tracked).astype(np.float32),
+                                           self.xyxy(lost).astype(np.float32)) < DUPLICATE_THRESH)
+        if not len(close):
+            return
+        t, l = tracked[close[:, 0]], lost[close[:, 1]]
+        age = self.last_frame - self.start_frame
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.where(age[t] > age[l], l, t)] = False
+        self._keep(keep)
+
+
+def synthetic_sequence(n_objects, frames=100, width=1920, height=1080, seed=0,
+                       noise=1.5, low_conf_rate=0.1, miss_rate=0.02):
+    """
+    Detections of n_objects boxes moving at constant velocity (bouncing off
+    the frame edges), with position noise, some low-confidence frames and some
+    missed detections. Returns (list of (N, 6) arrays, list of ground-truth ids).
+    """
+    rng = np.random.default_rng(seed)
+    size = rng.uniform([20, 50], [60, 150], (n_objects, 2))
+    pos = rng.uniform([0, 0], [width, height], (n_objects, 2)) - size
+    pos = np.clip(pos, 0, None)
+    vel = rng.uniform(-6, 6, (n_objects, 2))
+    sequence, truth = [], []
+    for _ in range(frames):
+        pos += vel
+        bounce = (pos < 0) | (pos + size > (width, height))
+        vel[bounce] *= -1
+        pos = np.clip(pos, 0, np.array([width, height]) - size)
+        shown = rng.random(n_objects) >= miss_rate
+        xyxy = np.column_stack([pos, pos + size]) + rng.normal(0, noise, (n_objects, 4))
+        conf = np.where(rng.random(n_objects) < low_conf_rate,
+                        rng.uniform(0.12, 0.24, n_objects), rng.uniform(0.5, 0.95, n_objects))
+        det = np.column_stack([xyxy, conf, np.zeros(n_objects)]).astype(np.float32)
+        sequence.append(det[shown])
+        truth.append(np.arange(n_objects)[shown])
+    return sequence, truth
+
+
+def id_switches(tracks, truth):
+    """
+    ID switches (a ground-truth object's track id changing) and fragmentations
+    (an object that was tracked losing its track), over a run of tracker.update outputs.
+    """
+    current, switches, lost = {}, 0, 0
+    for out, ids in zip(tracks, truth):
+        seen = {int(gt): int(tid) for gt, tid in zip(ids[out[:, 7].astype(int)], out[:, 4])}
+        for gt, tid in seen.items():
+            if gt in current and current[gt] != tid:
+                switches += 1
+            current[gt] = tid
+        lost += sum(1 for gt in ids if gt in current and gt not in seen)
+    return {"id_switches": switches, "untracked_detections": lost}
+
+
+def run(tracker, sequence):
+    """tracker.update over a sequence; (outputs, per-frame ms)."""
+    outputs, latencies = [], []
+    for det in sequence:
+        t0 = time.perf_counter()
+        outputs.append(np.asarray(tracker.update(det), dtype=np.float32).reshape(-1, 8))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return outputs, latencies
+
+
+def ultralytics_tracker(config_path=TRACKER_CONFIG, frame_rate=30):
+    """ultralytics' BYTETracker fed plain arrays, for side-by-side runs (None if not installed)."""
+    try:
+        from inference import load_tracker, boxes_from_array
+        tracker = load_tracker(config_path, frame_rate, kind="ultralytics")
+    except ImportError:
+        return None
+
+    class Adapter:
+        def update(self, det):
+            return tracker.update(boxes_from_array(det, (1080, 1920)), None)
+
+    return Adapter()
+
+
+def same_ids(expected, actual):
+    """Fraction of frames on which both trackers gave every detection the same id."""
+    same = 0
+    for a, b in zip(expected, actual):
+        a, b = a[np.argsort(a[:, 7])], b[np.argsort(b[:, 7])]
+        same += a.shape == b.shape and np.array_equal(a[:, [4, 7]], b[:, [4, 7]])
+    return same / max(len(expected), 1)
+
+
+def main():
+    from benchmark import latency_summary
+
+    parser = argparse.ArgumentParser(description="NumPy ByteTrack vs ultralytics BYTETracker")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--config", default=TRACKER_CONFIG)
+    args = parser.parse_args()
+
+    print(f"{'tracks':>6} {'tracker':<12} {'p50 ms':>7} {'p90 ms':>7} {'id switches':>12} {'same ids':>9}")
+    for n in args.tracks:
+        sequence, truth = synthetic_sequence(n, args.frames)
+        outputs, latencies = run(ByteTracker(args.config), sequence)
+        lat = latency_summary(latencies)
+        print(f"{n:>6} {'numpy':<12} {lat['p50']:>7.2f} {lat['p90']:>7.2f} "
+              f"{id_switches(outputs, truth)['id_switches']:>12}")
+        reference = ultralytics_tracker(args.config)
+        if reference is None:
+            continue
+        ref_outputs, ref_latencies = run(reference, sequence)
+        lat = latency_summary(ref_latencies)
+        print(f"{n:>6} {'ultralytics':<12} {lat['p50']:>7.2f} {lat['p90']:>7.2f} "
+              f"{id_switches(ref_outputs, truth)['id_switches']:>12} "
+              f"{same_ids(ref_outputs, outputs):>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
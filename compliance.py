@@ -0,0 +1,94 @@
+"""
+Per-person compliance state shared by every detection loop (Streamlit app,
+headless processing).
+
+Counts are kept in source-video frames rather than processed frames, so a
+person needs the same amount of video to warm up whatever the sampling
+stride. Violation confirmation still needs CONSECUTIVE_FRAMES_THRESHOLD
+observations in a row; AdaptiveSampler drops back to BASE_STRIDE while one is
+pending, so those observations span the same time as with a fixed stride.
+
+State lives in a track_state.TrackStateStore, so tracks ByteTrack has dropped
+are forgotten here too.
+"""
+
+from track_state import TrackStateStore
+
+BASE_STRIDE = 3                    # Detection on every 3rd decoded frame
+PERSON_WARMUP_SAMPLES = 15         # Processed frames before a person is judged...
+PERSON_WARMUP_FRAMES = PERSON_WARMUP_SAMPLES * BASE_STRIDE  # ...expressed in source frames
+CONSECUTIVE_FRAMES_THRESHOLD = 3   # Observations in a row before a violation is logged
+
+
+class ComplianceState:
+    def __init__(self, warmup_frames=PERSON_WARMUP_FRAMES,
+                 consecutive_threshold=CONSECUTIVE_FRAMES_THRESHOLD, check_boots=False,
+                 tracks=None):
+        """
+        Args:
+            warmup_frames: Source frames a person must be tracked before being judged
+            consecutive_threshold: Observations of the same missing gear before logging
+            check_boots: Also require boots (off for the demo proxies)
+            tracks: TrackStateStore to keep state in (default: a new one using
+                    track_buffer from bytetrack.yaml); share it with ViolationManager
+        """
+        self.warmup_frames = warmup_frames
+        self.consecutive_threshold = consecutive_threshold
+        self.check_boots = check_boots
+        self.tracks = tracks if tracks is not None else TrackStateStore()
+
+    def update(self, people, stride=BASE_STRIDE):
+        """
+        Updates state from one processed frame.
+
+        Args:
+            people: association.Association for the frame
+            stride: Source frames since the previous processed frame
+
+        Returns:
+            List of (pid, bbox, missing, confirmed) for warmed-up persons.
+            missing is [] for compliant persons; confirmed is True once the
+            violation has been seen consecutive_threshold times in a row.
+        """
+        self.tracks.tick()
+        results = []
+        for i, pid in enumerate(people.ids.tolist()):
+            state = self.tracks.touch(pid)
+            state.frames += stride
+
+            if state.frames < self.warmup_frames:
+                continue
+
+            missing = []
+            if not people.helmet[i]:
+                missing.append("Helmet")
+            if not people.vest[i]:
+                missing.append("Vest")
+            if self.check_boots and not people.boots[i]:
+                missing.append("PPE Bag")
+
+            bbox = tuple(people.boxes[i].tolist())
+            confirmed = False
+
+            if missing:
+                missing_key = tuple(sorted(missing))
+                if state.streaks is None:
+                    state.streaks = {}
+                count = state.streaks[missing_key] = state.streaks.get(missing_key, 0) + 1
+                confirmed = count >= self.consecutive_threshold
+            elif state.streaks is not None:
+                state.streaks = None
+
+            results.append((pid, bbox, missing, confirmed))
+        return results
+
+    def pending_violations(self):
+        """True while any person has a violation seen but not yet confirmed."""
+        return any(
+            0 < count < self.consecutive_threshold
+            for state in self.tracks.states() if state.streaks
+            for count in state.streaks.values()
+        )
+
+    def reset(self):
+        self.tracks.clear()
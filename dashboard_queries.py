@@ -0,0 +1,245 @@
+"""
+Aggregate queries for the admin dashboard.
+
+Each function returns only what one dashboard widget needs (counts, groups,
+per-day buckets) so page memory stays flat as the violations table grows.
+
+Results are kept in a process-wide cache shared by every admin session and
+dropped only when the violations table actually changes, so widget reruns
+(view mode, filters) don't touch the database.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import database
+from database import get_connection, PPE_BITS, masks_with, data_version, unmapped_items
+
+RECORDS_LIMIT = 1000   # Max rows shown in the "All Records" table
+OTHER_GEAR = "Other"   # Gear filter for items without a bit of their own
+GEAR_FILTERS = list(PPE_BITS) + [OTHER_GEAR]
+
+
+class QueryCache:
+    def __init__(self, max_entries=128, check_interval=0.5):
+        """
+        Size-bounded LRU cache invalidated by database.data_version().
+
+        Args:
+            max_entries: Max cached query results
+            check_interval: Seconds between data version checks; calls within
+                            this window reuse the last known version
+        """
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def current_version(self):
+        now = time.monotonic()
+        with self._lock:
+            if (self._version is not None and self._version[0] == database.DB_NAME
+                    and now - self._checked_at < self.check_interval):
+                return self._version
+        conn = get_connection()
+        try:
+            version = (database.DB_NAME,) + data_version(conn)
+        finally:
+            conn.close()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked_at = now
+        return version
+
+    def get_or_compute(self, key, compute):
+        version = self.current_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+CACHE = QueryCache()
+
+
+def cached(fn):
+    """Serves fn's results from CACHE. DataFrames are copied so callers can't alter shared results."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        value = CACHE.get_or_compute(key, lambda: fn(*args, **kwargs))
+        return value.copy() if isinstance(value, (pd.DataFrame, dict, list)) else value
+    return wrapper
+
+
+def _read(query, params=()):
+    conn = get_connection()
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def _scalar_row(query, params=()):
+    conn = get_connection()
+    try:
+        return conn.execute(query, params).fetchone()
+    finally:
+        conn.close()
+
+
+def _gear_clause(gear):
+    """SQL fragment + params matching rows missing the given gear (index friendly)."""
+    masks = masks_with(None if gear == OTHER_GEAR else gear)
+    return f"missing_mask IN ({', '.join('?' * len(masks))})", masks
+
+
+@cached
+def has_records():
+    return bool(_scalar_row("SELECT EXISTS (SELECT 1 FROM violations)")[0])
+
+
+@cached
+def day_metrics(day):
+    """Total entries, unique persons and helmet violations for one day ("YYYY-MM-DD")."""
+    row = _scalar_row("""
+        SELECT COUNT(*), COUNT(DISTINCT person_id),
+               COALESCE(SUM((missing_mask & ?) != 0), 0)
+        FROM violations WHERE date = ?
+    """, (PPE_BITS["Helmet"], day))
+    return {"total": row[0], "unique_persons": row[1], "helmet_missing": row[2]}
+
+
+@cached
+def grouped_by_person(day):
+    """One row per (person, source) for a day, with the union of missing gear."""
+    # Bare columns next to MIN(id) come from the first logged row of each group
+    df = _read("""
+        SELECT person_id, source, GROUP_CONCAT(DISTINCT missing_ppe) AS missing_ppe,
+               MIN(id) AS first_id, video_time, status
+        FROM violations WHERE date = ?
+        GROUP BY person_id, source
+        ORDER BY person_id, source
+    """, (day,))
+    df["missing_ppe"] = df["missing_ppe"].fillna("").map(
+        lambda s: ", ".join(sorted({g.strip() for g in s.split(",") if g.strip()}))
+    )
+    return df[["person_id", "source", "missing_ppe", "video_time", "status"]]
+
+
+@cached
+def day_entries(day, limit=RECORDS_LIMIT):
+    """Most recent log entries for a day."""
+    return _read("""
+        SELECT id, person_id, missing_ppe, video_time, source, status
+        FROM violations WHERE date = ?
+        ORDER BY timestamp DESC LIMIT ?
+    """, (day, limit))
+
+
+@cached
+def sources():
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT source FROM violations WHERE source IS NOT NULL ORDER BY source"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def _filters(source=None, gear=None):
+    clauses, params = [], []
+    if source:
+        clauses.append("source = ?")
+        params.append(source)
+    if gear:
+        clause, masks = _gear_clause(gear)
+        clauses.append(clause)
+        params.extend(masks)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+@cached
+def count_records(source=None, gear=None):
+    where, params = _filters(source, gear)
+    return _scalar_row(f"SELECT COUNT(*) FROM violations {where}", params)[0]
+
+
+@cached
+def filtered_records(source=None, gear=None, limit=RECORDS_LIMIT):
+    """Most recent rows matching the filters (None = no filter)."""
+    where, params = _filters(source, gear)
+    return _read(f"""
+        SELECT id, person_id, missing_ppe, video_time, timestamp, date, source, status
+        FROM violations {where}
+        ORDER BY timestamp DESC LIMIT ?
+    """, params + [limit])
+
+
+@cached
+def gear_counts():
+    """How often each gear item was missing, over all history."""
+    columns = ", ".join(
+        f'COALESCE(SUM((missing_mask & {bit}) != 0), 0) AS "{name}"'
+        for name, bit in PPE_BITS.items()
+    )
+    counts = dict(zip(PPE_BITS, _scalar_row(f"SELECT {columns} FROM violations")))
+
+    # Items without a bit are rare: count them by name from just those rows
+    clause, masks = _gear_clause(OTHER_GEAR)
+    conn = get_connection()
+    try:
+        rows = conn.execute(f"SELECT missing_ppe FROM violations WHERE {clause}", masks).fetchall()
+    finally:
+        conn.close()
+    for (missing_ppe,) in rows:
+        for item in set(unmapped_items(missing_ppe)):
+            counts[item] = counts.get(item, 0) + 1
+
+    df = pd.DataFrame({"Type": list(counts), "Count": list(counts.values())})
+    return df[df["Count"] > 0].reset_index(drop=True)
+
+
+@cached
+def daily_counts():
+    """Violations per day."""
+    df = _read("""
+        SELECT date AS date_dt, COUNT(*) AS Count
+        FROM violations WHERE date IS NOT NULL
+        GROUP BY date ORDER BY date
+    """)
+    df["date_dt"] = pd.to_datetime(df["date_dt"])
+    return df
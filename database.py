@@ -1,17 +1,210 @@
 import sqlite3
 import os
+import queue
+import threading
 
 DB_NAME = "ppe_violations.db"
 
+POOL_SIZE = 8                 # Idle connections kept per database file
+BUSY_TIMEOUT_MS = 5000        # Wait this long for a lock instead of failing
+STATEMENT_CACHE_SIZE = 256    # Prepared statements kept per connection
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",          # Readers never block the writer (and vice versa)
+    "PRAGMA synchronous=NORMAL",        # Safe with WAL; fsync at checkpoints, not every commit
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",         # 16 MB page cache per connection
+)
+
+SCHEMA_VERSION = 4   # Stored in PRAGMA user_version
+
+# One bit per PPE item in violations.missing_mask
+PPE_BITS = {
+    "Helmet": 1,
+    "Vest": 2,
+    "Shoes": 4,
+    "Goggles": 8,
+    "Gloves": 16,
+    "Mask": 32,
+    "PPE Bag": 64,      # compliance.py with check_boots
+}
+OTHER_BIT = 128         # Any other item; its name is only in missing_ppe
+MASK_VALUES = 256       # Every possible missing_mask is below this
+
+_BITS_BY_NAME = {name.lower(): bit for name, bit in PPE_BITS.items()}
+
+VIOLATION_INDEXES = {
+    "idx_violations_date": "violations (date)",
+    "idx_violations_source_person": "violations (source, person_id)",
+    "idx_violations_timestamp": "violations (timestamp)",
+    "idx_violations_missing_mask": "violations (missing_mask)",
+}
+
+
+def encode_missing(missing_ppe_list):
+    """["Helmet", "Vest"] -> 3. Items not in PPE_BITS set OTHER_BIT (their names stay in missing_ppe)."""
+    mask = 0
+    for item in missing_ppe_list:
+        item = item.strip()
+        if item:
+            mask |= _BITS_BY_NAME.get(item.lower(), OTHER_BIT)
+    return mask
+
+
+def unmapped_items(missing_ppe):
+    """Names in a stored missing_ppe string that have no bit of their own."""
+    items = (item.strip() for item in (missing_ppe or "").split(","))
+    return [item for item in items if item and item.lower() not in _BITS_BY_NAME]
+
+
+def decode_missing(mask):
+    """3 -> ["Helmet", "Vest"]"""
+    return [name for name, bit in PPE_BITS.items() if mask & bit]
+
+
+def masks_with(gear):
+    """
+    Every mask value that includes the given gear (None = OTHER_BIT). Lets a
+    gear filter use the missing_mask index as "missing_mask IN (...)" instead
+    of a bitwise scan.
+    """
+    bit = OTHER_BIT if gear is None else PPE_BITS[gear]
+    return [m for m in range(MASK_VALUES) if m & bit]
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        """
+        Keeps configured connections open for reuse.
+
+        A connection is handed to one caller at a time, so it can move between
+        threads (check_same_thread=False) but is never used concurrently.
+
+        Args:
+            path: SQLite database file
+            size: Max idle connections kept open
+        """
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.schema_checked = False
+
+    def acquire(self):
+        # The file was deleted (e.g. a test resetting its DB): drop connections
+        # to the old file instead of silently writing into it.
+        if not os.path.exists(self.path):
+            self.close_all()
+            self.schema_checked = False
+        try:
+            conn = self._idle.get_nowait()
+            self.reused += 1
+            return conn
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        """Returns True if the connection was taken back into the pool."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+            self._idle.put_nowait(conn)
+            return True
+        except (queue.Full, sqlite3.Error):
+            return False
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sqlite3.Connection.close(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        with self._lock:
+            self.created += 1
+        return conn
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    """Returns the process-wide pool for a database file (DB_NAME by default)."""
+    path = path or DB_NAME
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def close_pools():
+    """Closes every idle pooled connection."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+def data_version(conn):
+    """
+    Cheap token that changes whenever the violations table changes:
+    (MAX(id), update/delete counter). Both are single index lookups.
+    """
+    return tuple(conn.execute("""
+        SELECT (SELECT MAX(id) FROM violations),
+               (SELECT counter FROM violations_changes WHERE id = 1)
+    """).fetchone())
+
+
 def get_connection():
-    """Returns a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row  
+    """Returns a pooled connection to the SQLite database; close() returns it to the pool."""
+    pool = get_pool()
+    conn = pool.acquire()
+    if not pool.schema_checked:
+        # First use of this file in the process: bring older databases up to date
+        with pool._lock:
+            if not pool.schema_checked:
+                create_schema(conn)
+                pool.schema_checked = True
     return conn
 
 def init_db():
     """Initializes the database with necessary tables."""
     conn = get_connection()
+    create_schema(conn)
+    conn.close()
+
+def create_schema(conn):
+    """Creates missing tables, then migrates the violations table to SCHEMA_VERSION."""
     c = conn.cursor()
 
    
@@ -29,14 +222,83 @@ def init_db():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         person_id INTEGER,
         missing_ppe TEXT,
+        missing_mask INTEGER NOT NULL DEFAULT 0,
         video_time TEXT,
         timestamp TEXT,
+        date TEXT,
+        source TEXT,
         status TEXT
     )
     """)
 
     conn.commit()
-    conn.close()
+    migrate_schema(conn)
+
+def migrate_schema(conn):
+    """
+    Upgrades an existing violations table in place:
+      - adds video_time / date / source / missing_mask columns if missing
+      - backfills date from timestamp and missing_mask from missing_ppe
+        (again at version 4, which added "PPE Bag" and OTHER_BIT)
+      - creates the query indexes and the change counter used by the dashboard cache
+    Returns the (old, new) schema version.
+    """
+    c = conn.cursor()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+
+    c.execute("PRAGMA table_info(violations)")
+    columns = {row[1] for row in c.fetchall()}
+
+    try:
+        c.execute("BEGIN")
+        for name, decl in (("video_time", "TEXT"), ("date", "TEXT"), ("source", "TEXT"),
+                           ("missing_mask", "INTEGER NOT NULL DEFAULT 0")):
+            if name not in columns:
+                c.execute(f"ALTER TABLE violations ADD COLUMN {name} {decl}")
+
+        if version < 2:
+            c.execute("""
+            UPDATE violations SET date = substr(timestamp, 1, 10)
+            WHERE date IS NULL AND timestamp IS NOT NULL
+            """)
+        if version < 4:
+            # Same encoding as new rows get, from the stored ", "-joined list
+            conn.create_function("encode_missing_ppe", 1,
+                                 lambda text: encode_missing((text or "").split(",")),
+                                 deterministic=True)
+            c.execute("""
+            UPDATE violations SET missing_mask = encode_missing_ppe(missing_ppe)
+            WHERE missing_mask != encode_missing_ppe(missing_ppe)
+            """)
+
+        for index, target in VIOLATION_INDEXES.items():
+            c.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {target}")
+
+        # Change counter for cache invalidation. Inserts already move MAX(id)
+        # (AUTOINCREMENT never reuses ids), so only updates and deletes bump it.
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS violations_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            counter INTEGER NOT NULL
+        )
+        """)
+        c.execute("INSERT OR IGNORE INTO violations_changes (id, counter) VALUES (1, 0)")
+        for event in ("UPDATE", "DELETE"):
+            c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS violations_after_{event.lower()}
+            AFTER {event} ON violations
+            BEGIN
+                UPDATE violations_changes SET counter = counter + 1 WHERE id = 1;
+            END
+            """)
+
+        c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return version, SCHEMA_VERSION
 
 if __name__ == "__main__":
     init_db()
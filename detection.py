@@ -1,44 +1,57 @@
-from ultralytics import YOLO
 import cv2
 
-class Detector:
-    def __init__(self):
-        
-        self.model = YOLO("yolov8n.pt")
+from inference import BatchedTracker
+from association import split_tracks
+from model_registry import load_model
+import metrics
 
-    def detect(self, frame):
+class Detector:
+    def __init__(self, tracker=None):
         """
-        Detect & track persons in a frame using ByteTrack
-        Returns list of persons with stable IDs
+        Args:
+            tracker: Anything with track_batch(frames) -> track arrays; None loads
+                     YOLOv8n + ByteTrack (benchmark.StubTracker runs offline)
         """
-        results = self.model.track(
-            frame,
-            persist=True,
-            tracker="bytetrack.yaml",
+        if tracker is not None:
+            self.entry = None
+            self.model = None
+            self.tracker = tracker
+            return
+
+        # Weights are shared process-wide; this detector keeps its own ByteTrack state
+        self.entry = load_model("yolov8n.pt")
+        self.model = self.entry.model
+        self.tracker = BatchedTracker(
+            self.model,
+            batch_size=1,
+            lock=self.entry.lock,
             conf=0.35,
             iou=0.5,
-            classes=[0]  
+            classes=[0]
         )
 
-        detections = []
-
-        if not results or results[0].boxes is None:
-            return detections
-
-        boxes = results[0].boxes
-
-        if boxes.id is None:
-            return detections
+    def detect_arrays(self, frame):
+        """
+        Detect & track persons in a frame using ByteTrack
+        Returns (boxes, ids, confs) arrays, one row per tracked person
+        """
+        with metrics.timed("detect"):
+            tracks = self.tracker.track_batch([frame])[0]
+        boxes, ids, confs, _ = split_tracks(tracks)
+        return boxes, ids, confs
 
-        for box in boxes:
-            person_id = int(box.id.item())
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            conf = float(box.conf[0])
+    def detect(self, frame):
+        """
+        Detect & track persons in a frame using ByteTrack
+        Returns list of persons with stable IDs
+        """
+        boxes, ids, confs = self.detect_arrays(frame)
 
-            detections.append({
+        return [
+            {
                 "person_id": person_id,
-                "bbox": (x1, y1, x2, y2),
+                "bbox": tuple(bbox),
                 "confidence": conf
-            })
-
-        return detections
+            }
+            for person_id, bbox, conf in zip(ids.tolist(), boxes.tolist(), confs.tolist())
+        ]
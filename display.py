@@ -0,0 +1,137 @@
+"""
+Live Feed publishing, decoupled from the processing rate.
+
+Every processed frame still goes through association and compliance, but only
+up to max_fps frames a second are annotated and sent to the browser. Those are
+drawn on a reused, downscaled canvas and JPEG-encoded once; Streamlit passes
+the encoded bytes through as they are.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+DISPLAY_FPS = 10         # Browsers rarely keep up with more than this
+DISPLAY_WIDTH = 960      # Canvas width; None = full frame width
+JPEG_QUALITY = 80
+
+HEADER_COLOR = (255, 255, 0)
+VIOLATION_COLOR = (0, 0, 255)
+SAFE_COLOR = (0, 255, 0)
+
+
+def draw_overlay(canvas, decisions, header, scale=1.0):
+    """
+    Draws compliance boxes and the header line onto canvas.
+
+    Args:
+        decisions: (pid, (x1, y1, x2, y2), missing, confirmed) from ComplianceState.update
+        header: Text for the top-left corner
+        scale: Canvas size / frame size, for the box coordinates
+    """
+    for pid, box, missing, _ in decisions:
+        x1, y1, x2, y2 = (int(v * scale) for v in box)
+        if missing:
+            color = VIOLATION_COLOR
+            label = f"ID:{pid} MISSING: {','.join(missing)}"
+        else:
+            color = SAFE_COLOR
+            label = f"ID:{pid} SAFE ✓"
+
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(canvas, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    cv2.putText(canvas, header, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.7, HEADER_COLOR, 2)
+    return canvas
+
+
+class FramePublisher:
+    def __init__(self, window, max_fps=DISPLAY_FPS, max_width=DISPLAY_WIDTH,
+                 quality=JPEG_QUALITY):
+        """
+        Throttled, single-encode image publishing to a Streamlit placeholder.
+
+        Args:
+            window: st.empty() placeholder (anything with .image())
+            max_fps: Most frames published per second (None = every frame)
+            max_width: Frames wider than this are shown downscaled (None = full size)
+            quality: JPEG quality of the published frames
+        """
+        self.window = window
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.max_width = max_width
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+
+        self._canvas = None         # Reused annotation buffer
+        self._next_due = None       # perf_counter time the next frame may be published
+        self.published = 0
+        self.skipped = 0
+        self.encode_seconds = 0.0
+        self.bytes_sent = 0
+
+    def due(self, now=None):
+        """True if a frame may be published now."""
+        if self._next_due is None:
+            return True
+        now = time.perf_counter() if now is None else now
+        return now >= self._next_due - 0.001  # A millisecond early is timer jitter
+
+    def canvas(self, frame):
+        """Copies (or downscales) frame into the reused canvas. Returns (canvas, scale)."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.max_width / w) if self.max_width else 1.0
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        if self._canvas is None or self._canvas.shape[:2] != (size[1], size[0]):
+            self._canvas = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        if scale < 1.0:
+            resized = cv2.resize(frame, size, dst=self._canvas, interpolation=cv2.INTER_LINEAR)
+            if resized is not self._canvas:
+                self._canvas[...] = resized
+        else:
+            np.copyto(self._canvas, frame)
+        return self._canvas, scale
+
+    def publish(self, image, now=None):
+        """JPEG-encodes image once and sends the bytes to the window."""
+        t0 = time.perf_counter()
+        ok, jpeg = cv2.imencode(".jpg", image, self.encode_params)
+        if not ok:
+            return False
+        data = jpeg.tobytes()
+        self.encode_seconds += time.perf_counter() - t0
+        self.window.image(data, output_format="JPEG")
+        now = time.perf_counter() if now is None else now
+        # Deadlines advance by a fixed step so the rate holds at max_fps even
+        # when frames don't arrive on a multiple of the interval
+        if self._next_due is not None and now - self._next_due < self.interval:
+            self._next_due += self.interval
+        else:
+            self._next_due = now + self.interval
+        self.published += 1
+        self.bytes_sent += len(data)
+        return True
+
+    def render(self, frame, decisions, header, now=None):
+        """
+        Annotates and publishes frame if one is due. Returns True if it was
+        published; frames in between are skipped without any drawing.
+        """
+        if not self.due(now):
+            self.skipped += 1
+            return False
+        with metrics.timed("annotate"):
+            canvas, scale = self.canvas(frame)
+            draw_overlay(canvas, decisions, header, scale)
+        with metrics.timed("display"):
+            return self.publish(canvas, now)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "skipped": self.skipped,
+            "avg_encode_ms": 1000 * self.encode_seconds / max(self.published, 1),
+            "avg_kb": self.bytes_sent / 1024 / max(self.published, 1),
+        }
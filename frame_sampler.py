@@ -0,0 +1,87 @@
+import math
+
+
+class AdaptiveSampler:
+    def __init__(self, base_stride=3, min_stride=1, max_stride=12, source_fps=30,
+                 realtime=False, target_utilization=0.8, idle_updates=10, smoothing=0.2):
+        """
+        Chooses how many decoded frames to skip between inference runs.
+
+        The stride moves one step per update (no oscillation) towards:
+          - base_stride while a violation is being confirmed or was just logged,
+            so CONSECUTIVE_FRAMES_THRESHOLD keeps meaning the same time window
+          - max_stride when nobody has been tracked for idle_updates frames
+          - the smallest stride inference can keep up with (live feeds only)
+
+        Args:
+            base_stride: The normal "every Nth frame" rate
+            min_stride / max_stride: Bounds for the stride
+            source_fps: Frame rate of the source
+            realtime: True for live feeds, where inference must keep pace with the camera
+            target_utilization: Fraction of the frame budget inference may use (realtime)
+            idle_updates: Empty frames in a row before sampling slows down
+            smoothing: EWMA factor for the inference latency
+        """
+        self.base_stride = base_stride
+        self.min_stride = min(min_stride, base_stride)
+        self.max_stride = max(max_stride, base_stride)
+        self.source_fps = source_fps or 30
+        self.realtime = realtime
+        self.target_utilization = target_utilization
+        self.idle_updates = idle_updates
+        self.smoothing = smoothing
+
+        self.stride = base_stride
+        self.latency_ms = None
+        self.empty_streak = 0
+        self.history = []
+
+    def latency_stride(self):
+        """Smallest stride whose frame budget covers the measured inference latency."""
+        if not self.realtime or self.latency_ms is None:
+            return self.min_stride
+        frame_ms = 1000.0 / self.source_fps
+        return math.ceil(self.latency_ms / (frame_ms * self.target_utilization))
+
+    def update(self, inference_ms, tracked_people, violation_activity=False):
+        """
+        Feeds back the last processed frame and returns the stride for the next one.
+
+        Args:
+            inference_ms: Detector + tracker time for that frame
+            tracked_people: Persons tracked in that frame
+            violation_activity: A violation is pending confirmation or was just logged
+        """
+        if self.latency_ms is None:
+            self.latency_ms = inference_ms
+        else:
+            self.latency_ms += self.smoothing * (inference_ms - self.latency_ms)
+
+        self.empty_streak = self.empty_streak + 1 if tracked_people == 0 else 0
+
+        if violation_activity:
+            target = self.base_stride
+        elif self.empty_streak >= self.idle_updates:
+            target = self.max_stride
+        else:
+            target = self.base_stride
+
+        # Never sample faster than inference can sustain on a live feed; if a
+        # violation needs confirming, frames get dropped rather than delayed.
+        if not violation_activity:
+            target = max(target, self.latency_stride())
+        target = max(self.min_stride, min(self.max_stride, target))
+
+        if target > self.stride:
+            self.stride += 1
+        elif target < self.stride:
+            # Speed up immediately when something happens; slow down gradually
+            self.stride = target if violation_activity or tracked_people else self.stride - 1
+
+        self.history.append(self.stride)
+        if len(self.history) > 1000:
+            del self.history[:500]
+        return self.stride
+
+    def average_stride(self):
+        return sum(self.history) / len(self.history) if self.history else float(self.stride)
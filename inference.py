@@ -0,0 +1,299 @@
+"""
+Detector + tracker wrappers used by the detection loop.
+
+Both trackers return one numpy array per frame with a row per tracked box:
+    [x1, y1, x2, y2, track_id, confidence, class_id]
+
+ByteTrack is ultralytics' BYTETracker by default; PPE_TRACKER=numpy uses
+byte_tracker.ByteTracker, the same algorithm over arrays.
+
+Run directly to compare throughput of batch sizes on a recorded video:
+    python inference.py demo.mp4 --batch-sizes 1 4 8 16
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+TRACKER_CONFIG = "bytetrack.yaml"
+TRACK_COLUMNS = ("x1", "y1", "x2", "y2", "track_id", "confidence", "class_id")
+TRACKERS = ("ultralytics", "numpy")
+TRACKER = os.environ.get("PPE_TRACKER", "ultralytics")
+
+
+def empty_tracks():
+    return np.zeros((0, len(TRACK_COLUMNS)), dtype=np.float32)
+
+
+def results_to_tracks(result):
+    """Converts an ultralytics Results object from model.track into a track array."""
+    boxes = result.boxes
+    if boxes is None or boxes.id is None or len(boxes) == 0:
+        return empty_tracks()
+    return np.column_stack([
+        boxes.xyxy.cpu().numpy(),
+        boxes.id.cpu().numpy(),
+        boxes.conf.cpu().numpy(),
+        boxes.cls.cpu().numpy(),
+    ]).astype(np.float32)
+
+
+def load_tracker(config_path=TRACKER_CONFIG, frame_rate=30, kind=None):
+    """
+    Builds a ByteTrack instance the same way model.track(tracker=...) does.
+
+    Args:
+        kind: "ultralytics" (BYTETracker) or "numpy" (byte_tracker.ByteTracker,
+              same IDs without the per-track Python objects); default PPE_TRACKER
+    """
+    kind = kind or TRACKER
+    if kind == "numpy":
+        from byte_tracker import ByteTracker
+        return ByteTracker(config_path, frame_rate)
+    if kind != "ultralytics":
+        raise ValueError(f"Unknown tracker: {kind} (choose from {', '.join(TRACKERS)})")
+
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(config_path)))
+    return BYTETracker(args=cfg, frame_rate=frame_rate)
+
+
+class ArrayBoxes:
+    """
+    NumPy stand-in for ultralytics' Boxes: the attributes ByteTrack and the
+    app read (data, xyxy, xywh, conf, cls, id), and cpu() / numpy() that return
+    the boxes themselves, so code written for torch Boxes
+    (boxes.cpu().numpy().data) works on both.
+    """
+
+    def __init__(self, data, orig_shape):
+        data = np.asarray(data, dtype=np.float32)
+        self.data = data[None, :] if data.ndim == 1 else data
+        self.orig_shape = tuple(orig_shape)
+        self.id = None
+        self.is_track = False
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def xywh(self):
+        xyxy = self.data[:, :4]
+        return np.column_stack([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]])
+
+    @property
+    def conf(self):
+        return self.data[:, -2]
+
+    @property
+    def cls(self):
+        return self.data[:, -1]
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, idx):
+        return ArrayBoxes(self.data[idx], self.orig_shape)
+
+
+def boxes_from_array(det, orig_shape):
+    """Wraps an (N, 6) [x1, y1, x2, y2, conf, cls] array in the Boxes interface ByteTrack expects."""
+    return ArrayBoxes(np.asarray(det, dtype=np.float32).reshape(-1, 6), orig_shape)
+
+
+def is_torch_model(model):
+    """False for the ONNX backends, which take NumPy batches (and don't need torch)."""
+    from inference_backend import OnnxModel
+    return not isinstance(model, OnnxModel)
+
+
+def update_tracker(tracker, det, frame):
+    """
+    Feeds one frame's detections (ultralytics Boxes) to a ByteTrack instance
+    and returns the track array.
+    """
+    # model.track skips the tracker entirely on empty frames; do the same
+    # so ByteTrack's frame counter (and therefore track expiry) lines up.
+    if len(det) == 0:
+        return empty_tracks()
+    tracks = tracker.update(det, frame)
+    if len(tracks) == 0:
+        return empty_tracks()
+    return np.asarray(tracks, dtype=np.float32)[:, :len(TRACK_COLUMNS)]
+
+
+class SequentialTracker:
+    def __init__(self, model, tracker_config=TRACKER_CONFIG, **predict_kwargs):
+        """
+        One model.track(persist=True) call per frame (batch size 1).
+
+        Args:
+            model: Loaded YOLO model
+            tracker_config: ByteTrack yaml passed to model.track
+            predict_kwargs: conf, imgsz, classes, ... forwarded to model.track
+        """
+        self.model = model
+        self.tracker_config = tracker_config
+        self.predict_kwargs = predict_kwargs
+
+    def track_batch(self, frames):
+        return [
+            results_to_tracks(self.model.track(
+                frame,
+                persist=True,
+                tracker=self.tracker_config,
+                verbose=False,
+                **self.predict_kwargs
+            )[0])
+            for frame in frames
+        ]
+
+
+class BatchedTracker:
+    def __init__(self, model, batch_size=8, tracker_config=TRACKER_CONFIG,
+                 frame_rate=30, lock=None, preprocessor=None, **predict_kwargs):
+        """
+        Runs the detector on several frames per call, then feeds each frame's
+        boxes to ByteTrack in order. Track IDs match SequentialTracker because
+        the tracker sees exactly the same detections in the same order.
+
+        Args:
+            model: Loaded YOLO model
+            batch_size: Frames per detector call
+            tracker_config: ByteTrack yaml
+            frame_rate: Frame rate given to ByteTrack (model.track uses 30)
+            lock: Held around each detector call when the model is shared
+                  (see model_registry.ModelEntry.lock)
+            preprocessor: Optional preprocess.Preprocessor; frames are then
+                          letterboxed into its reused buffers and the model
+                          gets a ready tensor instead of raw frames
+            predict_kwargs: conf, imgsz, classes, ... forwarded to model.predict
+        """
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.tracker = load_tracker(tracker_config, frame_rate)
+        self.lock = lock or contextlib.nullcontext()
+        self.preprocessor = preprocessor
+        self.predict_kwargs = predict_kwargs
+
+    def track_batch(self, frames):
+        tracks = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            if self.preprocessor is not None:
+                tracks += self._track_preprocessed(chunk)
+                continue
+            with self.lock:
+                results = self.model.predict(chunk, verbose=False, **self.predict_kwargs)
+            for frame, result in zip(chunk, results):
+                tracks.append(update_tracker(self.tracker, result.boxes.cpu().numpy(), frame))
+        return tracks
+
+    def _track_preprocessed(self, chunk):
+        # Boxes come back in letterbox coordinates: map them to the frame
+        # before ByteTrack sees them, so tracking is the same as for raw frames
+        tracks = []
+        with self.lock:
+            batch = (self.preprocessor.tensor(chunk) if is_torch_model(self.model)
+                     else self.preprocessor(chunk))
+            results = self.model.predict(batch, verbose=False, **self.predict_kwargs)
+        for frame, result in zip(chunk, results):
+            det = self.preprocessor.unscale(result.boxes.cpu().numpy().data[:, :6].copy())
+            tracks.append(update_tracker(self.tracker, boxes_from_array(det, frame.shape[:2]), frame))
+        return tracks
+
+
+def read_frames(video_path, max_frames=300, frame_stride=3):
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    frame_idx = 0
+    while cap.isOpened() and len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_idx += 1
+        if frame_idx % frame_stride == 0:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def compare_batch_sizes(model_path, frames, batch_sizes=(1, 4, 8, 16), **predict_kwargs):
+    """
+    Measures frames/sec for each batch size on the same frames.
+    Returns a list of dicts; batch size 1 is the model.track baseline.
+    """
+    from ultralytics import YOLO
+
+    baseline = None
+    report = []
+    for batch_size in batch_sizes:
+        model = YOLO(model_path)  # fresh model so no tracker state carries over
+        model.predict(frames[:batch_size], verbose=False, **predict_kwargs)  # warm-up
+        if batch_size == 1:
+            tracker = SequentialTracker(model, **predict_kwargs)
+        else:
+            tracker = BatchedTracker(model, batch_size=batch_size, **predict_kwargs)
+
+        t0 = time.perf_counter()
+        tracks = tracker.track_batch(frames)
+        elapsed = time.perf_counter() - t0
+
+        ids = [t[:, 4].astype(int).tolist() for t in tracks]
+        if baseline is None:
+            baseline = ids
+        report.append({
+            "batch_size": batch_size,
+            "frames": len(frames),
+            "seconds": elapsed,
+            "fps": len(frames) / elapsed if elapsed else 0.0,
+            "ids_match_baseline": ids == baseline,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch size throughput comparison")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--conf", type=float, default=0.30)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.max_frames)
+    print(f"Loaded {len(frames)} sampled frames from {args.video}")
+
+    report = compare_batch_sizes(
+        args.model, frames, args.batch_sizes,
+        conf=args.conf, imgsz=640, classes=[0, 24, 25, 26, 27, 28]
+    )
+
+    print(f"\n{'batch':>6} {'fps':>8} {'speedup':>8} {'ids match':>10}")
+    base_fps = report[0]["fps"] or 1.0
+    for row in report:
+        print(f"{row['batch_size']:>6} {row['fps']:>8.2f} {row['fps'] / base_fps:>7.2f}x "
+              f"{str(row['ids_match_baseline']):>10}")
+
+
+if __name__ == "__main__":
+    main()
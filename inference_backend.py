@@ -0,0 +1,381 @@
+"""
+ONNX inference backends for CPU-only hosts.
+
+The weights are exported to ONNX once, cached by content hash, and run with
+ONNX Runtime or OpenCV's dnn module. OnnxModel has the parts of the
+ultralytics YOLO interface the app uses (predict / __call__ / names, results
+with .boxes), so model_registry can hand it out in place of the PyTorch model
+and BatchedTracker, Detector, PPEDetector and multi_stream work unchanged:
+
+    PPE_BACKEND=onnxruntime PPE_INFER_THREADS=4 streamlit run app.py
+
+Decoding follows ultralytics (confidence > conf, per-class NMS, max_det,
+boxes mapped back through the letterbox), so boxes, classes and confidences
+match the PyTorch path up to float rounding, and ByteTrack sees the same input.
+
+Run directly for a side-by-side latency / agreement benchmark:
+    python inference_backend.py demo.mp4 --weights yolov8n.pt --threads 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from preprocess import Preprocessor
+
+BACKENDS = ("torch", "onnxruntime", "opencv")
+CACHE_DIR = os.environ.get("PPE_ONNX_CACHE", "onnx_cache")
+EXPORT_IMGSZ = 640
+MAX_WH = 7680          # Class offset for batched NMS, as in ultralytics
+MAX_NMS = 30000        # Candidates kept before NMS, as in ultralytics
+
+
+def default_threads():
+    return int(os.environ.get("PPE_INFER_THREADS", 0)) or os.cpu_count() or 1
+
+
+def weights_hash(path, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+def cached_onnx_path(weights, imgsz=EXPORT_IMGSZ, dynamic=True, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    suffix = "dyn" if dynamic else "static"
+    return os.path.join(cache_dir, f"{stem}-{weights_hash(weights)}-{imgsz}-{suffix}.onnx")
+
+
+def export_onnx(weights, imgsz=EXPORT_IMGSZ, dynamic=True, cache_dir=CACHE_DIR):
+    """
+    Returns the cached ONNX export of weights, exporting it on first use.
+
+    The export runs on a private copy of the weights in a temp directory and
+    is moved into place last, so concurrent workers never read a half-written
+    file. Class names and export settings go in a .json next to it.
+    """
+    path = cached_onnx_path(weights, imgsz, dynamic, cache_dir)
+    if os.path.exists(path):
+        return path
+
+    from ultralytics import YOLO
+
+    os.makedirs(cache_dir, exist_ok=True)
+    workdir = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        copy = shutil.copy(weights, workdir)
+        model = YOLO(copy)
+        t0 = time.perf_counter()
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=dynamic, verbose=False)
+        with open(path + ".json", "w") as f:
+            json.dump({"weights": weights, "imgsz": imgsz, "dynamic": dynamic,
+                       "names": {int(k): v for k, v in model.names.items()}}, f)
+        os.replace(exported, path)
+        print(f"Exported {weights} to {path} in {time.perf_counter() - t0:.1f}s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return path
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS over xyxy boxes; indices of kept boxes, highest score first."""
+    order = np.argsort(-scores, kind="stable")
+    areas = np.prod(boxes[:, 2:4] - boxes[:, :2], axis=1)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        tl = np.maximum(boxes[i, :2], boxes[rest, :2])
+        br = np.minimum(boxes[i, 2:4], boxes[rest, 2:4])
+        inter = np.prod(np.clip(br - tl, 0, None), axis=1)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(pred, conf=0.25, iou=0.7, classes=None, max_det=300):
+    """
+    One image's raw YOLOv8/v5u output (4 + classes, anchors) to (N, 6)
+    [x1, y1, x2, y2, conf, cls] rows in network input coordinates.
+    """
+    pred = pred.T
+    scores = pred[:, 4:]
+    cls = scores.argmax(1)
+    best = scores[np.arange(len(cls)), cls]
+    keep = best > conf
+    if classes is not None:
+        keep &= np.isin(cls, classes)
+    xywh, best, cls = pred[keep, :4], best[keep], cls[keep]
+    if len(best) > MAX_NMS:
+        top = np.argsort(-best, kind="stable")[:MAX_NMS]
+        xywh, best, cls = xywh[top], best[top], cls[top]
+
+    boxes = np.empty((len(best), 4), dtype=np.float32)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    # Offsetting each class keeps NMS from suppressing across classes
+    kept = nms(boxes + (cls[:, None] * MAX_WH), best, iou)[:max_det]
+    return np.column_stack([boxes[kept], best[kept], cls[kept]]).astype(np.float32)
+
+
+class Result:
+    """The part of an ultralytics Results object the app reads."""
+
+    def __init__(self, det, orig_shape, names):
+        from inference import boxes_from_array
+
+        self.boxes = boxes_from_array(det, orig_shape)
+        self.orig_shape = orig_shape
+        self.names = names
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class OnnxModel:
+    def __init__(self, onnx_path, backend="onnxruntime", threads=None):
+        """
+        Runs an exported YOLO ONNX file on the CPU.
+
+        Not thread-safe (the letterbox buffers are reused); like any registry
+        model, use it under its ModelEntry.lock.
+
+        Args:
+            onnx_path: File from export_onnx (its .json gives names and imgsz)
+            backend: "onnxruntime" or "opencv"
+            threads: Intra-op threads (default: PPE_INFER_THREADS or all cores)
+        """
+        if backend not in ("onnxruntime", "opencv"):
+            raise ValueError(f"Unknown ONNX backend: {backend}")
+        with open(onnx_path + ".json") as f:
+            meta = json.load(f)
+        self.path = onnx_path
+        self.backend = backend
+        self.threads = threads or default_threads()
+        self.names = {int(k): v for k, v in meta["names"].items()}
+        self.imgsz = meta["imgsz"]
+        self.dynamic = meta["dynamic"]
+        self._preprocessors = {}
+
+        if backend == "onnxruntime":
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(onnx_path, options,
+                                                 providers=["CPUExecutionProvider"])
+            self._input = self._session.get_inputs()[0].name
+        else:
+            import cv2
+
+            cv2.setNumThreads(self.threads)   # Process-wide in OpenCV
+            self._net = cv2.dnn.readNetFromONNX(onnx_path)
+            self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def _forward(self, batch):
+        if self.backend == "onnxruntime":
+            return self._session.run(None, {self._input: batch})[0]
+        # Exports for cv2.dnn are static, batch 1
+        outputs = []
+        for image in batch:
+            self._net.setInput(image[None])
+            outputs.append(self._net.forward())
+        return np.concatenate(outputs)
+
+    def _fit(self, batch):
+        """Pads an already letterboxed batch to a static model's input shape."""
+        if self.dynamic:
+            return batch, (0, 0)
+        n, c, h, w = batch.shape
+        if h > self.imgsz or w > self.imgsz:
+            raise ValueError(f"Input {h}x{w} is larger than the exported {self.imgsz}x{self.imgsz}")
+        top, left = (self.imgsz - h) // 2, (self.imgsz - w) // 2
+        padded = np.full((n, c, self.imgsz, self.imgsz), 114 / 255, dtype=np.float32)
+        padded[:, :, top:top + h, left:left + w] = batch
+        return padded, (top, left)
+
+    def _preprocessor(self, imgsz):
+        pre = self._preprocessors.get(imgsz)
+        if pre is None:
+            pre = self._preprocessors[imgsz] = Preprocessor(
+                imgsz if self.dynamic else self.imgsz, square=not self.dynamic
+            )
+        return pre
+
+    def predict(self, source, conf=0.25, iou=0.7, imgsz=None, classes=None,
+                max_det=300, verbose=False, **_):
+        """
+        Same call as YOLO.predict for what the app passes: one frame, a list
+        of frames, or an already preprocessed (N, 3, H, W) float batch
+        (numpy or torch), whose boxes stay in batch coordinates like ultralytics.
+        """
+        if hasattr(source, "cpu"):
+            source = source.cpu().numpy()
+        if isinstance(source, np.ndarray) and source.ndim == 4 and source.dtype != np.uint8:
+            batch, (top, left) = self._fit(np.ascontiguousarray(source, dtype=np.float32))
+            out = self._forward(batch)
+            results = []
+            for pred in out:
+                det = decode_predictions(pred, conf, iou, classes, max_det)
+                det[:, [0, 2]] = (det[:, [0, 2]] - left).clip(0, source.shape[3])
+                det[:, [1, 3]] = (det[:, [1, 3]] - top).clip(0, source.shape[2])
+                results.append(Result(det, source.shape[2:], self.names))
+            return results
+
+        frames = [source] if isinstance(source, np.ndarray) and source.ndim == 3 else list(source)
+        pre = self._preprocessor(imgsz or self.imgsz)
+        results = []
+        # Consecutive frames of one size go through as one batch
+        start = 0
+        while start < len(frames):
+            end = start + 1
+            while end < len(frames) and frames[end].shape == frames[start].shape:
+                end += 1
+            chunk = frames[start:end]
+            out = self._forward(pre(chunk))
+            for pred, frame in zip(out, chunk):
+                det = pre.unscale(decode_predictions(pred, conf, iou, classes, max_det))
+                results.append(Result(det, frame.shape[:2], self.names))
+            start += len(chunk)
+        return results
+
+    __call__ = predict
+
+
+def int8_path(onnx_path):
+    """Where quantize.py puts the INT8 version of an export."""
+    return onnx_path[:-len(".onnx")] + "-int8.onnx"
+
+
+def load_backend(weights, backend="onnxruntime", threads=None, imgsz=EXPORT_IMGSZ, int8=None):
+    """
+    Exports (or reuses the cached export of) weights and loads it on backend.
+
+    Args:
+        int8: Load the INT8 model made by quantize.py instead of the FP32 export
+              (default: PPE_INT8=1 in the environment); ONNX Runtime only
+    """
+    if backend not in BACKENDS[1:]:
+        raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if int8 is None:
+        int8 = os.environ.get("PPE_INT8", "") not in ("", "0")
+    if int8 and backend != "onnxruntime":
+        raise ValueError("INT8 models run on the onnxruntime backend only")
+    # cv2.dnn gets a fixed-shape export; ONNX Runtime takes any batch and size
+    path = export_onnx(weights, imgsz, dynamic=backend == "onnxruntime")
+    if int8:
+        path = int8_path(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No INT8 model for {weights}; run: python quantize.py {weights} "
+                                    f"--calib <frames dir>")
+    return OnnxModel(path, backend, threads)
+
+
+def compare_backends(weights, frames, backends=BACKENDS, threads=None, repeats=1,
+                     **predict_kwargs):
+    """
+    Times each backend on the same frames (batch 1, the live-feed case) and
+    compares its boxes and ByteTrack ids with the PyTorch model's.
+    Returns a list of dicts; the first backend is the reference.
+    """
+    from benchmark import latency_summary
+    from inference import BatchedTracker
+
+    reference = None
+    report = []
+    for backend in backends:
+        t0 = time.perf_counter()
+        if backend == "torch":
+            from ultralytics import YOLO
+
+            if threads:
+                import torch
+                torch.set_num_threads(threads)
+            model = YOLO(weights)
+        else:
+            model = load_backend(weights, backend, threads)
+        load_seconds = time.perf_counter() - t0
+        model.predict(frames[0], verbose=False, **predict_kwargs)   # Warm-up
+
+        latencies = []
+        detections = []
+        for _ in range(repeats):
+            detections = []
+            for frame in frames:
+                t0 = time.perf_counter()
+                result = model.predict(frame, verbose=False, **predict_kwargs)[0]
+                latencies.append((time.perf_counter() - t0) * 1000)
+                detections.append(result.boxes.cpu().numpy().data[:, :6])
+        tracks = BatchedTracker(model, batch_size=1, **predict_kwargs).track_batch(frames)
+        ids = [t[:, 4].astype(int).tolist() for t in tracks]
+
+        row = {"backend": backend, "load_seconds": load_seconds,
+               "latency_ms": latency_summary(latencies)}
+        if reference is None:
+            reference = (detections, ids)
+        else:
+            row.update(agreement(reference[0], detections))
+            row["track_ids_match"] = ids == reference[1]
+        report.append(row)
+    return report
+
+
+def agreement(expected, actual):
+    """Box count / class agreement and the largest box corner difference (px)."""
+    same_count = sum(len(a) == len(b) for a, b in zip(expected, actual))
+    same_cls, max_px = 0, 0.0
+    for a, b in zip(expected, actual):
+        if len(a) != len(b) or not len(a):
+            same_cls += len(a) == len(b)
+            continue
+        a, b = a[np.lexsort(a[:, :4].T)], b[np.lexsort(b[:, :4].T)]
+        same_cls += bool(np.array_equal(a[:, 5], b[:, 5]))
+        max_px = max(max_px, float(np.abs(a[:, :4] - b[:, :4]).max()))
+    return {"frames_same_count": same_count / len(expected),
+            "frames_same_classes": same_cls / len(expected),
+            "max_box_diff_px": max_px}
+
+
+def main():
+    from inference import read_frames
+    from association import DETECTION_CLASSES
+
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX backend latency and agreement")
+    parser.add_argument("video")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads per backend")
+    parser.add_argument("--max-frames", type=int, default=100)
+    parser.add_argument("--conf", type=float, default=0.30)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.max_frames)
+    print(f"Loaded {len(frames)} sampled frames from {args.video}")
+    report = compare_backends(args.weights, frames, args.backends, args.threads,
+                              conf=args.conf, imgsz=640, classes=DETECTION_CLASSES)
+
+    print(f"\n{'backend':<12} {'load s':>7} {'p50 ms':>7} {'p90 ms':>7} {'speedup':>8} "
+          f"{'same boxes':>11} {'max px':>7} {'ids match':>10}")
+    base = report[0]["latency_ms"]["p50"] or 1.0
+    for row in report:
+        lat = row["latency_ms"]
+        print(f"{row['backend']:<12} {row['load_seconds']:>7.1f} {lat['p50']:>7.1f} {lat['p90']:>7.1f} "
+              f"{base / lat['p50'] if lat['p50'] else 0:>7.2f}x "
+              f"{row.get('frames_same_count', 1.0):>10.0%} {row.get('max_box_diff_px', 0.0):>7.2f} "
+              f"{str(row.get('track_ids_match', True)):>10}")
+
+
+if __name__ == "__main__":
+    main()
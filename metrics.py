@@ -0,0 +1,292 @@
+"""
+Per-stage timings and counters for the detection loop.
+
+Disabled by default. Enable with PPE_METRICS=1 (or metrics.enable()); while
+disabled every call returns after a single flag check, so the hooks can stay
+in the hot path.
+
+Exposed three ways:
+  - Prometheus text format over HTTP:  PPE_METRICS_PORT=9108 -> /metrics
+  - Prometheus text file (node_exporter textfile collector):
+        PPE_METRICS_FILE=/var/lib/node_exporter/ppe.prom
+  - overlay_text() for a compact line in the UI
+
+Stages: decode, inference, detect, association, compliance, annotate,
+display, db_log (synchronous insert), db_write (writer batch).
+"""
+
+import bisect
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OVERLAY_STAGES = ("decode", "inference", "association", "compliance", "annotate", "display", "db_write")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)  # seconds
+
+HELP = {
+    "ppe_stage_seconds": ("histogram", "Time spent per detection loop stage"),
+    "ppe_frames_read_total": ("counter", "Frames decoded (including skipped frames)"),
+    "ppe_frames_processed_total": ("counter", "Frames run through the detector"),
+    "ppe_frames_dropped_total": ("counter", "Frames dropped by a full pipeline queue"),
+    "ppe_frames_gated_total": ("counter", "Sampled frames the motion gate kept from the detector"),
+    "ppe_tracks_alive": ("gauge", "Persons tracked in the last processed frame"),
+    "ppe_violations_logged_total": ("counter", "Violations written to the database"),
+}
+
+_enabled = os.environ.get("PPE_METRICS", "") not in ("", "0")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, smoothing=0.1):
+        """
+        Cumulative-bucket histogram plus an EWMA of recent values for the overlay.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.smoothing = smoothing
+        self.recent = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if self.recent is None:
+            self.recent = value
+        else:
+            self.recent += self.smoothing * (value - self.recent)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}   # (name, labels) -> Histogram
+        self.counters = {}     # (name, labels) -> float
+        self.gauges = {}       # (name, labels) -> float
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=()):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            histograms = {k: (list(h.counts), h.sum, h.count, h.buckets)
+                          for k, h in self.histograms.items()}
+            scalars = list(self.counters.items()) + list(self.gauges.items())
+
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described and name in HELP:
+                kind, text = HELP[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            describe(name)
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for (name, labels), value in sorted(scalars):
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+REGISTRY = Registry()
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+class _StageTimer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe("ppe_stage_seconds", time.perf_counter() - self.t0,
+                         (("stage", self.stage),))
+        return False
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def timed(stage):
+    """Context manager timing one stage: `with metrics.timed("association"): ...`"""
+    if not _enabled:
+        return _NOOP
+    return _StageTimer(stage)
+
+
+def observe_stage(stage, seconds):
+    """Records a stage duration measured elsewhere."""
+    if _enabled:
+        REGISTRY.observe("ppe_stage_seconds", seconds, (("stage", stage),))
+
+
+def inc(name, value=1, **labels):
+    if _enabled:
+        REGISTRY.inc(name, value, tuple(sorted(labels.items())))
+
+
+def set_gauge(name, value, **labels):
+    if _enabled:
+        REGISTRY.set(name, value, tuple(sorted(labels.items())))
+
+
+def stage_ms(stage):
+    """Recent (EWMA) duration of a stage in ms, or None if never recorded."""
+    hist = REGISTRY.histograms.get(("ppe_stage_seconds", (("stage", stage),)))
+    return None if hist is None or hist.recent is None else hist.recent * 1000
+
+
+def overlay_text(stages=OVERLAY_STAGES):
+    """One compact line of recent stage timings, e.g. 'decode 2.1 | inference 38.0 ms'."""
+    parts = []
+    for stage in stages:
+        ms = stage_ms(stage)
+        if ms is not None:
+            parts.append(f"{stage} {ms:.1f}")
+    if not parts:
+        return ""
+    dropped = sum(v for (name, _), v in list(REGISTRY.counters.items())
+                  if name == "ppe_frames_dropped_total")
+    tracks = REGISTRY.gauges.get(("ppe_tracks_alive", ()), 0)
+    logged = REGISTRY.counters.get(("ppe_violations_logged_total", ()), 0)
+    return (" | ".join(parts) + f" ms | dropped {int(dropped)} | tracks {int(tracks)} "
+            f"| logged {int(logged)}")
+
+
+def render():
+    return REGISTRY.render()
+
+
+def write_textfile(path):
+    """Writes the exposition atomically so a collector never reads half a file."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Scrapes would flood the console
+
+
+def start_http_server(port=9108, addr="127.0.0.1"):
+    """Serves /metrics from a daemon thread; one server per port per process."""
+    with _servers_lock:
+        key = ("http", addr, port)
+        if key not in _servers:
+            server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="ppe-metrics-http",
+                             daemon=True).start()
+            _servers[key] = server
+        return _servers[key]
+
+
+def start_textfile_writer(path, interval=5.0):
+    """Rewrites the text file every interval seconds from a daemon thread."""
+    def loop():
+        while True:
+            try:
+                write_textfile(path)
+            except OSError as e:
+                print(f"Metrics file error: {e}")
+            time.sleep(interval)
+
+    with _servers_lock:
+        key = ("file", path)
+        if key not in _servers:
+            thread = threading.Thread(target=loop, name="ppe-metrics-file", daemon=True)
+            thread.start()
+            _servers[key] = thread
+        return _servers[key]
+
+
+def exporting():
+    """True once an HTTP or text-file exporter runs; those need metrics kept enabled."""
+    with _servers_lock:
+        return bool(_servers)
+
+
+def start_from_env():
+    """Starts the exporters configured by PPE_METRICS_PORT / PPE_METRICS_FILE (enables metrics)."""
+    port = os.environ.get("PPE_METRICS_PORT")
+    path = os.environ.get("PPE_METRICS_FILE")
+    if port:
+        enable()
+        start_http_server(int(port), os.environ.get("PPE_METRICS_ADDR", "127.0.0.1"))
+    if path:
+        enable()
+        start_textfile_writer(path)
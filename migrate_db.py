@@ -1,20 +1,19 @@
 import sqlite3
-from database import DB_NAME
+from database import DB_NAME, SCHEMA_VERSION, migrate_schema
 
 def migrate_db():
     conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
     
     try:
-        c.execute("ALTER TABLE violations ADD COLUMN source TEXT")
-        print("Migrated 'violations' table: Added 'source' column.")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e):
-            print("'source' column already exists.")
+        old, new = migrate_schema(conn)
+        if old >= SCHEMA_VERSION:
+            print(f"'violations' table already at schema version {old}.")
         else:
-            print(f"Error migrating DB: {e}")
+            print(f"Migrated 'violations' table: schema version {old} -> {new} "
+                  "(source/date/missing_mask columns, indexes).")
+    except sqlite3.OperationalError as e:
+        print(f"Error migrating DB: {e}")
             
-    conn.commit()
     conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+"""
+Process-wide registry of loaded YOLO models.
+
+Each weights file is loaded (and warmed up) once per process and shared by
+every Streamlit session and detector. Shared models must only be used for
+prediction under their lock; tracking state belongs to the caller (see
+inference.BatchedTracker), never to the model object, so don't call
+model.track on a registry model.
+
+PPE_BACKEND=onnxruntime (or opencv) loads every model through
+inference_backend instead of PyTorch: exported to ONNX once, cached, and run
+on the CPU with PPE_INFER_THREADS intra-op threads. PPE_INT8=1 loads the
+INT8 models made by quantize.py instead. A path ending in .onnx (e.g. a
+quantized model) is always loaded through inference_backend.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+# Tried in order of preference by get_model()
+MODEL_CANDIDATES = [
+    "yolov5su.pt",           # Recommended YOLOv5 small updated model
+    "yolov8n_ppe.pt",        # Pre-trained PPE model (if downloaded)
+    "yolov5s.pt",            # Downloaded YOLOv5 small
+    "runs/detect/train2/weights/best.pt",
+    "runs/detect/train11/weights/best.pt",
+    "runs/detect/train10/weights/best.pt",
+    "runs/detect/train9/weights/best.pt",
+    "yolov8n.pt"  # fallback
+]
+DEFAULT_MODEL = "yolov8n.pt"
+WARMUP_IMGSZ = 640
+BACKEND = os.environ.get("PPE_BACKEND", "torch")   # torch | onnxruntime | opencv
+
+
+class ModelEntry:
+    def __init__(self, path, model, load_seconds):
+        """
+        A loaded model plus load/warm-up timings.
+
+        Attributes:
+            lock: Hold while running inference; ultralytics predictors are not thread-safe
+        """
+        self.path = path
+        self.model = model
+        self.load_seconds = load_seconds
+        self.warmup_seconds = 0.0
+        self.lock = threading.RLock()
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {
+            "path": self.path,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "backend": getattr(self.model, "backend", "torch"),
+        }
+
+
+_entries = {}
+_failed = set()
+_path_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _load_weights(path):
+    if path.endswith(".onnx"):
+        from inference_backend import OnnxModel
+        return OnnxModel(path, BACKEND if BACKEND != "torch" else "onnxruntime")
+    if BACKEND != "torch":
+        from inference_backend import load_backend
+        return load_backend(path, BACKEND)
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+def _warm_up(entry, imgsz=WARMUP_IMGSZ):
+    """One dummy inference so the first real frame doesn't pay for predictor setup."""
+    t0 = time.perf_counter()
+    with entry.lock:
+        entry.model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8),
+                            imgsz=imgsz, verbose=False)
+    entry.warmup_seconds = time.perf_counter() - t0
+
+
+def load_model(path, warmup=True):
+    """Returns the shared ModelEntry for a weights file, loading it on first use."""
+    entry = _entries.get(path)
+    if entry is not None:
+        return entry
+
+    with _registry_lock:
+        path_lock = _path_locks.setdefault(path, threading.Lock())
+
+    # Per-path lock: concurrent sessions wait for one load instead of each
+    # loading their own copy, while different models can load in parallel.
+    with path_lock:
+        entry = _entries.get(path)
+        if entry is not None:
+            return entry
+
+        t0 = time.perf_counter()
+        model = _load_weights(path)
+        entry = ModelEntry(path, model, time.perf_counter() - t0)
+        if warmup:
+            _warm_up(entry)
+        print(f"Loaded model {path} in {entry.load_seconds:.2f}s "
+              f"(warm-up {entry.warmup_seconds:.2f}s)")
+        _entries[path] = entry
+        return entry
+
+
+def get_model(candidates=MODEL_CANDIDATES, warmup=True):
+    """
+    Loads the preferred detection model, falling back through the candidate
+    list when a file fails to load.
+    """
+    for path in candidates:
+        if path in _entries:
+            return _entries[path]
+        if path in _failed or not os.path.exists(path):
+            continue
+        try:
+            return load_model(path, warmup)
+        except Exception as e:
+            print(f"Failed to load {path}: {e}")
+            _failed.add(path)
+            continue
+
+    print("No model found, using default YOLOv8n")
+    return load_model(DEFAULT_MODEL, warmup)
+
+
+def loaded_models():
+    """Info for every model loaded in this process."""
+    return [entry.info() for entry in _entries.values()]
@@ -0,0 +1,197 @@
+"""
+Motion gate: skips the detector on sampled frames where nothing has moved.
+
+Each frame is shrunk to a small thumbnail and compared with the previous
+one. While nobody is being tracked and the thumbnail hasn't changed,
+the frame is treated as if the detector had found nothing, which costs about a
+millisecond even at 4K instead of a full model call.
+
+Run directly to see how much inference a recorded video would skip:
+    python motion_gate.py bay_3.mp4 --stride 3
+"""
+
+import argparse
+import time
+
+import cv2
+
+import metrics
+from inference import empty_tracks
+
+GATE_WIDTH = 160          # Thumbnail width the difference is computed on
+PIXEL_THRESHOLD = 25      # Change (0-255, any channel) for a thumbnail pixel to count as moved
+MIN_CHANGED = 0.002       # Fraction of moved pixels that counts as motion
+KEEPALIVE_FRAMES = 15     # Run the detector at least this often, motion or not
+
+
+class MotionGate:
+    def __init__(self, width=GATE_WIDTH, pixel_threshold=PIXEL_THRESHOLD,
+                 min_changed=MIN_CHANGED, keepalive=KEEPALIVE_FRAMES, blur=5):
+        """
+        Decides per sampled frame whether the detector needs to run.
+
+        Args:
+            width: Thumbnail width; height follows the frame's aspect ratio
+            pixel_threshold: Per-pixel difference (largest channel) treated as change
+            min_changed: Fraction of changed pixels that counts as motion
+                         (0.002 of a 160x90 thumbnail is ~29 pixels)
+            keepalive: Frames that may be skipped in a row before the detector
+                       runs anyway, so someone standing still in a doorway
+                       is not missed forever
+            blur: Gaussian kernel for sensor noise (odd, 0 = off)
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.keepalive = keepalive
+        self.blur = blur
+
+        self._reference = None
+        self._skipped_in_row = 0
+        self.frames = 0
+        self.skipped = 0
+        self.gate_seconds = 0.0
+        self.last_motion = 0.0
+
+    def thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        # Plain subsampling down to ~2x the thumbnail first: INTER_AREA over a
+        # full 4K frame costs >10 ms, over the subsampled view well under 1 ms
+        step = max(1, w // (2 * self.width))
+        small = cv2.resize(frame[::step, ::step], size, interpolation=cv2.INTER_AREA)
+        if self.blur:
+            small = cv2.GaussianBlur(small, (self.blur, self.blur), 0)
+        return small
+
+    def motion(self, frame):
+        """Fraction of thumbnail pixels that changed since the previous frame (1.0 for the first)."""
+        small = self.thumbnail(frame)
+        reference, self._reference = self._reference, small
+        if reference is None or reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, reference)
+        if diff.ndim == 3:
+            # Largest change over the colour channels rather than grayscale:
+            # a blue jacket on a grey floor can have the same luminance
+            diff = diff.max(axis=2)
+        return cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255,
+                                              cv2.THRESH_BINARY)[1]) / diff.size
+
+    def should_infer(self, frame, tracking=False):
+        """
+        True if the detector has to run on this frame.
+
+        Args:
+            tracking: Tracks were alive after the last inferred frame. Those
+                      frames always run: a person standing still must keep
+                      being checked, and ByteTrack must keep seeing them.
+        """
+        t0 = time.perf_counter()
+        self.last_motion = self.motion(frame)
+        infer = (tracking
+                 or self.last_motion >= self.min_changed
+                 or self._skipped_in_row >= self.keepalive)
+        elapsed = time.perf_counter() - t0
+
+        self.frames += 1
+        self.gate_seconds += elapsed
+        metrics.observe_stage("motion_gate", elapsed)
+        if infer:
+            self._skipped_in_row = 0
+        else:
+            self._skipped_in_row += 1
+            self.skipped += 1
+            metrics.inc("ppe_frames_gated_total")
+        return infer
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skipped_fraction": self.skipped / self.frames if self.frames else 0.0,
+            "avg_gate_ms": 1000 * self.gate_seconds / max(self.frames, 1),
+        }
+
+
+class GatedTracker:
+    def __init__(self, tracker, gate=None):
+        """
+        Wraps a tracker (inference.BatchedTracker or anything with
+        track_batch) so idle, motionless frames never reach it.
+
+        A skipped frame returns an empty track array without touching
+        ByteTrack, which is exactly what update_tracker does when the
+        detector finds nothing, so track IDs and expiry stay consistent.
+        Frames are only skipped while nothing is tracked.
+        """
+        self.tracker = tracker
+        self.gate = gate or MotionGate()
+        self.tracking = False
+
+    def track_batch(self, frames):
+        # Frames before the first one that needs the detector are skipped;
+        # from there the rest of the batch runs, in order, as one call.
+        first = len(frames)
+        for i, frame in enumerate(frames):
+            if self.gate.should_infer(frame, self.tracking or i > first):
+                first = min(first, i)
+
+        results = [empty_tracks() for _ in frames[:first]]
+        if first < len(frames):
+            results += self.tracker.track_batch(frames[first:])
+            self.tracking = len(results[-1]) > 0
+        return results
+
+    def stats(self):
+        return self.gate.stats()
+
+
+def gate_video(video_path, stride=3, max_frames=None, **gate_kwargs):
+    """
+    Runs only the gate over a video (no model) and reports how many sampled
+    frames it would let through. Nothing is tracked, so this is the idle-scene
+    case: the upper bound on what the gate saves.
+    """
+    gate = MotionGate(**gate_kwargs)
+    cap = cv2.VideoCapture(video_path)
+    frame_idx = 0
+    try:
+        while max_frames is None or gate.frames < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_idx += 1
+            if frame_idx % stride == 0:
+                gate.should_infer(frame)
+    finally:
+        cap.release()
+    return gate.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fraction of frames the motion gate would skip")
+    parser.add_argument("video")
+    parser.add_argument("--stride", type=int, default=3, help="Sample every Nth frame, like the app")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--width", type=int, default=GATE_WIDTH)
+    parser.add_argument("--min-changed", type=float, default=MIN_CHANGED)
+    parser.add_argument("--inference-ms", type=float, default=None,
+                        help="Measured detector ms/frame, to estimate the time saved")
+    args = parser.parse_args()
+
+    stats = gate_video(args.video, args.stride, args.max_frames,
+                       width=args.width, min_changed=args.min_changed)
+    print(f"Sampled frames: {stats['frames']}")
+    print(f"Skipped:        {stats['skipped']} ({stats['skipped_fraction']:.0%})")
+    print(f"Gate cost:      {stats['avg_gate_ms']:.2f} ms/frame")
+    if args.inference_ms:
+        before = stats["frames"] * args.inference_ms
+        after = (stats["frames"] - stats["skipped"]) * args.inference_ms \
+            + stats["frames"] * stats["avg_gate_ms"]
+        print(f"Detector time:  {before / 1000:.1f}s -> {after / 1000:.1f}s "
+              f"({before / after if after else float('inf'):.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
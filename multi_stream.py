@@ -0,0 +1,512 @@
+"""
+Multi-camera fan-in.
+
+Every source (RTSP URL or video file) gets its own worker process that
+decodes, tracks and logs violations with its own ByteTrack, ComplianceState
+and ViolationManager, so nothing is shared between cameras. Detection runs in
+a small pool of inference processes shared by all cameras: stream workers
+send downscaled frames to one request queue and each inference worker batches
+whatever is waiting (across cameras) into a single model.predict call.
+
+Run directly for a headless multi-camera session:
+    python multi_stream.py rtsp://cam1/stream rtsp://cam2/stream
+    python multi_stream.py --sources-file site_cameras.txt
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import time
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+from compliance import BASE_STRIDE
+
+STATS_INTERVAL = 2.0      # Seconds between per-camera stats reports
+MAX_IN_FLIGHT = 2         # Frames per camera waiting on the inference pool
+RECONNECT_DELAY = 2.0     # Seconds before reopening a dropped live feed
+LIVE_PREFIXES = ("rtsp://", "rtmp://", "http://", "https://")
+INFERENCE_STATS = -1      # stats_queue key for inference worker errors
+ACTIVE_STATUSES = ("pending", "starting", "running", "reconnecting")
+
+DEFAULT_PREDICT_KWARGS = dict(conf=0.30, imgsz=640)
+DEFAULT_PERSON_CONF = 0.35
+DEFAULT_PPE_CONF = 0.30
+
+
+def is_live_source(source):
+    return str(source).lower().startswith(LIVE_PREFIXES)
+
+
+def source_label(source):
+    """
+    Source name for logs and the violations table, without any URL credentials.
+    Files keep their path, so same-named files in different folders stay apart.
+    """
+    source = str(source)
+    if not is_live_source(source):
+        return os.path.normpath(source)
+    parts = urlsplit(source)
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path, parts.query, ""))
+
+
+def downscale(frame, long_side):
+    """Shrinks a frame so its long side is at most long_side; returns (frame, scale)."""
+    import cv2
+    import numpy as np
+
+    h, w = frame.shape[:2]
+    scale = long_side / max(h, w)
+    if scale >= 1.0:
+        return frame, 1.0
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+
+def _inference_worker(model_path, requests, responses, stats_queue, stop_event,
+                      batch_size, threads, predict_kwargs):
+    """
+    Serves detection requests from every stream, batching across cameras.
+
+    Responses are (frame_idx, detections, error): a failed model.predict is
+    answered with (frame_idx, None, message) for each frame in the batch, so
+    no stream waits forever; a model that can't be loaded is reported on
+    stats_queue before the worker exits.
+    """
+    if threads:
+        # ONNX backends read this when the model is loaded (model_registry)
+        os.environ.setdefault("PPE_INFER_THREADS", str(threads))
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    from model_registry import load_model, get_model
+
+    try:
+        entry = load_model(model_path) if model_path else get_model()
+    except Exception as e:
+        stats_queue.put((INFERENCE_STATS, f"Model load failed: {e}"))
+        raise
+    model = entry.model
+
+    running = True
+    while running and not stop_event.is_set():
+        try:
+            item = requests.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if item is None:
+            break
+
+        batch = [item]
+        while len(batch) < batch_size:
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                running = False
+                break
+            batch.append(item)
+
+        try:
+            results = model.predict([req[2] for req in batch], verbose=False, **predict_kwargs)
+            dets = []
+            for (_, _, _, scale), result in zip(batch, results):
+                det = result.boxes.cpu().numpy().data[:, :6].copy()  # x1, y1, x2, y2, conf, cls
+                det[:, :4] /= scale
+                dets.append(det)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            for stream_idx, frame_idx, _, _ in batch:
+                responses[stream_idx].put((frame_idx, None, error))
+            continue
+        for (stream_idx, frame_idx, _, _), det in zip(batch, dets):
+            responses[stream_idx].put((frame_idx, det, None))
+
+
+def _stream_worker(stream_idx, source, requests, response_queue, stats_queue,
+                   stop_event, options):
+    """Decodes one source, sends frames to the inference pool and owns all per-camera state."""
+    import cv2
+    import numpy as np
+
+    from association import associate, UMBRELLA, BACKPACK, HANDBAG
+    from compliance import ComplianceState
+    from frame_sampler import AdaptiveSampler
+    from inference import load_tracker, update_tracker, boxes_from_array
+    from motion_gate import MotionGate
+    from video_utils import format_video_time
+    from violation_manager import ViolationManager
+    from violation_writer import get_violation_writer
+
+    label = source_label(source)
+    live = is_live_source(source)
+    stats = {
+        "source": label,
+        "status": "starting",
+        "frames_read": 0,
+        "frames_processed": 0,
+        "people": 0,
+        "violations_logged": 0,
+        "avg_latency_ms": 0.0,
+        "processed_fps": 0.0,
+        "reconnects": 0,
+        "gated_frames": 0,
+    }
+    latency_total = 0.0
+    started = time.perf_counter()
+    last_report = 0.0
+
+    def report(status=None, force=False):
+        nonlocal last_report
+        now = time.perf_counter()
+        if not force and now - last_report < options["stats_interval"]:
+            return
+        last_report = now
+        if status:
+            stats["status"] = status
+        elapsed = now - started
+        stats["processed_fps"] = stats["frames_processed"] / elapsed if elapsed else 0.0
+        stats["decode_fps"] = stats["frames_read"] / elapsed if elapsed else 0.0
+        stats_queue.put((stream_idx, dict(stats)))
+
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    tracker = load_tracker()
+    compliance = ComplianceState()
+    manager = ViolationManager(cooldown_seconds=3, log_once_per_session=True,
+                               tracks=compliance.tracks, source=label)
+    sampler = AdaptiveSampler(base_stride=BASE_STRIDE, max_stride=4 * BASE_STRIDE,
+                              source_fps=fps, realtime=live)
+    writer = get_violation_writer()
+    gate = MotionGate() if options["motion_gate"] else None
+    tracking = False     # Tracks alive after the last processed frame
+    no_detections = np.zeros((0, 6), dtype=np.float32)
+
+    pending = deque()    # (frame_idx, frame, sent_at) in send order
+    ready = {}           # frame_idx -> detections, may arrive out of order
+    frame_idx = 0
+    last_processed = 0
+    eof = False
+
+    try:
+        report("running", force=True)
+        while not stop_event.is_set():
+            while not eof and len(pending) < options["max_in_flight"]:
+                for _ in range(sampler.stride - 1):
+                    if cap.grab():
+                        frame_idx += 1
+                        stats["frames_read"] += 1
+                ret, frame = cap.read()
+                if not ret:
+                    if live and not stop_event.is_set():
+                        # Camera dropped; reopen instead of ending the stream
+                        report("reconnecting", force=True)
+                        cap.release()
+                        time.sleep(options["reconnect_delay"])
+                        cap = cv2.VideoCapture(source)
+                        stats["reconnects"] += 1
+                        report("running", force=True)
+                        continue
+                    eof = True
+                    break
+                frame_idx += 1
+                stats["frames_read"] += 1
+                if gate is not None and not gate.should_infer(frame, tracking):
+                    # Same as the detector finding nothing; ByteTrack isn't touched
+                    ready[frame_idx] = no_detections
+                    stats["gated_frames"] += 1
+                else:
+                    small, scale = downscale(frame, options["imgsz"])
+                    requests.put((stream_idx, frame_idx, small, scale))
+                pending.append((frame_idx, frame, time.perf_counter()))
+
+            if not pending:
+                break
+
+            while pending[0][0] not in ready:
+                try:
+                    idx, det, error = response_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        return
+                    continue
+                if error is not None:
+                    raise RuntimeError(f"Inference failed: {error}")
+                ready[idx] = det
+
+            idx, frame, sent_at = pending.popleft()
+            det = ready.pop(idx)
+            tracks = update_tracker(tracker, boxes_from_array(det, frame.shape[:2]), frame)
+            tracking = len(tracks) > 0
+            latency_ms = (time.perf_counter() - sent_at) * 1000
+            latency_total += latency_ms
+            stats["frames_processed"] += 1
+            stats["avg_latency_ms"] = latency_total / stats["frames_processed"]
+
+            stride = idx - last_processed
+            last_processed = idx
+            people = associate(
+                tracks, options["person_conf"], options["ppe_conf"],
+                helmet_cls=UMBRELLA, vest_cls=BACKPACK, boots_cls=HANDBAG
+            )
+            stats["people"] = len(people.ids)
+
+            video_time = (time.strftime("%H:%M:%S") if live
+                          else format_video_time(idx / fps))
+            logged = False
+            confirmed = [(pid, missing) for pid, _, missing, ok
+                         in compliance.update(people, stride) if ok]
+            for (pid, missing), log in zip(confirmed, manager.should_log_many(confirmed, label)):
+                if log:
+                    writer.submit(pid, missing, video_time, label)
+                    stats["violations_logged"] += 1
+                    logged = True
+
+            sampler.update(latency_ms, len(people.ids),
+                           logged or compliance.pending_violations())
+            report()
+
+        writer.flush()
+        report("stopped" if stop_event.is_set() else "finished", force=True)
+    except Exception as e:
+        stats["error"] = str(e)
+        report("failed", force=True)
+        raise
+    finally:
+        cap.release()
+
+
+class MultiStreamRunner:
+    def __init__(self, sources, model_path=None, inference_workers=None, batch_size=8,
+                 max_in_flight=MAX_IN_FLIGHT, person_conf=DEFAULT_PERSON_CONF,
+                 ppe_conf=DEFAULT_PPE_CONF, stats_interval=STATS_INTERVAL,
+                 reconnect_delay=RECONNECT_DELAY, motion_gate=True, **predict_kwargs):
+        """
+        Runs one worker process per source plus a shared pool of inference
+        processes.
+
+        Args:
+            sources: RTSP URLs and/or video files
+            model_path: Weights for the inference pool (None = model_registry.get_model())
+            inference_workers: Inference processes (default: a quarter of the cores)
+            batch_size: Max frames, across all cameras, per detector call
+            max_in_flight: Frames each camera may have queued for inference
+            person_conf / ppe_conf: Association thresholds, as in app.py
+            stats_interval: Seconds between per-camera stats reports
+            reconnect_delay: Seconds before reopening a dropped live feed
+            motion_gate: Skip inference on motionless frames while nothing
+                         is tracked (see motion_gate.MotionGate)
+            predict_kwargs: conf, imgsz, classes, ... forwarded to model.predict
+        """
+        from association import DETECTION_CLASSES
+
+        if not sources:
+            raise ValueError("At least one source is required")
+        labels = [source_label(s) for s in sources]
+        repeated = sorted({label for label in labels if labels.count(label) > 1})
+        if repeated:
+            # Their stats and violations would be logged under one name
+            raise ValueError(f"Sources listed more than once: {', '.join(repeated)}")
+
+        cores = os.cpu_count() or 1
+        self.sources = list(sources)
+        self.model_path = model_path
+        self.inference_workers = max(1, inference_workers or cores // 4)
+        self.batch_size = max(1, int(batch_size))
+        self.predict_kwargs = {**DEFAULT_PREDICT_KWARGS, "classes": DETECTION_CLASSES,
+                               **predict_kwargs}
+        self.options = {
+            "max_in_flight": max(1, int(max_in_flight)),
+            "person_conf": person_conf,
+            "ppe_conf": ppe_conf,
+            "imgsz": self.predict_kwargs["imgsz"],
+            "stats_interval": stats_interval,
+            "reconnect_delay": reconnect_delay,
+            "motion_gate": motion_gate,
+        }
+        self.threads_per_worker = max(1, cores // self.inference_workers)
+
+        self._ctx = mp.get_context("spawn")  # CUDA and torch threads don't survive fork
+        self._stop = self._ctx.Event()
+        self._requests = self._ctx.Queue(
+            maxsize=len(self.sources) * self.options["max_in_flight"]
+        )
+        self._responses = [self._ctx.Queue() for _ in self.sources]
+        self._stats_queue = self._ctx.Queue()
+        self._inference = []
+        self._streams = []
+        self.stream_stats = {i: {"source": source_label(s), "status": "pending"}
+                             for i, s in enumerate(self.sources)}
+        self.started_at = None
+        self.error = None        # Why the inference pool stopped, if it did
+
+    def start(self):
+        for _ in range(self.inference_workers):
+            proc = self._ctx.Process(
+                target=_inference_worker,
+                args=(self.model_path, self._requests, self._responses, self._stats_queue, self._stop,
+                      self.batch_size, self.threads_per_worker, self.predict_kwargs),
+                daemon=True,
+            )
+            proc.start()
+            self._inference.append(proc)
+
+        for i, source in enumerate(self.sources):
+            proc = self._ctx.Process(
+                target=_stream_worker,
+                args=(i, source, self._requests, self._responses[i], self._stats_queue,
+                      self._stop, self.options),
+                daemon=True,
+            )
+            proc.start()
+            self._streams.append(proc)
+        self.started_at = time.perf_counter()
+        return self
+
+    def inference_failed(self):
+        """
+        True once an inference worker has exited before stop(): the frames
+        it had taken are never answered, so the cameras waiting on them
+        can't make progress.
+        """
+        return not self._stop.is_set() and any(
+            not proc.is_alive() and proc.exitcode is not None for proc in self._inference
+        )
+
+    def is_alive(self):
+        """True while any camera is still being processed."""
+        if self.inference_failed():
+            return False
+        return any(proc.is_alive() for proc in self._streams)
+
+    def poll_stats(self):
+        """Latest stats per camera, in source order."""
+        while True:
+            try:
+                idx, stats = self._stats_queue.get_nowait()
+            except queue.Empty:
+                break
+            if idx == INFERENCE_STATS:
+                self.error = stats
+                continue
+            self.stream_stats[idx] = stats
+        if self.inference_failed() and self.error is None:
+            codes = ", ".join(str(p.exitcode) for p in self._inference if not p.is_alive())
+            self.error = f"Inference worker exited ({codes})"
+        for idx, proc in enumerate(self._streams):
+            stats = self.stream_stats[idx]
+            if stats.get("status") not in ACTIVE_STATUSES:
+                continue
+            if self.error is not None:
+                stats["status"] = "failed"
+                stats["error"] = self.error
+            elif not proc.is_alive() and proc.exitcode is not None:
+                stats["status"] = f"exited ({proc.exitcode})"
+        return [self.stream_stats[i] for i in range(len(self.sources))]
+
+    def totals(self):
+        """Aggregate throughput over all cameras."""
+        rows = self.poll_stats()
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        processed = sum(r.get("frames_processed", 0) for r in rows)
+        return {
+            "cameras": len(rows),
+            "running": sum(1 for r in rows if r.get("status") == "running"),
+            "frames_read": sum(r.get("frames_read", 0) for r in rows),
+            "frames_processed": processed,
+            "processed_fps": processed / elapsed if elapsed else 0.0,
+            "violations_logged": sum(r.get("violations_logged", 0) for r in rows),
+        }
+
+    def wait(self, timeout=None):
+        """Blocks until every camera finishes (files) or timeout seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for proc in self._streams:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            proc.join(remaining)
+        return not self.is_alive()
+
+    def stop(self, timeout=5.0):
+        """Stops every stream and inference worker."""
+        self.poll_stats()    # Records an inference failure before stopping masks it
+        self._stop.set()
+        for _ in self._inference:
+            try:
+                self._requests.put_nowait(None)
+            except queue.Full:
+                pass  # Workers also watch the stop event
+        for proc in self._streams + self._inference:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self.poll_stats()
+
+
+def gated_share(row):
+    """Fraction of a camera's sampled frames the motion gate kept from the detector."""
+    sampled = row.get("frames_processed", 0)
+    return row.get("gated_frames", 0) / sampled if sampled else 0.0
+
+
+def format_table(rows):
+    lines = [f"{'source':<40} {'status':<12} {'fps':>7} {'latency':>9} {'people':>7} {'logged':>7} {'gated':>6}"]
+    for r in rows:
+        lines.append(
+            f"{r['source'][:40]:<40} {r.get('status', ''):<12} {r.get('processed_fps', 0.0):>7.1f} "
+            f"{r.get('avg_latency_ms', 0.0):>7.0f}ms {r.get('people', 0):>7} "
+            f"{r.get('violations_logged', 0):>7} {gated_share(r):>5.0%}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera PPE monitoring")
+    parser.add_argument("sources", nargs="*", help="RTSP URLs or video files")
+    parser.add_argument("--sources-file", help="File with one source per line")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--inference-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="Run the detector on every sampled frame, even on static scenes")
+    args = parser.parse_args()
+
+    sources = list(args.sources)
+    if args.sources_file:
+        with open(args.sources_file) as f:
+            sources += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not sources:
+        parser.error("no sources given")
+
+    runner = MultiStreamRunner(sources, model_path=args.model,
+                               inference_workers=args.inference_workers,
+                               batch_size=args.batch_size,
+                               motion_gate=not args.no_motion_gate)
+    runner.start()
+    print(f"Started {len(sources)} cameras on {runner.inference_workers} inference workers")
+    try:
+        while runner.is_alive():
+            time.sleep(args.report_every)
+            print(format_table(runner.poll_stats()))
+            totals = runner.totals()
+            print(f"Total: {totals['processed_fps']:.1f} fps over {totals['cameras']} cameras, "
+                  f"{totals['violations_logged']} violations logged\n")
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        runner.stop()
+    print(format_table(runner.poll_stats()))
+    if runner.error:
+        print(f"Inference failed: {runner.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from database import get_connection
+import dashboard_queries as queries
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide", page_icon="🛡️")
 
@@ -78,36 +78,21 @@ with c3:
         st.session_state.admin_logged_in = False
         st.rerun()
 
-conn = get_connection()
-try:
-    df = pd.read_sql("SELECT * FROM violations ORDER BY timestamp DESC", conn)
-finally:
-    conn.close()
-
-if not df.empty:
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    
-    if 'date' in df.columns:
-        df['date_dt'] = pd.to_datetime(df['date']).dt.date
-    else:
-        df['date_dt'] = df['timestamp'].dt.date
+today = pd.Timestamp.now().strftime("%Y-%m-%d")
 
 
 tab1, tab2, tab3 = st.tabs(["📅 Today's Logs", "📆 All Records", "📊 Statistics"])
 
 
 with tab1:
-    today = pd.Timestamp.now().date()
-    if df.empty:
+    metrics = queries.day_metrics(today)
+    if not queries.has_records():
         st.info("No logs present.")
     else:
-        df_today = df[df['date_dt'] == today]
-        
         col_m1, col_m2, col_m3 = st.columns(3)
-        total_violations = len(df_today)
-        unique_persons = df_today['person_id'].nunique() if not df_today.empty else 0
-        helmet_violations = len(df_today[df_today['missing_ppe'].str.contains("Helmet", case=False)]) if not df_today.empty else 0
+        total_violations = metrics["total"]
+        unique_persons = metrics["unique_persons"]
+        helmet_violations = metrics["helmet_missing"]
         
         col_m1.metric("Total Log Entries", total_violations)
         col_m2.metric("⚠️ Unique Persons Violated", unique_persons, 
@@ -127,14 +112,10 @@ with tab1:
             help="Grouped view shows one row per person. Detailed shows all log entries."
         )
         
-        if not df_today.empty:
+        if total_violations > 0:
             if view_mode == "Grouped (by person)":
                 
-                grouped = df_today.groupby(['person_id', 'source']).agg({
-                    'missing_ppe': lambda x: ', '.join(sorted(set(', '.join(x).split(', ')))),
-                    'video_time': 'first',
-                    'status': 'first'
-                }).reset_index()
+                grouped = queries.grouped_by_person(today)
                 
                 st.dataframe(
                     grouped,
@@ -151,7 +132,7 @@ with tab1:
                 st.caption(f"Showing {len(grouped)} unique person-video combinations (grouped from {total_violations} total entries)")
             else:
                 st.dataframe(
-                df_today[['id', 'person_id', 'missing_ppe', 'video_time', 'source', 'status']],
+                queries.day_entries(today),
                 use_container_width=True,
                 hide_index=True,
                 column_config={
@@ -163,6 +144,8 @@ with tab1:
                     "status": "Status"
                 }
             )
+                if total_violations > queries.RECORDS_LIMIT:
+                    st.caption(f"Showing the latest {queries.RECORDS_LIMIT} of {total_violations} entries")
         else:
             st.success("✅ No violations recorded today!")
 
@@ -173,27 +156,32 @@ with tab2:
     # Filters
     c_f1, c_f2 = st.columns(2)
     with c_f1:
-        sources = ["All"] + list(df['source'].unique()) if not df.empty else []
+        source_list = queries.sources()
+        sources = ["All"] + source_list if source_list else []
         sel_source = st.selectbox("Filter Source", sources)
     with c_f2:
-        gear_types = ["All", "Helmet", "Shoes", "Goggles", "Vest"]
+        gear_types = ["All"] + queries.GEAR_FILTERS
         sel_gear = st.selectbox("Filter Missing Gear", gear_types)
         
-    df_filt = df.copy()
-    if sel_source != "All":
-        df_filt = df_filt[df_filt['source'] == sel_source]
-    if sel_gear != "All":
-        df_filt = df_filt[df_filt['missing_ppe'].str.contains(sel_gear, case=False, na=False)]
+    filters = dict(
+        source=sel_source if sel_source not in (None, "All") else None,
+        gear=sel_gear if sel_gear != "All" else None
+    )
+    df_filt = queries.filtered_records(**filters)
         
     st.dataframe(
         df_filt,
         use_container_width=True,
         hide_index=True
     )
+    total_matching = queries.count_records(**filters)
+    if total_matching > len(df_filt):
+        st.caption(f"Showing the latest {len(df_filt)} of {total_matching} matching records")
 
 
 with tab3:
-    if df.empty:
+    daily_counts = queries.daily_counts()
+    if daily_counts.empty:
         st.write("Not enough data.")
     else:
         st.markdown("### 📈 Trends & Insights")
@@ -202,9 +190,7 @@ with tab3:
         
         with c_stats1:
             st.caption("Common Violations")
-            s = df['missing_ppe'].str.split(', ').explode()
-            pie_data = s.value_counts().reset_index()
-            pie_data.columns = ['Type', 'Count']
+            pie_data = queries.gear_counts()
             
             pie = alt.Chart(pie_data).mark_arc(innerRadius=50).encode(
                 theta=alt.Theta(field="Count", type="quantitative"),
@@ -215,7 +201,6 @@ with tab3:
 
         with c_stats2:
             st.caption("Violations per Day")
-            daily_counts = df.groupby('date_dt').size().reset_index(name='Count')
             bar = alt.Chart(daily_counts).mark_bar().encode(
                 x='date_dt:T',
                 y='Count:Q',
@@ -0,0 +1,235 @@
+import queue
+import threading
+import time
+
+import metrics
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+_END = object()
+
+
+class StageQueue:
+    def __init__(self, maxsize=4, drop_policy="block", name="queue"):
+        """
+        Bounded queue joining two pipeline stages.
+
+        Args:
+            maxsize: Maximum number of frames waiting between the stages
+            drop_policy: What to do when the queue is full:
+                "block"       - wait for the next stage (no frame is lost)
+                "drop_oldest" - discard the oldest waiting frame (live feeds)
+                "drop_newest" - discard the frame being added
+            name: Label for the dropped-frames metric
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.name = name
+
+    def put(self, item, stop_event):
+        """Adds an item following the drop policy. Returns False if it was dropped."""
+        if self.drop_policy == "block":
+            self._put_blocking(item, stop_event)
+            return True
+
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self.drop_policy == "drop_newest":
+            self.dropped += 1
+            metrics.inc("ppe_frames_dropped_total", queue=self.name)
+            return False
+
+        # drop_oldest: make room by discarding the stalest frame
+        while not stop_event.is_set():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                metrics.inc("ppe_frames_dropped_total", queue=self.name)
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def put_end(self, stop_event):
+        """End-of-stream marker; never dropped."""
+        self._put_blocking(_END, stop_event)
+
+    def get(self, stop_event):
+        """Returns the next item, or the end marker once the pipeline is stopped."""
+        while not stop_event.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _put_blocking(self, item, stop_event):
+        while not stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __len__(self):
+        return self.queue.qsize()
+
+
+class FramePipeline:
+    def __init__(self, cap, infer_fn, frame_stride=1, queue_size=4,
+                 drop_policy="block", batch_size=1, sampler=None):
+        """
+        Runs decode and inference on their own threads so they overlap with
+        the annotate/display work done by the caller.
+
+        capture thread -> [capture queue] -> inference thread -> [result queue] -> caller
+
+        Args:
+            cap: Opened cv2.VideoCapture (or anything with isOpened/read)
+            infer_fn: Called as infer_fn(frames) on the inference thread with a
+                      list of up to batch_size frames; returns one result per frame
+            frame_stride: Only every Nth frame is decoded and sent to inference;
+                          skipped frames are grabbed but never retrieved
+            queue_size: Capacity of each queue between stages
+            drop_policy: See StageQueue; use "block" for recorded videos so
+                         tracking sees every sampled frame
+            batch_size: Frames handed to infer_fn per call (recorded video only;
+                        live feeds should use 1 to keep latency low)
+            sampler: Optional frame_sampler.AdaptiveSampler; its current stride
+                     replaces frame_stride for every frame
+        """
+        self.cap = cap
+        self.infer_fn = infer_fn
+        self.frame_stride = max(1, int(frame_stride))
+        self.batch_size = max(1, int(batch_size))
+        self.sampler = sampler
+        self.capture_queue = StageQueue(queue_size, drop_policy, "before_inference")
+        self.result_queue = StageQueue(queue_size, drop_policy, "before_display")
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._error = None
+
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.inference_seconds = 0.0
+        self.last_inference_ms = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="ppe-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="ppe-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def __iter__(self):
+        """Yields (frame_idx, frame, result) in decode order until the stream ends."""
+        if not self._threads:
+            self.start()
+        while True:
+            item = self.result_queue.get(self._stop)
+            if item is _END:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - (self.started_at or time.perf_counter()), 1e-9)
+        return {
+            "frames_read": self.frames_read,
+            "frames_inferred": self.frames_inferred,
+            "dropped_before_inference": self.capture_queue.dropped,
+            "dropped_before_display": self.result_queue.dropped,
+            "capture_queue": len(self.capture_queue),
+            "result_queue": len(self.result_queue),
+            "decode_fps": self.frames_read / elapsed,
+            "inference_fps": self.frames_inferred / elapsed,
+            "avg_inference_ms": 1000 * self.inference_seconds / max(self.frames_inferred, 1),
+        }
+
+    def _current_stride(self):
+        stride = self.sampler.stride if self.sampler is not None else self.frame_stride
+        return max(1, int(stride))
+
+    def _skip_frame(self):
+        # grab() demuxes/decodes without the BGR conversion and copy of retrieve()
+        grab = getattr(self.cap, "grab", None)
+        if grab is not None:
+            return grab()
+        return self.cap.read()[0]
+
+    def _capture_loop(self):
+        try:
+            while not self._stop.is_set() and self.cap.isOpened():
+                stride = self._current_stride()
+                ended = False
+                for _ in range(stride - 1):
+                    if not self._skip_frame():
+                        ended = True
+                        break
+                    self.frames_read += 1
+                    metrics.inc("ppe_frames_read_total")
+                if ended:
+                    break
+
+                with metrics.timed("decode"):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.frames_read += 1
+                metrics.inc("ppe_frames_read_total")
+                self.capture_queue.put((self.frames_read, frame), self._stop)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.capture_queue.put_end(self._stop)
+
+    def _inference_loop(self):
+        try:
+            finished = False
+            while not finished:
+                batch = []
+                while len(batch) < self.batch_size:
+                    item = self.capture_queue.get(self._stop)
+                    if item is _END:
+                        finished = True
+                        break
+                    batch.append(item)
+                if not batch:
+                    break
+
+                t0 = time.perf_counter()
+                results = self.infer_fn([frame for _, frame in batch])
+                elapsed = time.perf_counter() - t0
+                self.inference_seconds += elapsed
+                self.last_inference_ms = 1000 * elapsed / len(batch)
+                self.frames_inferred += len(batch)
+                metrics.observe_stage("inference", elapsed / len(batch))
+                metrics.inc("ppe_frames_processed_total", len(batch))
+                for (frame_idx, frame), result in zip(batch, results):
+                    self.result_queue.put((frame_idx, frame, result), self._stop)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.result_queue.put_end(self._stop)
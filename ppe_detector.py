@@ -1,9 +1,91 @@
-from ultralytics import YOLO
+"""
+Two-stage PPE check: the PPE model run on each person crop.
+
+The app, batch processor and multi-camera workers don't use this; they get
+people and PPE from one detector pass and match them up in association.py.
+PPEDetector is a library API for callers that already have person boxes,
+with detect_batch() checking all of a frame's crops in one inference call.
+Timing of per-crop detect() against detect_batch():
+
+    python ppe_detector.py --crops 1 8 30
+    python ppe_detector.py --image frame.jpg --size 320
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from inference import is_torch_model
+from model_registry import load_model
+
+PPE_MODEL_PATH = "runs/detect/runs/train/ppe_retrain/weights/best.pt"
+DETECT_SIZE = 640        # ultralytics' predict size when the model doesn't set one
+CROP_SIZE = 320          # Cheaper opt-in size for detect_batch; small PPE can be missed
+MAX_CROP_BATCH = 32      # Crops per inference call
+PAD_VALUE = 114          # Same grey ultralytics letterboxes with
+STRIDE = 32              # Batch sides are padded to multiples of the model stride
+
+
+def model_imgsz(model):
+    """Input side the model predicts at by default, i.e. what detect() runs at."""
+    imgsz = getattr(model, "imgsz", None) or getattr(model, "overrides", {}).get("imgsz")
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    return int(imgsz or DETECT_SIZE)
+
+
+def letterbox_crops(crops, size=DETECT_SIZE, out=None, stride=STRIDE):
+    """
+    Resizes crops (keeping aspect ratio, long side = size) into one padded
+    (N, H, W, 3) uint8 batch. H and W are the smallest multiples of stride
+    that fit every crop, as in ultralytics' rectangular letterbox, so a batch
+    of tall person crops isn't padded out to a square. Empty crops are left
+    as padding.
+    """
+    n = len(crops)
+    placed = []
+    for crop in crops:
+        h, w = crop.shape[:2]
+        if h == 0 or w == 0:
+            placed.append(None)
+            continue
+        scale = size / max(h, w)
+        placed.append((scale, max(1, int(round(w * scale))), max(1, int(round(h * scale)))))
+    height = max((-(-nh // stride) * stride for _, _, nh in filter(None, placed)), default=stride)
+    width = max((-(-nw // stride) * stride for _, nw, _ in filter(None, placed)), default=stride)
+
+    if out is None or out.shape[0] < n or out.shape[1] < height or out.shape[2] < width:
+        out = np.empty((n, height, width, 3), dtype=np.uint8)
+    batch = out[:n, :height, :width]
+    batch.fill(PAD_VALUE)
+    for i, (crop, place) in enumerate(zip(crops, placed)):
+        if place is None:
+            continue
+        scale, nw, nh = place
+        top, left = (height - nh) // 2, (width - nw) // 2
+        interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        batch[i, top:top + nh, left:left + nw] = cv2.resize(crop, (nw, nh), interpolation=interp)
+    return batch
+
+
+def to_array(batch):
+    """(N, H, W, 3) BGR uint8 -> (N, 3, H, W) RGB float32 array in [0, 1], as ultralytics expects."""
+    return np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+def to_tensor(batch):
+    """to_array as a torch tensor."""
+    import torch
+
+    return torch.from_numpy(to_array(batch))
+
 
 class PPEDetector:
     def __init__(self):
-        self.model = YOLO(
-                    "runs/detect/runs/train/ppe_retrain/weights/best.pt")
+        self.entry = load_model(PPE_MODEL_PATH)
+        self.model = self.entry.model
 
         self.required_ppe = {
             "helmet",
@@ -12,9 +94,12 @@ class PPEDetector:
             "goggles",
             "mask"
         }
+        self._labels = {i: name.lower() for i, name in self.model.names.items()}
+        self._batch = None   # Reused padded batch buffer
 
     def detect(self, person_crop):
-        results = self.model(person_crop, conf=0.2, verbose=False)
+        with self.entry.lock:
+            results = self.model(person_crop, conf=0.2, verbose=False)
 
 
         detected_items = set()
@@ -28,3 +113,100 @@ class PPEDetector:
         missing_items = sorted(list(self.required_ppe - detected_items))
 
         return detected_items, missing_items
+
+    def detect_batch(self, person_crops, size=None, max_batch=MAX_CROP_BATCH):
+        """
+        Checks every person crop from a frame with one inference call per
+        max_batch crops.
+
+        size is the long side each crop is resized to (multiple of 32). None
+        uses the model's imgsz, the scale detect() runs at, so both give the
+        same items; CROP_SIZE is faster but sees small PPE at half the
+        resolution. The batch is only as wide as its widest crop needs.
+
+        Returns a list of (detected_items, missing_items), one per crop, in order.
+        """
+        size = size or model_imgsz(self.model)
+        results = []
+        for start in range(0, len(person_crops), max_batch):
+            chunk = person_crops[start:start + max_batch]
+            # Under the model lock too, since the padded buffer is reused
+            with self.entry.lock:
+                if self._batch is None or self._batch.shape[1:3] != (size, size):
+                    self._batch = np.empty((max_batch, size, size, 3), dtype=np.uint8)  # Fits any batch
+                padded = letterbox_crops(chunk, size, self._batch)
+                inputs = to_tensor(padded) if is_torch_model(self.model) else to_array(padded)
+                predictions = self.model.predict(inputs, conf=0.2, imgsz=size, verbose=False)
+            for pred in predictions:
+                classes = np.unique(pred.boxes.cpu().numpy().cls.astype(int))
+                detected_items = {self._labels[c] for c in classes.tolist()}
+                results.append((detected_items, sorted(self.required_ppe - detected_items)))
+        return results
+
+
+def person_crops(frame, boxes):
+    """Crops for (x1, y1, x2, y2) person boxes, clipped to the frame."""
+    h, w = frame.shape[:2]
+    crops = []
+    for x1, y1, x2, y2 in boxes:
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(w, int(x2)), min(h, int(y2))
+        crops.append(frame[y1:y2, x1:x2])
+    return crops
+
+
+def compare_per_crop(detector, crops, repeats=5, size=None):
+    """Times detect() per crop against detect_batch() on the same crops, and counts disagreements."""
+    batched_items = detector.detect_batch(crops, size)       # Warm-up both paths
+    mismatches = sum(detector.detect(crop) != items for crop, items in zip(crops, batched_items))
+
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for crop in crops:
+            detector.detect(crop)
+    per_crop = (time.perf_counter() - t0) / repeats
+
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        detector.detect_batch(crops, size)
+    batched = (time.perf_counter() - t0) / repeats
+
+    return {
+        "crops": len(crops),
+        "per_crop_ms": per_crop * 1000,
+        "batched_ms": batched * 1000,
+        "speedup": per_crop / batched if batched else 0.0,
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-crop vs batched PPE check timing")
+    parser.add_argument("--image", help="Frame to crop people from (default: synthetic crops)")
+    parser.add_argument("--crops", type=int, nargs="+", default=[1, 8, 30])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--size", type=int, default=None,
+                        help=f"Batched crop size (default: the model's imgsz; {CROP_SIZE} is faster)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.image:
+        frame = cv2.imread(args.image)
+        h, w = frame.shape[:2]
+    else:
+        h, w = 720, 1280
+        frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+
+    detector = PPEDetector()
+    print(f"{'crops':>6} {'per-crop ms':>12} {'batched ms':>11} {'speedup':>8} {'mismatches':>11}")
+    for n in args.crops:
+        x = rng.integers(0, w - 100, n)
+        y = rng.integers(0, h - 250, n)
+        boxes = np.stack([x, y, x + rng.integers(50, 100, n), y + rng.integers(150, 250, n)], axis=1)
+        row = compare_per_crop(detector, person_crops(frame, boxes), args.repeats, args.size)
+        print(f"{row['crops']:>6} {row['per_crop_ms']:>12.1f} {row['batched_ms']:>11.1f} "
+              f"{row['speedup']:>7.2f}x {row['mismatches']:>11}")
+
+
+if __name__ == "__main__":
+    main()
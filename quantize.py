@@ -0,0 +1,310 @@
+"""
+INT8 post-training quantization of the detector models.
+
+Each model is exported to ONNX (the cached FP32 export from inference_backend),
+calibrated on frames from a folder of local images / videos, and quantized
+with ONNX Runtime's static quantization (QDQ, per-channel weights). The INT8
+file is written next to the FP32 export, so the usual backend switch picks it
+up everywhere a model is loaded (app, PPEDetector, multi_stream, batch_process):
+
+    PPE_BACKEND=onnxruntime PPE_INT8=1 streamlit run app.py
+
+A quantized .onnx path can also be passed to model_registry.load_model directly.
+
+The non-convolution ops of the detection head (box decoding, class sigmoid,
+the final concat of pixel boxes with 0-1 scores) stay in float: one INT8
+scale for both would flatten the scores.
+
+Calibrate on frames from the cameras the model will run on, and report on a
+clip that is not in the calibration folder:
+    python quantize.py yolov8n.pt --calib calib_frames/ --holdout bay_3.mp4
+    python quantize.py --all --calib calib_frames/ --holdout bay_3.mp4 --report int8.json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from inference_backend import EXPORT_IMGSZ, OnnxModel, agreement, export_onnx, int8_path
+from preprocess import Preprocessor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+MAX_CALIB_FRAMES = 200
+VIDEO_STRIDE = 15         # Consecutive video frames add little calibration range
+CALIB_METHODS = ("minmax", "entropy", "percentile")
+MATCH_IOU = 0.5
+
+
+def iter_calibration_frames(folder, max_frames=MAX_CALIB_FRAMES, video_stride=VIDEO_STRIDE):
+    """BGR frames from the images and videos in folder (sorted, recursively), up to max_frames."""
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths += [os.path.join(root, f) for f in files
+                  if f.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)]
+    count = 0
+    for path in sorted(paths):
+        if count >= max_frames:
+            return
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            frame = cv2.imread(path)
+            if frame is not None:
+                count += 1
+                yield frame
+            continue
+        cap = cv2.VideoCapture(path)
+        frame_idx = 0
+        try:
+            while count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_idx % video_stride == 0:
+                    count += 1
+                    yield frame
+                frame_idx += 1
+        finally:
+            cap.release()
+
+
+def head_nodes(nodes):
+    """
+    Names of the nodes to keep in float: every non-Conv node of the last
+    /model.N/ block (the Detect head) of an ultralytics export.
+
+    Args:
+        nodes: (name, op_type) pairs, e.g. from onnx.load(path).graph.node
+    """
+    blocks = [int(m.group(1)) for name, _ in nodes
+              for m in [re.search(r"/model\.(\d+)/", name)] if m]
+    if not blocks:
+        return []
+    prefix = f"/model.{max(blocks)}/"
+    return [name for name, op in nodes if prefix in name and op != "Conv"]
+
+
+def _calibration_reader(onnx_path, frames, imgsz):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            import onnxruntime as ort
+
+            session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+            self.input = session.get_inputs()[0].name
+            self.pre = Preprocessor(imgsz)
+            self.frames = iter(frames)
+            self.count = 0
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            self.count += 1
+            # The preprocessor's buffer is reused, the calibrator may keep the array
+            return {self.input: self.pre([frame]).copy()}
+
+    return FrameReader()
+
+
+def quantize_onnx(onnx_path, frames, output=None, method="minmax", per_channel=True,
+                  imgsz=EXPORT_IMGSZ):
+    """
+    Statically quantizes an FP32 export to INT8 (QDQ) calibrated on frames.
+
+    Args:
+        onnx_path: FP32 model from inference_backend.export_onnx
+        frames: Iterable of BGR calibration frames
+        output: INT8 model path (default: inference_backend.int8_path)
+        method: Activation range calibration, one of CALIB_METHODS
+        per_channel: Per-output-channel weight scales (better accuracy for convs)
+        imgsz: Letterbox size the frames are calibrated at
+    Returns:
+        (output path, number of calibration frames)
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if method not in CALIB_METHODS:
+        raise ValueError(f"Unknown calibration method: {method} (choose from {', '.join(CALIB_METHODS)})")
+    output = output or int8_path(onnx_path)
+    workdir = tempfile.mkdtemp(dir=os.path.dirname(output) or ".")
+    try:
+        # Shape inference + graph cleanup first, as ONNX Runtime recommends
+        prepared = os.path.join(workdir, "prepared.onnx")
+        quant_pre_process(onnx_path, prepared)
+        graph = onnx.load(prepared).graph
+        exclude = head_nodes([(node.name, node.op_type) for node in graph.node])
+
+        reader = _calibration_reader(prepared, frames, imgsz)
+        quantized = os.path.join(workdir, "int8.onnx")
+        quantize_static(
+            prepared, quantized, reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            calibrate_method={"minmax": CalibrationMethod.MinMax,
+                              "entropy": CalibrationMethod.Entropy,
+                              "percentile": CalibrationMethod.Percentile}[method],
+            nodes_to_exclude=exclude,
+        )
+        if not reader.count:
+            raise ValueError("No calibration frames")
+
+        with open(onnx_path + ".json") as f:
+            meta = json.load(f)
+        meta.update({"int8": True, "calibration_frames": reader.count, "calibration_method": method,
+                     "fp32": onnx_path})
+        with open(output + ".json", "w") as f:
+            json.dump(meta, f)
+        os.replace(quantized, output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return output, reader.count
+
+
+def match_detections(expected, actual, iou_threshold=MATCH_IOU):
+    """
+    Greedy same-class matching of one frame's [x1, y1, x2, y2, conf, cls] rows,
+    most confident actual box first. Returns (matched, unmatched actual,
+    unmatched expected), i.e. (TP, FP, FN) with expected as ground truth.
+    """
+    from benchmark import box_iou
+
+    if not len(expected) or not len(actual):
+        return 0, len(actual), len(expected)
+    iou = box_iou(actual[:, :4], expected[:, :4])
+    iou[actual[:, 5][:, None] != expected[:, 5][None, :]] = 0.0
+    taken = np.zeros(len(expected), dtype=bool)
+    matched = 0
+    for i in np.argsort(-actual[:, 4], kind="stable"):
+        candidates = np.where(~taken & (iou[i] >= iou_threshold))[0]
+        if len(candidates):
+            taken[candidates[iou[i, candidates].argmax()]] = True
+            matched += 1
+    return matched, len(actual) - matched, len(expected) - matched
+
+
+def detection_agreement(expected, actual, iou_threshold=MATCH_IOU):
+    """Precision / recall of actual against expected over all frames."""
+    tp = fp = fn = 0
+    for a, b in zip(expected, actual):
+        m, extra, missed = match_detections(a, b, iou_threshold)
+        tp, fp, fn = tp + m, fp + extra, fn + missed
+    return {"precision": tp / (tp + fp) if tp + fp else 1.0,
+            "recall": tp / (tp + fn) if tp + fn else 1.0,
+            "boxes_fp32": tp + fn, "boxes_int8": tp + fp}
+
+
+def _run(model, frames, **predict_kwargs):
+    from benchmark import latency_summary
+
+    model.predict(frames[0], **predict_kwargs)   # Warm-up
+    latencies, detections = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        result = model.predict(frame, **predict_kwargs)[0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        detections.append(result.boxes.cpu().numpy().data[:, :6])
+    return latency_summary(latencies), detections
+
+
+def compare_int8(fp32_path, int8_model_path, frames, threads=None, loader=OnnxModel,
+                 **predict_kwargs):
+    """
+    Latency (batch 1), file size and detection agreement of INT8 vs FP32 on frames.
+
+    Args:
+        loader: Builds a model from (path, threads=...); OnnxModel by default
+    """
+    fp32_latency, fp32_det = _run(loader(fp32_path, threads=threads), frames, **predict_kwargs)
+    int8_latency, int8_det = _run(loader(int8_model_path, threads=threads), frames, **predict_kwargs)
+    return {
+        "frames": len(frames),
+        "fp32": {"path": fp32_path, "size_mb": os.path.getsize(fp32_path) / 1024 ** 2,
+                 "latency_ms": fp32_latency},
+        "int8": {"path": int8_model_path, "size_mb": os.path.getsize(int8_model_path) / 1024 ** 2,
+                 "latency_ms": int8_latency},
+        "speedup_p50": fp32_latency["p50"] / int8_latency["p50"] if int8_latency["p50"] else 0.0,
+        **agreement(fp32_det, int8_det),
+        **detection_agreement(fp32_det, int8_det),
+    }
+
+
+def default_weights():
+    """The weights get_model() would pick plus the PPE model PPEDetector loads, if present."""
+    from model_registry import MODEL_CANDIDATES
+    from ppe_detector import PPE_MODEL_PATH
+
+    weights = next((p for p in MODEL_CANDIDATES if os.path.exists(p)), None)
+    return [p for p in (weights, PPE_MODEL_PATH) if p and os.path.exists(p)]
+
+
+def main():
+    from inference import read_frames
+    from association import DETECTION_CLASSES
+    from ppe_detector import PPE_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization with an FP32 comparison")
+    parser.add_argument("weights", nargs="*", help=".pt weights to quantize")
+    parser.add_argument("--all", action="store_true",
+                        help="The app's detection model and the PPE model")
+    parser.add_argument("--calib", required=True, help="Folder of calibration images / videos")
+    parser.add_argument("--max-calib", type=int, default=MAX_CALIB_FRAMES)
+    parser.add_argument("--method", default="minmax", choices=CALIB_METHODS)
+    parser.add_argument("--per-tensor", action="store_true", help="One weight scale per tensor")
+    parser.add_argument("--imgsz", type=int, default=EXPORT_IMGSZ)
+    parser.add_argument("--holdout", default=None, help="Clip (not in --calib) for the FP32 vs INT8 report")
+    parser.add_argument("--max-frames", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--conf", type=float, default=0.30)
+    parser.add_argument("--report", default=None, help="Write the report here as JSON")
+    args = parser.parse_args()
+
+    weights = list(args.weights) + (default_weights() if args.all else [])
+    if not weights:
+        parser.error("Give weights to quantize or --all")
+    if args.holdout and os.path.abspath(args.holdout).startswith(os.path.abspath(args.calib) + os.sep):
+        print(f"Warning: {args.holdout} is inside the calibration folder; the report will be optimistic")
+    holdout = read_frames(args.holdout, args.max_frames) if args.holdout else []
+
+    report = []
+    for path in weights:
+        fp32 = export_onnx(path, args.imgsz, dynamic=True)
+        t0 = time.perf_counter()
+        int8, n = quantize_onnx(fp32, iter_calibration_frames(args.calib, args.max_calib),
+                                method=args.method, per_channel=not args.per_tensor, imgsz=args.imgsz)
+        print(f"Quantized {path} to {int8} on {n} frames in {time.perf_counter() - t0:.1f}s")
+        if not holdout:
+            continue
+        # The app's classes for the detection model, everything for the PPE model
+        classes = None if path == PPE_MODEL_PATH else DETECTION_CLASSES
+        row = compare_int8(fp32, int8, holdout, args.threads, conf=args.conf, classes=classes)
+        report.append({"weights": path, **row})
+
+    if not report:
+        return
+    print(f"\n{'weights':<40} {'MB fp32':>8} {'MB int8':>8} {'p50 fp32':>9} {'p50 int8':>9} "
+          f"{'speedup':>8} {'same boxes':>11} {'precision':>10} {'recall':>7}")
+    for row in report:
+        print(f"{row['weights'][-40:]:<40} {row['fp32']['size_mb']:>8.1f} {row['int8']['size_mb']:>8.1f} "
+              f"{row['fp32']['latency_ms']['p50']:>9.1f} {row['int8']['latency_ms']['p50']:>9.1f} "
+              f"{row['speedup_p50']:>7.2f}x {row['frames_same_count']:>10.0%} "
+              f"{row['precision']:>10.1%} {row['recall']:>7.1%}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
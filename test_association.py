@@ -0,0 +1,116 @@
+"""
+Tests for the vectorized PPE-to-person association engine
+"""
+
+import numpy as np
+
+from association import associate, person_regions, split_tracks, PERSON, BACKPACK, UMBRELLA, HANDBAG
+
+
+def reference_associate(tracks, person_conf, ppe_conf):
+    """The original per-box loop from app.py, kept as the behavioural reference."""
+    persons = {}
+    ppe_items = []
+    for x1, y1, x2, y2, pid, conf, cls in tracks.tolist():
+        pid, cls = int(pid), int(cls)
+        x1, y1, x2, y2 = map(int, (x1, y1, x2, y2))
+        if cls == PERSON and conf >= person_conf:
+            h = y2 - y1
+            persons[pid] = {
+                "bbox": (x1, y1, x2, y2),
+                "head": (x1, y1, x2, y1 + int(0.35 * h)),
+                "foot": (x1, y1 + int(0.75 * h), x2, y2),
+                "helmet": False, "vest": False, "boots": False,
+            }
+        elif conf >= ppe_conf:
+            ppe_items.append((cls, (x1, y1, x2, y2)))
+
+    def center_inside(r1, r2):
+        cx = (r1[0] + r1[2]) // 2
+        cy = (r1[1] + r1[3]) // 2
+        return r2[0] <= cx <= r2[2] and r2[1] <= cy <= r2[3]
+
+    for cls, rect in ppe_items:
+        for p in persons.values():
+            if cls == UMBRELLA and center_inside(rect, p["head"]):
+                p["helmet"] = True
+            elif cls == BACKPACK and center_inside(rect, p["bbox"]):
+                p["vest"] = True
+            elif cls == HANDBAG and center_inside(rect, p["foot"]):
+                p["boots"] = True
+            elif center_inside(rect, p["bbox"]):
+                p["helmet"] = True
+    return persons
+
+
+def random_scene(rng, n_persons, n_items):
+    rows = []
+    for pid in range(n_persons):
+        x1, y1 = rng.uniform(0, 1800), rng.uniform(0, 900)
+        w, h = rng.uniform(40, 120), rng.uniform(120, 300)
+        rows.append([x1, y1, x1 + w, y1 + h, pid + 1, rng.uniform(0.2, 1.0), PERSON])
+    for i in range(n_items):
+        x1, y1 = rng.uniform(0, 1900), rng.uniform(0, 1100)
+        cls = rng.choice([BACKPACK, UMBRELLA, HANDBAG, 27, 28])
+        rows.append([x1, y1, x1 + rng.uniform(10, 60), y1 + rng.uniform(10, 60),
+                     1000 + i, rng.uniform(0.2, 1.0), cls])
+    return np.array(rows, dtype=np.float32)
+
+
+def test_matches_reference_loop():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        tracks = random_scene(rng, n_persons=40, n_items=120)
+        expected = reference_associate(tracks, 0.35, 0.30)
+        result = associate(tracks, 0.35, 0.30)
+
+        assert sorted(expected) == sorted(result.ids.tolist())
+        for i, pid in enumerate(result.ids.tolist()):
+            p = expected[pid]
+            assert tuple(result.boxes[i].tolist()) == p["bbox"]
+            assert bool(result.helmet[i]) == p["helmet"]
+            assert bool(result.vest[i]) == p["vest"]
+            assert bool(result.boots[i]) == p["boots"]
+    print("Matches reference loop: PASSED")
+
+
+def test_regions_split_person_box():
+    boxes = np.array([[10, 100, 50, 300]])
+    head, torso, foot = person_regions(boxes)
+
+    assert head.tolist() == [[10, 100, 50, 170]]
+    assert torso.tolist() == [[10, 170, 50, 250]]
+    assert foot.tolist() == [[10, 250, 50, 300]]
+    print("Person regions: PASSED")
+
+
+def test_helmet_and_vest_detected():
+    tracks = np.array([
+        [100, 100, 200, 400, 7, 0.9, PERSON],
+        [130, 100, 170, 130, 50, 0.8, UMBRELLA],   # on the head
+        [120, 200, 180, 260, 51, 0.8, BACKPACK],   # on the torso
+        [900, 900, 950, 950, 52, 0.8, HANDBAG],    # far away
+    ], dtype=np.float32)
+    result = associate(tracks, 0.35, 0.30)
+
+    assert result.ids.tolist() == [7]
+    assert result.helmet.tolist() == [True]
+    assert result.vest.tolist() == [True]
+    assert result.boots.tolist() == [False]
+    print("Helmet and vest: PASSED")
+
+
+def test_empty_frame():
+    result = associate(np.zeros((0, 7), dtype=np.float32), 0.35, 0.30)
+    assert len(result.ids) == 0 and len(result.helmet) == 0
+    boxes, ids, confs, classes = split_tracks(np.zeros((0, 7)))
+    assert boxes.shape == (0, 4)
+    print("Empty frame: PASSED")
+
+
+if __name__ == "__main__":
+    test_matches_reference_loop()
+    test_regions_split_person_box()
+    test_helmet_and_vest_detected()
+    test_empty_frame()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,96 @@
+"""
+Tests for the headless batch processor helpers
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import database
+from batch_process import (delete_source, duplicate_sources, find_sources, find_videos,
+                           replace_source)
+from violation_logic import INSERT_VIOLATION_SQL, violation_row
+
+
+def test_find_videos_filters_and_recurses():
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "night"))
+    for name in ["a.mp4", "b.MOV", "notes.txt", os.path.join("night", "c.avi")]:
+        open(os.path.join(root, name), "w").close()
+
+    top = [os.path.basename(v) for v in find_videos([root])]
+    assert top == ["a.mp4", "b.MOV"]
+
+    nested = [os.path.basename(v) for v in find_videos([root], recursive=True)]
+    assert sorted(nested) == ["a.mp4", "b.MOV", "c.avi"]
+    print("Find videos: PASSED")
+
+
+def test_sources_are_stable_and_duplicates_found():
+    root = tempfile.mkdtemp()
+    for name in ["top.mp4", "cam1/shift.mp4", "cam2/shift.mp4", "cam2/night/gate.mp4"]:
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        open(os.path.join(root, name), "w").close()
+    cam1 = os.path.join(root, "cam1")
+
+    sources = find_sources([root, os.path.join(cam1, "shift.mp4")], recursive=True)
+    assert len(sources) == 4, "A file given twice is processed once"
+    assert sorted(sources.values()) == ["cam1/shift.mp4", "cam2/night/gate.mp4",
+                                        "cam2/shift.mp4", "top.mp4"]
+    assert duplicate_sources(sources) == {}
+    # Same arguments, same sources, whatever else is in the run
+    assert find_sources([root], recursive=True) == sources
+    assert find_sources([root]) == {os.path.join(root, "top.mp4"): "top.mp4"}
+
+    both = find_sources([cam1, os.path.join(root, "cam2")])
+    assert duplicate_sources(both) == {"shift.mp4": sorted(both)}
+    print("Stable sources: PASSED")
+
+
+def test_replace_only_deletes_that_source():
+    path = os.path.join(tempfile.mkdtemp(), "batch_test.db")
+    original = database.DB_NAME
+    database.DB_NAME = path
+    try:
+        database.init_db()
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.executemany(INSERT_VIOLATION_SQL, [
+                violation_row(1, ["Helmet"], "00:00:01", "shift_a.mp4"),
+                violation_row(2, ["Vest"], "00:00:02", "shift_a.mp4"),
+                violation_row(3, ["Vest"], "00:00:03", "shift_b.mp4"),
+            ])
+        conn.close()
+
+        assert delete_source("shift_a.mp4") == 2
+        conn = sqlite3.connect(path)
+        remaining = conn.execute("SELECT source FROM violations").fetchall()
+        conn.close()
+        assert remaining == [("shift_b.mp4",)]
+
+        new = [violation_row(4, ["Helmet"], "00:00:04", "shift_b.mp4")]
+        try:
+            replace_source("shift_b.mp4", new + [("not", "a", "row")])
+        except sqlite3.Error:
+            pass
+        else:
+            raise AssertionError("A bad row should fail the insert")
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT person_id FROM violations").fetchall() == [(3,)], \
+            "A failed replace keeps the old rows"
+        conn.close()
+        assert replace_source("shift_b.mp4", new) == 1
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT person_id FROM violations").fetchall() == [(4,)]
+        conn.close()
+    finally:
+        database.close_pools()
+        database.DB_NAME = original
+    print("Replace source: PASSED")
+
+
+if __name__ == "__main__":
+    test_find_videos_filters_and_recurses()
+    test_sources_are_stable_and_duplicates_found()
+    test_replace_only_deletes_that_source()
+    print("\nALL TESTS PASSED")
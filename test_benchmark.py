@@ -0,0 +1,60 @@
+"""
+Tests for the synthetic video and stub detector used by benchmark.py
+"""
+
+import json
+import os
+import tempfile
+
+import cv2
+
+import database
+from association import associate
+from benchmark import make_video, StubTracker, run_suite
+
+
+def read_all(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def test_stub_tracker_keeps_ids_on_synthetic_video():
+    path = make_video(os.path.join(tempfile.mkdtemp(), "with_ppe.mp4"), frames=40,
+                      n_people=3, width=640, height=480, ppe_fraction=1.0)
+    frames = read_all(path)
+    assert len(frames) == 40
+
+    tracker = StubTracker()
+    for tracks in tracker.track_batch(frames):
+        people = associate(tracks, 0.35, 0.30)
+        assert sorted(people.ids.tolist()) == [1, 2, 3], "Person IDs should be stable across frames"
+        assert people.helmet.all() and people.vest.all()
+    print("Stub tracker IDs: PASSED")
+
+
+def test_suite_reports_are_json_serializable():
+    original = database.DB_NAME
+    try:
+        report = run_suite(benchmarks=("app_loop", "log_violation"), scenarios=("no_ppe",),
+                           frames=30, n_people=2, width=320, height=240, isolate=False, rows=20)
+    finally:
+        database.DB_NAME = original
+    results = report["results"]
+    assert set(results) == {"app_loop/no_ppe", "log_violation"}
+    assert results["app_loop/no_ppe"]["frames_processed"] == 10
+    assert results["log_violation"]["latency_ms"]["count"] == 20
+    json.dumps(report)
+    print("Benchmark report: PASSED")
+
+
+if __name__ == "__main__":
+    test_stub_tracker_keeps_ids_on_synthetic_video()
+    test_suite_reports_are_json_serializable()
+    print("\nALL TESTS PASSED")
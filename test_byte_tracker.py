@@ -0,0 +1,132 @@
+"""
+Tests for the NumPy ByteTrack: assignment, ID continuity on synthetic
+sequences, and (if ultralytics is installed) identical IDs to its BYTETracker
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from byte_tracker import (ByteTracker, id_switches, linear_assignment, load_config, run,
+                          same_ids, synthetic_sequence, ultralytics_tracker)
+from inference import load_tracker, update_tracker
+
+
+def person(x, y, conf=0.9, w=40, h=100):
+    return [x, y, x + w, y + h, conf, 0]
+
+
+def frames_of(*rows_per_frame):
+    return [np.array(rows, dtype=np.float32).reshape(-1, 6) for rows in rows_per_frame]
+
+
+def ids_by_index(out):
+    """{detection index: track id} for one update() result."""
+    return {int(i): int(t) for t, i in zip(out[:, 4], out[:, 7])}
+
+
+def test_assignment_is_optimal_under_threshold():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        cost = rng.random(rng.integers(0, 6, 2))
+        matches, u_rows, u_cols = linear_assignment(cost, 0.5)
+        assert sorted(u_rows.tolist() + matches[:, 0].tolist()) == list(range(cost.shape[0]))
+        assert sorted(u_cols.tolist() + matches[:, 1].tolist()) == list(range(cost.shape[1]))
+        assert all(cost[i, j] < 0.5 for i, j in matches)
+
+        best = 0.0
+        for k in range(min(cost.shape) + 1):
+            for rows in itertools.combinations(range(cost.shape[0]), k):
+                for cols in itertools.permutations(range(cost.shape[1]), k):
+                    pairs = [cost[i, j] - 0.5 for i, j in zip(rows, cols)]
+                    if all(p < 0 for p in pairs):
+                        best = min(best, sum(pairs))
+        assert np.isclose(sum(cost[i, j] - 0.5 for i, j in matches), best)
+    print("Assignment: PASSED")
+
+
+def test_config_comes_from_bytetrack_yaml():
+    cfg = load_config("bytetrack.yaml")
+    assert cfg["track_buffer"] == 60 and cfg["match_thresh"] == 0.8 and cfg["fuse_score"] is True
+    assert ByteTracker("bytetrack.yaml", frame_rate=15).max_time_lost == 30
+    assert isinstance(load_tracker(kind="numpy"), ByteTracker)
+    print("Config: PASSED")
+
+
+def test_ids_survive_crossing_low_confidence_and_short_gaps():
+    tracker = ByteTracker("bytetrack.yaml")
+    a, b = [], []
+    for t in range(40):
+        conf = 0.15 if 10 <= t < 14 else 0.9        # Low-confidence stretch: second association
+        a_row = [person(100 + 8 * t, 200, conf)] if not 20 <= t < 25 else []   # Missed 5 frames
+        a.append(a_row)
+        b.append([person(420 - 8 * t, 210)])         # Walks across A's path
+    outputs = [tracker.update(det) for det in frames_of(*[ra + rb for ra, rb in zip(a, b)])]
+
+    first = ids_by_index(outputs[0])
+    assert first == {0: 1, 1: 2}, "First-frame tracks are confirmed immediately"
+    for t, out in enumerate(outputs):
+        ids = ids_by_index(out)
+        if a[t]:
+            assert ids[0] == 1 and ids[1] == 2, f"Frame {t}: {ids}"
+        else:
+            assert ids == {0: 2}, f"Frame {t}: {ids}"
+    print("ID continuity: PASSED")
+
+
+def test_new_tracks_confirm_on_second_frame_and_expire_after_buffer():
+    tracker = ByteTracker("bytetrack.yaml", track_buffer=5)
+    anchor = person(1000, 500)                       # Keeps every frame non-empty
+    out = tracker.update(frames_of([anchor])[0])
+    assert out[:, 4].tolist() == [1]
+    out = tracker.update(frames_of([anchor, person(100, 100)])[0])
+    assert out[:, 4].tolist() == [1], "A newcomer is unconfirmed on its first frame"
+    out = tracker.update(frames_of([anchor, person(104, 100)])[0])
+    assert sorted(out[:, 4].tolist()) == [1, 2]
+
+    for _ in range(6):                               # Longer than track_buffer
+        tracker.update(frames_of([anchor])[0])
+    tracker.update(frames_of([anchor, person(108, 100)])[0])
+    out = tracker.update(frames_of([anchor, person(112, 100)])[0])
+    assert sorted(out[:, 4].tolist()) == [1, 3], "Expired tracks are not revived"
+
+    tracks = update_tracker(tracker, frames_of([anchor])[0], None)
+    assert tracks.shape == (1, 7) and tracks[0, 4] == 1
+    print("Track lifecycle: PASSED")
+
+
+def test_synthetic_crowd_keeps_ids():
+    sequence, truth = synthetic_sequence(30, frames=120, seed=3)
+    outputs, _ = run(ByteTracker("bytetrack.yaml"), sequence)
+    stats = id_switches(outputs, truth)
+    # Identical boxes walking through each other can swap; 30 people over 120
+    # frames cross a handful of times
+    assert stats["id_switches"] <= 3, stats
+    assert stats["untracked_detections"] < 0.02 * sum(len(t) for t in truth), stats
+    print("Synthetic crowd: PASSED")
+
+
+def test_same_ids_as_ultralytics():
+    reference = ultralytics_tracker("bytetrack.yaml")
+    if reference is None:
+        pytest.skip("ultralytics not installed")
+    for n in (5, 30, 200):
+        sequence, _ = synthetic_sequence(n, frames=100, seed=n)
+        expected, _ = run(reference, sequence)
+        actual, _ = run(ByteTracker("bytetrack.yaml"), sequence)
+        assert same_ids(expected, actual) == 1.0, n
+    print("Same IDs as ultralytics: PASSED")
+
+
+if __name__ == "__main__":
+    test_assignment_is_optimal_under_threshold()
+    test_config_comes_from_bytetrack_yaml()
+    test_ids_survive_crossing_low_confidence_and_short_gaps()
+    test_new_tracks_confirm_on_second_frame_and_expire_after_buffer()
+    test_synthetic_crowd_keeps_ids()
+    try:
+        test_same_ids_as_ultralytics()
+    except pytest.skip.Exception as e:
+        print(f"Same IDs as ultralytics: SKIPPED ({e})")
+    print("\nALL TESTS PASSED")
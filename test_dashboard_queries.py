@@ -0,0 +1,160 @@
+"""
+Tests for the SQL-side dashboard aggregations
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import database
+import dashboard_queries as queries
+from violation_logic import INSERT_VIOLATION_SQL, violation_row
+
+ROWS = [
+    # person, missing, video_time, source, logged at
+    (1, ["Helmet"], "00:00:01", "a.mp4", "2026-03-01 08:00:00"),
+    (1, ["Vest"], "00:00:05", "a.mp4", "2026-03-01 08:00:10"),
+    (1, ["Helmet", "Vest"], "00:00:09", "a.mp4", "2026-03-01 08:00:20"),
+    (2, ["Vest"], "00:00:02", "a.mp4", "2026-03-01 09:00:00"),
+    (2, ["Helmet"], "00:00:03", "b.mp4", "2026-03-01 10:00:00"),
+    (3, ["Shoes"], "00:00:04", "b.mp4", "2026-03-02 10:00:00"),
+]
+
+
+def use_seeded_db():
+    original = database.DB_NAME
+    database.DB_NAME = os.path.join(tempfile.mkdtemp(), "dashboard_test.db")
+    database.init_db()
+    conn = database.get_connection()
+    conn.executemany(INSERT_VIOLATION_SQL, [
+        violation_row(pid, missing, vt, src, now=datetime.strptime(ts, "%Y-%m-%d %H:%M:%S"))
+        for pid, missing, vt, src, ts in ROWS
+    ])
+    conn.commit()
+    conn.close()
+    return original
+
+
+def restore_db(original):
+    database.close_pools()
+    database.DB_NAME = original
+
+
+def test_day_metrics():
+    original = use_seeded_db()
+    try:
+        assert queries.has_records()
+        assert queries.day_metrics("2026-03-01") == {"total": 5, "unique_persons": 2, "helmet_missing": 3}
+        assert queries.day_metrics("2026-03-09") == {"total": 0, "unique_persons": 0, "helmet_missing": 0}
+        print("Day metrics: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_grouped_by_person():
+    original = use_seeded_db()
+    try:
+        grouped = queries.grouped_by_person("2026-03-01")
+        rows = grouped.to_dict("records")
+        assert [(r["person_id"], r["source"], r["missing_ppe"]) for r in rows] == [
+            (1, "a.mp4", "Helmet, Vest"),
+            (2, "a.mp4", "Vest"),
+            (2, "b.mp4", "Helmet"),
+        ]
+        assert rows[0]["video_time"] == "00:00:01", "First detection of the group"
+        print("Grouped by person: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_filters_and_limits():
+    original = use_seeded_db()
+    try:
+        assert queries.sources() == ["a.mp4", "b.mp4"]
+        assert queries.count_records() == 6
+        assert queries.count_records(source="b.mp4") == 2
+        assert queries.count_records(gear="Helmet") == 3
+        assert queries.count_records(source="a.mp4", gear="Vest") == 3
+
+        latest = queries.filtered_records(limit=2)
+        assert len(latest) == 2
+        assert latest["timestamp"].tolist() == ["2026-03-02 10:00:00", "2026-03-01 10:00:00"]
+        print("Filters and limits: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_cache_invalidates_only_on_change():
+    original = use_seeded_db()
+    cache = queries.CACHE
+    interval = cache.check_interval
+    cache.check_interval = 0
+    try:
+        cache.clear()
+        assert queries.count_records() == 6
+        misses = cache.stats()["misses"]
+
+        # Repeated widget reruns are served from the cache
+        for _ in range(5):
+            assert queries.count_records() == 6
+        assert cache.stats()["misses"] == misses
+
+        conn = database.get_connection()
+        conn.execute(INSERT_VIOLATION_SQL, violation_row(9, ["Helmet"], "00:00:09", "c.mp4"))
+        conn.commit()
+        conn.close()
+        assert queries.count_records() == 7, "Insert must invalidate the cache"
+
+        conn = database.get_connection()
+        conn.execute("DELETE FROM violations WHERE person_id = 9")
+        conn.commit()
+        conn.close()
+        assert queries.count_records() == 6, "Delete must invalidate the cache"
+
+        # Results handed out are copies; mutating one doesn't affect the cache
+        df = queries.filtered_records()
+        df.drop(df.index, inplace=True)
+        assert len(queries.filtered_records()) == 6
+        print("Cache invalidation: PASSED")
+    finally:
+        cache.check_interval = interval
+        restore_db(original)
+
+
+def test_statistics():
+    original = use_seeded_db()
+    try:
+        gear = dict(zip(*queries.gear_counts()[["Type", "Count"]].values.T))
+        assert gear == {"Helmet": 3, "Vest": 3, "Shoes": 1}
+
+        daily = queries.daily_counts()
+        assert daily["Count"].tolist() == [5, 1]
+        assert [d.strftime("%Y-%m-%d") for d in daily["date_dt"]] == ["2026-03-01", "2026-03-02"]
+
+        # Items without a bit of their own are counted by name, not dropped
+        conn = database.get_connection()
+        conn.executemany(INSERT_VIOLATION_SQL, [
+            violation_row(4, ["Helmet", "PPE Bag"], "00:00:06", "b.mp4"),
+            violation_row(5, ["Harness"], "00:00:07", "b.mp4"),
+            violation_row(6, ["Harness", "Ear Protection"], "00:00:08", "b.mp4"),
+        ])
+        conn.commit()
+        conn.close()
+        queries.CACHE.clear()   # Don't wait out the version check interval
+        gear = dict(zip(*queries.gear_counts()[["Type", "Count"]].values.T))
+        assert gear == {"Helmet": 4, "Vest": 3, "Shoes": 1, "PPE Bag": 1, "Harness": 2,
+                        "Ear Protection": 1}
+        assert queries.count_records(gear="PPE Bag") == 1
+        assert queries.count_records(gear=queries.OTHER_GEAR) == 2
+        print("Statistics: PASSED")
+    finally:
+        restore_db(original)
+
+
+if __name__ == "__main__":
+    test_day_metrics()
+    test_grouped_by_person()
+    test_filters_and_limits()
+    test_cache_invalidates_only_on_change()
+    test_statistics()
+    print("\nALL TESTS PASSED")
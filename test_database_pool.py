@@ -0,0 +1,169 @@
+"""
+Tests for the pooled, WAL-mode connection layer, including a concurrency
+stress test showing readers no longer block the writer
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import database
+
+
+def use_temp_db():
+    original = database.DB_NAME
+    database.DB_NAME = os.path.join(tempfile.mkdtemp(), "pool_test.db")
+    conn = database.get_connection()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        person_id INTEGER,
+        missing_ppe TEXT,
+        video_time TEXT,
+        timestamp TEXT,
+        status TEXT
+    )
+    """)
+    conn.commit()
+    conn.close()
+    return original
+
+
+def restore_db(original):
+    database.close_pools()
+    database.DB_NAME = original
+
+
+def test_connections_are_reused():
+    original = use_temp_db()
+    try:
+        conn = database.get_connection()
+        first = id(conn)
+        conn.close()
+
+        conn = database.get_connection()
+        assert id(conn) == first, "Closed connection should come back from the pool"
+        conn.close()
+        print("Connection reuse: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_pragmas_applied():
+    original = use_temp_db()
+    try:
+        conn = database.get_connection()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == database.BUSY_TIMEOUT_MS
+        conn.close()
+        print("Pragmas: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_open_transaction_is_rolled_back_on_release():
+    original = use_temp_db()
+    try:
+        conn = database.get_connection()
+        conn.execute("INSERT INTO violations (person_id) VALUES (1)")
+        conn.close()  # no commit
+
+        conn = database.get_connection()
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == 0
+        conn.close()
+        print("Rollback on release: PASSED")
+    finally:
+        restore_db(original)
+
+
+def test_reader_does_not_block_writer():
+    original = use_temp_db()
+    try:
+        reader = database.get_connection()
+        reader.execute("BEGIN")
+        before = reader.execute("SELECT COUNT(*) FROM violations").fetchone()[0]
+
+        # The reader holds its snapshot open while the writer commits.
+        writer = database.get_connection()
+        t0 = time.perf_counter()
+        for pid in range(50):
+            writer.execute("INSERT INTO violations (person_id, missing_ppe) VALUES (?, ?)",
+                           (pid, "Helmet"))
+            writer.commit()
+        elapsed = time.perf_counter() - t0
+        writer.close()
+
+        assert elapsed < 1.0, f"Writer was blocked by the reader ({elapsed:.2f}s)"
+        assert reader.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == before
+        reader.commit()
+        assert reader.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == before + 50
+        reader.close()
+        print(f"Reader does not block writer: PASSED ({elapsed * 1000:.0f} ms for 50 commits)")
+    finally:
+        restore_db(original)
+
+
+def test_concurrent_readers_and_writer_stress():
+    original = use_temp_db()
+    try:
+        errors = []
+        commit_ms = []
+        reads = [0]
+        stop = threading.Event()
+
+        def write_loop():
+            try:
+                for pid in range(300):
+                    conn = database.get_connection()
+                    t0 = time.perf_counter()
+                    conn.execute("INSERT INTO violations (person_id, missing_ppe, timestamp) "
+                                 "VALUES (?, ?, datetime('now'))", (pid, "Helmet, Vest"))
+                    conn.commit()
+                    commit_ms.append(1000 * (time.perf_counter() - t0))
+                    conn.close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                stop.set()
+
+        def read_loop():
+            try:
+                while not stop.is_set():
+                    conn = database.get_connection()
+                    conn.execute("SELECT person_id, COUNT(*) FROM violations "
+                                 "GROUP BY person_id").fetchall()
+                    conn.close()
+                    reads[0] += 1
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read_loop) for _ in range(6)]
+        threads.append(threading.Thread(target=write_loop))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=60)
+
+        assert not errors, f"Concurrent access failed: {errors[0]}"
+        assert len(commit_ms) == 300
+        conn = database.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == 300
+        conn.close()
+
+        commit_ms.sort()
+        print(f"Stress: PASSED ({reads[0]} reads, p50 commit "
+              f"{commit_ms[len(commit_ms) // 2]:.2f} ms, max {commit_ms[-1]:.2f} ms)")
+    finally:
+        restore_db(original)
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_pragmas_applied()
+    test_open_transaction_is_rolled_back_on_release()
+    test_reader_does_not_block_writer()
+    test_concurrent_readers_and_writer_stress()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,65 @@
+"""
+Tests for throttled, single-encode Live Feed publishing
+"""
+
+import cv2
+import numpy as np
+
+from display import FramePublisher, VIOLATION_COLOR
+
+
+class FakeWindow:
+    def __init__(self):
+        self.images = []
+
+    def image(self, data, **kwargs):
+        self.images.append((data, kwargs))
+
+
+def frame(h=1080, w=1920):
+    return np.full((h, w, 3), 40, dtype=np.uint8)
+
+
+def test_publishes_at_display_rate():
+    window = FakeWindow()
+    publisher = FramePublisher(window, max_fps=10)
+    # 30 processed frames a second for one second
+    shown = [publisher.render(frame(), (), "header", now=i / 30) for i in range(30)]
+    assert sum(shown) == 10 and shown[0], shown
+    assert publisher.stats()["skipped"] == 20
+    assert len(window.images) == 10
+    print("Display throttling: PASSED")
+
+
+def test_single_jpeg_of_downscaled_annotated_canvas():
+    window = FakeWindow()
+    publisher = FramePublisher(window, max_fps=None, max_width=960)
+    original = frame()
+    decisions = [(1, (400, 200, 800, 1000), ["Helmet"], True)]
+    publisher.render(original, decisions, "header")
+
+    data, kwargs = window.images[0]
+    assert isinstance(data, bytes) and kwargs["output_format"] == "JPEG"
+    shown = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert shown.shape == (540, 960, 3)
+    # Box drawn at half scale, left edge at x=200
+    assert np.abs(shown[300, 200].astype(int) - VIOLATION_COLOR).max() < 40
+    assert (original == 40).all(), "The processed frame itself is never drawn on"
+    print("Single encode: PASSED")
+
+
+def test_canvas_buffer_is_reused():
+    publisher = FramePublisher(FakeWindow(), max_fps=None, max_width=None)
+    first, _ = publisher.canvas(frame(720, 1280))
+    second, scale = publisher.canvas(frame(720, 1280))
+    assert second is first and scale == 1.0
+    third, scale = publisher.canvas(frame(2160, 3840))
+    assert third.shape == (2160, 3840, 3), "Reallocated only when the size changes"
+    print("Canvas reuse: PASSED")
+
+
+if __name__ == "__main__":
+    test_publishes_at_display_rate()
+    test_single_jpeg_of_downscaled_annotated_canvas()
+    test_canvas_buffer_is_reused()
+    print("\nALL TESTS PASSED")
@@ -77,6 +77,53 @@ def test_violation_manager_cooldown_mode():
     print("✅ Cooldown mode works correctly!")
     print()
 
+def test_violation_manager_sources():
+    """Test that the same track ID on two cameras is tracked separately"""
+    print("\n" + "="*50)
+    print("TEST 2b: ViolationManager Per-Source State")
+    print("="*50)
+    
+    manager = ViolationManager(cooldown_seconds=1, log_once_per_session=True)
+    
+    assert manager.should_log(1, ["Helmet"], source="cam1") == True
+    assert manager.should_log(1, ["Helmet"], source="cam2") == True, "Other camera, same ID should log"
+    assert manager.should_log(1, ["Helmet"], source="cam1") == False
+    print("✅ Track IDs reused across cameras don't collide!")
+    
+    manager.reset_session(source="cam1")
+    assert manager.should_log(1, ["Helmet"], source="cam1") == True
+    assert manager.should_log(1, ["Helmet"], source="cam2") == False, "Resetting cam1 must not touch cam2"
+    print("✅ Per-source reset works correctly!")
+    print()
+
+def test_violation_manager_bulk_and_expiry():
+    """Test the bulk API and that expired cooldowns are dropped"""
+    print("\n" + "="*50)
+    print("TEST 2c: ViolationManager Bulk Check and Cooldown Expiry")
+    print("="*50)
+    
+    manager = ViolationManager(cooldown_seconds=3, log_once_per_session=False)
+    frame = [(1, ["Helmet"]), (2, ["Vest"]), (1, ["Helmet"]), (3, [])]
+    
+    result = manager.should_log_many(frame, source="cam1", now=100.0)
+    print(f"Bulk check: {result}")
+    assert result == [True, True, False, False]
+    
+    assert manager.should_log_many(frame[:2], source="cam1", now=102.9) == [False, False]
+    assert manager.should_log_many(frame[:2], source="cam1", now=103.0) == [True, True], \
+        "Cooldown expires after exactly cooldown_seconds"
+    print("✅ Bulk check matches per-person rules!")
+    
+    # Thousands of one-off violations must not pile up once they expire
+    for pid in range(5000):
+        manager.should_log(pid + 10, ["Helmet"], source="cam2", now=200.0)
+    assert manager.cooling_down() == 5000, "cam1 entries expired before these were added"
+    manager.should_log(0, ["Helmet"], source="cam2", now=203.0)
+    print(f"Entries after expiry: {manager.cooling_down()}")
+    assert manager.cooling_down() == 1, "Expired cooldowns should be dropped"
+    print("✅ Expired cooldowns are dropped!")
+    print()
+
 def test_database_connection():
     """Test that database connection and logging works"""
     print("\n" + "="*50)
@@ -186,6 +233,8 @@ def run_all_tests():
     try:
         test_violation_manager_session_mode()
         test_violation_manager_cooldown_mode()
+        test_violation_manager_sources()
+        test_violation_manager_bulk_and_expiry()
         test_database_connection()
         test_ppe_detection_logic()
         
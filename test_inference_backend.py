@@ -0,0 +1,156 @@
+"""
+Tests for ONNX backend output decoding and export caching (no model needed)
+"""
+
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+import inference
+from inference import BatchedTracker
+from inference_backend import OnnxModel, cached_onnx_path, decode_predictions
+from ppe_detector import PPEDetector
+from preprocess import Preprocessor
+
+
+def raw_output(rows, num_classes=3):
+    """(4 + classes, anchors) array like a YOLOv8 ONNX export, from (cx, cy, w, h, cls, score) rows."""
+    pred = np.zeros((4 + num_classes, len(rows)), dtype=np.float32)
+    for i, (cx, cy, w, h, cls, score) in enumerate(rows):
+        pred[:4, i] = cx, cy, w, h
+        pred[4 + cls, i] = score
+    return pred
+
+
+def test_decode_matches_ultralytics_rules():
+    pred = raw_output([
+        (50, 50, 20, 40, 0, 0.9),    # kept
+        (51, 50, 20, 40, 0, 0.8),    # same class, overlaps the first: suppressed
+        (51, 50, 20, 40, 1, 0.7),    # other class at the same place: kept
+        (200, 200, 10, 10, 2, 0.3),  # exactly at conf: dropped (conf is exclusive)
+        (300, 300, 10, 10, 2, 0.31),
+    ])
+    det = decode_predictions(pred, conf=0.3, iou=0.7)
+    assert det.shape == (3, 6)
+    assert np.allclose(det[0], [40, 30, 60, 70, 0.9, 0]), "xywh -> xyxy, best first"
+    assert det[:, 5].tolist() == [0, 1, 2]
+
+    assert decode_predictions(pred, conf=0.3, classes=[1])[:, 5].tolist() == [1]
+    assert len(decode_predictions(pred, conf=0.3, max_det=2)) == 2
+    assert decode_predictions(raw_output([]), conf=0.3).shape == (0, 6)
+    print("Decoding: PASSED")
+
+
+def test_static_model_pads_letterboxed_batch():
+    model = object.__new__(OnnxModel)
+    model.dynamic, model.imgsz = False, 64
+    batch = np.ones((2, 3, 32, 64), dtype=np.float32)
+    padded, (top, left) = model._fit(batch)
+    assert padded.shape == (2, 3, 64, 64) and (top, left) == (16, 0)
+    assert np.all(padded[:, :, 16:48] == 1) and np.allclose(padded[:, :, :16], 114 / 255)
+    print("Static padding: PASSED")
+
+
+def test_cache_path_follows_weights_content():
+    weights = os.path.join(tempfile.mkdtemp(), "best.pt")
+    with open(weights, "wb") as f:
+        f.write(b"v1")
+    first = cached_onnx_path(weights, 640, True, "cache")
+    assert first == cached_onnx_path(weights, 640, True, "cache")
+    assert os.path.basename(first).startswith("best-") and first.endswith("-640-dyn.onnx")
+    assert cached_onnx_path(weights, 640, False, "cache") != first
+    with open(weights, "wb") as f:
+        f.write(b"v2")
+    assert cached_onnx_path(weights, 640, True, "cache") != first, "Retrained weights re-export"
+    print("Export cache key: PASSED")
+
+
+class StubOnnxModel(OnnxModel):
+    """OnnxModel whose network finds one box of cls at box (letterbox coordinates) per image."""
+
+    def __init__(self, box=(16, 16, 48, 48), cls=0, names=None):
+        self.names = names or {0: "person", 1: "helmet"}
+        self.imgsz, self.dynamic = 64, True
+        self.backend, self.threads = "onnxruntime", 1
+        self._preprocessors = {}
+        self.box, self.cls = box, cls
+        self.batches = []
+
+    def _forward(self, batch):
+        self.batches.append(batch.shape)
+        x1, y1, x2, y2 = self.box
+        rows = [((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, self.cls, 0.9)]
+        return np.stack([raw_output(rows, len(self.names)) for _ in batch])
+
+
+def test_batched_tracker_runs_onnx_results():
+    model = StubOnnxModel()
+    frames = [np.zeros((120, 160, 3), dtype=np.uint8)] * 3
+    original = inference.TRACKER
+    inference.TRACKER = "numpy"     # ultralytics' tracker needs ultralytics installed
+    try:
+        tracker = BatchedTracker(model, batch_size=2, preprocessor=Preprocessor(64), imgsz=64)
+    finally:
+        inference.TRACKER = original
+    tracks = tracker.track_batch(frames)
+
+    assert model.batches == [(2, 3, 64, 64), (1, 3, 64, 64)], "NumPy batches, no torch tensor"
+    # Letterbox 160x120 -> 64x48 (scale 0.4), padded 8 px top and bottom
+    for t in tracks:
+        assert t.shape == (1, 7)
+        assert np.allclose(t[0, :4], [40, 20, 120, 100], atol=0.5) and t[0, 4] == 1
+    print("BatchedTracker on ONNX results: PASSED")
+
+
+def stub_detector(model):
+    detector = object.__new__(PPEDetector)
+    detector.model = model
+    detector.entry = type("Entry", (), {"lock": threading.Lock()})()
+    detector.required_ppe = {"helmet", "vest"}
+    detector._labels = {i: name.lower() for i, name in model.names.items()}
+    detector._batch = None
+    return detector
+
+
+def test_ppe_detector_runs_onnx_results():
+    detector = stub_detector(StubOnnxModel(cls=1))
+    crops = [np.zeros((100, 40, 3), dtype=np.uint8), np.zeros((80, 60, 3), dtype=np.uint8)]
+    assert detector.detect_batch(crops) == [({"helmet"}, ["vest"])] * 2
+    assert detector.detect(crops[0]) == ({"helmet"}, ["vest"])
+    print("PPEDetector on ONNX results: PASSED")
+
+
+class SmallObjectStub(StubOnnxModel):
+    """Finds a helmet only where a white patch covers at least 16 input pixels."""
+
+    def _forward(self, batch):
+        self.batches.append(batch.shape)
+        scores = [0.9 if (image[0] > 0.9).sum() >= 16 else 0.0 for image in batch]
+        return np.stack([raw_output([(8, 8, 8, 8, 1, s)], len(self.names)) for s in scores])
+
+
+def test_ppe_detector_batch_matches_single_crop_scale():
+    detector = stub_detector(SmallObjectStub())
+    crop = np.zeros((128, 64, 3), dtype=np.uint8)
+    crop[20:30, 20:30] = 255           # 5x5 once scaled to the model's 64, ~2x2 at 32
+    crops = [crop, np.zeros((128, 64, 3), dtype=np.uint8)]
+
+    single = [detector.detect(c) for c in crops]
+    assert single == [({"helmet"}, ["vest"]), (set(), ["helmet", "vest"])]
+    assert detector.model.batches[-1] == (1, 3, 64, 32)
+    assert detector.detect_batch(crops) == single, "Default size is the model's imgsz"
+    assert detector.model.batches[-1] == (2, 3, 64, 32), "Same input shape as detect(), not a square"
+    assert detector.detect_batch(crops, size=32)[0] == (set(), ["helmet", "vest"])
+    print("PPEDetector batch/single parity: PASSED")
+
+
+if __name__ == "__main__":
+    test_decode_matches_ultralytics_rules()
+    test_static_model_pads_letterboxed_batch()
+    test_cache_path_follows_weights_content()
+    test_batched_tracker_runs_onnx_results()
+    test_ppe_detector_runs_onnx_results()
+    test_ppe_detector_batch_matches_single_crop_scale()
+    print("\nALL TESTS PASSED")
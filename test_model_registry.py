@@ -0,0 +1,88 @@
+"""
+Tests for the process-wide model registry
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import model_registry
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+        self.predictions = 0
+
+    def predict(self, frame, **kwargs):
+        self.predictions += 1
+        return []
+
+
+def with_fake_loader(test):
+    def run():
+        original = model_registry._load_weights
+        loads = []
+
+        def fake_load(path):
+            time.sleep(0.05)  # make concurrent loads overlap
+            loads.append(path)
+            if "broken" in path:
+                raise RuntimeError("corrupt weights")
+            return FakeModel(path)
+
+        model_registry._load_weights = fake_load
+        model_registry._entries.clear()
+        model_registry._failed.clear()
+        try:
+            test(loads)
+        finally:
+            model_registry._load_weights = original
+            model_registry._entries.clear()
+            model_registry._failed.clear()
+    run.__name__ = test.__name__
+    return run
+
+
+@with_fake_loader
+def test_model_loaded_once_across_threads(loads):
+    entries = []
+    threads = [
+        threading.Thread(target=lambda: entries.append(model_registry.load_model("a.pt")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loads == ["a.pt"]
+    assert all(e is entries[0] for e in entries)
+    assert entries[0].model.predictions == 1, "Warm-up should run exactly once"
+    assert entries[0].load_seconds > 0
+    print("Loaded once: PASSED")
+
+
+@with_fake_loader
+def test_get_model_falls_back_and_reports_path(loads):
+    tmp = tempfile.mkdtemp()
+    broken = os.path.join(tmp, "broken.pt")
+    good = os.path.join(tmp, "good.pt")
+    for path in (broken, good):
+        open(path, "w").close()
+
+    entry = model_registry.get_model([os.path.join(tmp, "missing.pt"), broken, good])
+    assert entry.path == good
+    assert model_registry.loaded_models()[0]["path"] == good
+
+    # Later reruns reuse the entry without retrying the broken file
+    assert model_registry.get_model([broken, good]) is entry
+    assert loads == [broken, good]
+    print("Fallback and reporting: PASSED")
+
+
+if __name__ == "__main__":
+    test_model_loaded_once_across_threads()
+    test_get_model_falls_back_and_reports_path()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,81 @@
+"""
+Tests for motion-gated inference on static scenes
+"""
+
+import numpy as np
+
+from benchmark import StubTracker, BACKGROUND, PERSON_COLOR
+from motion_gate import MotionGate, GatedTracker
+
+
+def scene(x=None, noise=0, seed=0):
+    """640x360 empty bay, with a person at column x if given."""
+    frame = np.full((360, 640, 3), BACKGROUND, dtype=np.uint8)
+    if noise:
+        jitter = np.random.default_rng(seed).integers(-noise, noise + 1, frame.shape)
+        frame = np.clip(frame.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+    if x is not None:
+        frame[100:300, x:x + 80] = PERSON_COLOR
+    return frame
+
+
+def walk_in_stand_leave():
+    """Idle, person walks in, stands still, walks out, idle again."""
+    return ([scene() for _ in range(20)]
+            + [scene(20 * i) for i in range(12)]
+            + [scene(240) for _ in range(20)]
+            + [scene(240 + 40 * i) for i in range(1, 12)]
+            + [scene() for _ in range(20)])
+
+
+class CountingTracker(StubTracker):
+    def __init__(self):
+        super().__init__()
+        self.frames_seen = 0
+
+    def track_batch(self, frames):
+        self.frames_seen += len(frames)
+        return super().track_batch(frames)
+
+
+def test_static_scene_is_skipped_with_keepalive():
+    gate = MotionGate(keepalive=5)
+    decisions = [gate.should_infer(scene(noise=3, seed=i)) for i in range(25)]
+    assert decisions[0], "First frame has nothing to compare against"
+    # Sensor noise doesn't count as motion; the keepalive still runs every 6th frame
+    assert [i for i, d in enumerate(decisions) if d] == [0, 6, 12, 18, 24]
+    assert gate.stats()["skipped"] == 20
+    print("Static scene: PASSED")
+
+
+def test_motion_and_tracking_always_infer():
+    gate = MotionGate(keepalive=100)
+    gate.should_infer(scene())
+    assert gate.should_infer(scene(100)), "A person appearing is motion"
+    assert not gate.should_infer(scene(100)), "Nothing moved and nothing tracked"
+    assert gate.should_infer(scene(100), tracking=True), "Tracked people are always checked"
+    print("Motion / tracking: PASSED")
+
+
+def test_gated_tracker_keeps_track_ids():
+    frames = walk_in_stand_leave()
+    expected = [t[:, 4].tolist() for t in StubTracker().track_batch(frames)]
+
+    for batch_size in (1, 4):
+        inner = CountingTracker()
+        gated = GatedTracker(inner, MotionGate(keepalive=10))
+        ids = []
+        for start in range(0, len(frames), batch_size):
+            ids += [t[:, 4].tolist() for t in gated.track_batch(frames[start:start + batch_size])]
+
+        assert ids == expected, f"batch {batch_size}: gating must not change track ids"
+        assert inner.frames_seen < len(frames) - 30, "Idle frames should not reach the detector"
+        assert gated.stats()["skipped"] == len(frames) - inner.frames_seen
+    print("Track ids unchanged: PASSED")
+
+
+if __name__ == "__main__":
+    test_static_scene_is_skipped_with_keepalive()
+    test_motion_and_tracking_always_infer()
+    test_gated_tracker_keeps_track_ids()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,154 @@
+"""
+Tests for the staged capture / inference / display pipeline
+"""
+
+import threading
+import time
+
+from pipeline import FramePipeline, StageQueue
+
+
+class FakeCapture:
+    """Mimics cv2.VideoCapture over a list of integer 'frames'."""
+
+    def __init__(self, n_frames, read_delay=0.0):
+        self.frames = list(range(n_frames))
+        self.read_delay = read_delay
+        self.pos = 0
+        self.grabs = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        if self.pos >= len(self.frames):
+            return False, None
+        frame = self.frames[self.pos]
+        self.pos += 1
+        return True, frame
+
+    def grab(self):
+        if self.pos >= len(self.frames):
+            return False
+        self.pos += 1
+        self.grabs += 1
+        return True
+
+
+def test_pipeline_keeps_order_and_stride():
+    cap = FakeCapture(30)
+    pipeline = FramePipeline(cap, lambda frames: [f * 10 for f in frames], frame_stride=3, queue_size=2)
+    out = list(pipeline)
+    pipeline.stop()
+
+    assert [idx for idx, _, _ in out] == list(range(3, 31, 3))
+    assert all(result == frame * 10 for _, frame, result in out)
+    assert all(frame == idx - 1 for idx, frame, _ in out)
+    assert pipeline.stats()["frames_read"] == 30
+    assert cap.grabs == 20, "Skipped frames should be grabbed, not retrieved"
+    print("Pipeline order/stride: PASSED")
+
+
+def test_block_policy_never_drops():
+    def slow_infer(frames):
+        time.sleep(0.002)
+        return frames
+
+    pipeline = FramePipeline(FakeCapture(50), slow_infer, queue_size=1, drop_policy="block")
+    out = list(pipeline)
+    pipeline.stop()
+
+    assert len(out) == 50
+    assert pipeline.stats()["dropped_before_inference"] == 0
+    print("Block policy: PASSED")
+
+
+def test_batched_inference_keeps_order():
+    batch_sizes = []
+
+    def infer(frames):
+        batch_sizes.append(len(frames))
+        return [f + 100 for f in frames]
+
+    pipeline = FramePipeline(FakeCapture(10), infer, queue_size=8, batch_size=4)
+    out = list(pipeline)
+    pipeline.stop()
+
+    assert [idx for idx, _, _ in out] == list(range(1, 11))
+    assert [result for _, _, result in out] == [f + 100 for f in range(10)]
+    assert sum(batch_sizes) == 10 and max(batch_sizes) <= 4
+    print("Batched inference: PASSED")
+
+
+def test_sampler_stride_is_read_per_frame():
+    class StepSampler:
+        stride = 1
+
+    sampler = StepSampler()
+    seen = []
+
+    def infer(frames):
+        seen.extend(frames)
+        if len(seen) == 3:
+            sampler.stride = 5
+        return frames
+
+    pipeline = FramePipeline(FakeCapture(40), infer, queue_size=1, sampler=sampler)
+    out = list(pipeline)
+    pipeline.stop()
+
+    idx = [i for i, _, _ in out]
+    assert idx[:3] == [1, 2, 3]
+    gaps = {b - a for a, b in zip(idx[5:], idx[6:])}
+    assert gaps == {5}, gaps
+    print("Sampler stride: PASSED")
+
+
+def test_drop_oldest_keeps_latest():
+    q = StageQueue(maxsize=2, drop_policy="drop_oldest")
+    stop = threading.Event()
+    for i in range(5):
+        q.put(i, stop)
+
+    assert q.dropped == 3
+    assert [q.get(stop), q.get(stop)] == [3, 4]
+    print("Drop oldest: PASSED")
+
+
+def test_drop_newest_keeps_earliest():
+    q = StageQueue(maxsize=2, drop_policy="drop_newest")
+    stop = threading.Event()
+    for i in range(5):
+        q.put(i, stop)
+
+    assert q.dropped == 3
+    assert [q.get(stop), q.get(stop)] == [0, 1]
+    print("Drop newest: PASSED")
+
+
+def test_inference_error_is_raised_to_consumer():
+    def broken(frames):
+        raise RuntimeError("model failed")
+
+    pipeline = FramePipeline(FakeCapture(5), broken)
+    try:
+        list(pipeline)
+        assert False, "Expected inference error to propagate"
+    except RuntimeError as e:
+        assert "model failed" in str(e)
+    finally:
+        pipeline.stop()
+    print("Error propagation: PASSED")
+
+
+if __name__ == "__main__":
+    test_pipeline_keeps_order_and_stride()
+    test_block_policy_never_drops()
+    test_batched_inference_keeps_order()
+    test_sampler_stride_is_read_per_frame()
+    test_drop_oldest_keeps_latest()
+    test_drop_newest_keeps_earliest()
+    test_inference_error_is_raised_to_consumer()
+    print("\nALL TESTS PASSED")
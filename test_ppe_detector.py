@@ -0,0 +1,54 @@
+"""
+Tests for batched person-crop preprocessing in ppe_detector
+"""
+
+import numpy as np
+
+from ppe_detector import letterbox_crops, person_crops, PAD_VALUE
+
+
+def test_letterbox_keeps_aspect_ratio_and_pads():
+    tall = np.full((200, 100, 3), 10, dtype=np.uint8)
+    wide = np.full((50, 160, 3), 20, dtype=np.uint8)
+    empty = np.zeros((0, 40, 3), dtype=np.uint8)
+
+    batch = letterbox_crops([tall, wide, empty], size=64)
+    assert batch.shape == (3, 64, 64, 3) and batch.dtype == np.uint8, "Fits the tall and the wide"
+
+    # Tall crop: 32 px wide, centered
+    assert (batch[0, :, 16:48] == 10).all()
+    assert (batch[0, :, :16] == PAD_VALUE).all() and (batch[0, :, 48:] == PAD_VALUE).all()
+    # Wide crop: 20 px tall, centered
+    assert (batch[1, 22:42] == 20).all() and (batch[1, :22] == PAD_VALUE).all()
+    assert (batch[2] == PAD_VALUE).all(), "Empty crops stay as padding"
+
+    # Only tall crops: as wide as the widest needs (rounded up to the stride), not square
+    batch = letterbox_crops([tall, np.full((250, 100, 3), 30, dtype=np.uint8)], size=64)
+    assert batch.shape == (2, 64, 32, 3)
+    assert (batch[0] == 10).all(), "32 px wide fills the 32 px batch"
+    assert (batch[1, :, 3:29] == 30).all() and (batch[1, :, :3] == PAD_VALUE).all()
+    print("Letterbox: PASSED")
+
+
+def test_buffer_is_reused():
+    buffer = np.empty((8, 64, 64, 3), dtype=np.uint8)
+    crops = [np.zeros((30, 20, 3), dtype=np.uint8)] * 3
+    batch = letterbox_crops(crops, size=64, out=buffer)
+    assert batch.shape == (3, 64, 64, 3) and np.shares_memory(batch, buffer)
+    batch = letterbox_crops([np.zeros((60, 20, 3), dtype=np.uint8)] * 2, size=64, out=buffer)
+    assert batch.shape == (2, 64, 32, 3) and np.shares_memory(batch, buffer)
+    print("Buffer reuse: PASSED")
+
+
+def test_person_crops_clip_to_frame():
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    crops = person_crops(frame, [(-10, -5, 50, 60), (180, 50, 250, 150)])
+    assert [c.shape[:2] for c in crops] == [(60, 50), (50, 20)]
+    print("Person crops: PASSED")
+
+
+if __name__ == "__main__":
+    test_letterbox_keeps_aspect_ratio_and_pads()
+    test_buffer_is_reused()
+    test_person_crops_clip_to_frame()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,85 @@
+"""
+Tests for pre-allocated detector preprocessing and decode downscaling
+"""
+
+import cv2
+import numpy as np
+
+from preprocess import Preprocessor, ScaledCapture, letterbox_shape, naive_preprocess
+
+
+def frames(n, shape=(1080, 1920, 3), seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(n)]
+
+
+class FakeCapture:
+    def __init__(self, frame):
+        self.frame = frame
+        self.released = False
+
+    def read(self):
+        return True, self.frame
+
+    def get(self, prop):
+        h, w = self.frame.shape[:2]
+        return {cv2.CAP_PROP_FRAME_WIDTH: w, cv2.CAP_PROP_FRAME_HEIGHT: h,
+                cv2.CAP_PROP_FPS: 25}.get(prop, 0)
+
+    def release(self):
+        self.released = True
+
+
+def test_rectangular_letterbox():
+    scale, resized, padded, offset = letterbox_shape((1080, 1920))
+    assert resized == (360, 640) and padded == (384, 640) and offset == (12, 0)
+    assert letterbox_shape((2160, 3840))[1:] == (resized, padded, offset)
+    assert letterbox_shape((1920, 1080))[2] == (640, 384), "Portrait pads the width"
+    print("Letterbox shape: PASSED")
+
+
+def test_matches_naive_and_reuses_buffers():
+    pre = Preprocessor(batch_size=4)
+    first = frames(4)
+    batch = pre(first)
+    assert batch.shape == (4, 3, 384, 640) and batch.dtype == np.float32
+    assert np.allclose(batch, naive_preprocess(first), atol=1e-7), "Same input as model.predict builds"
+    assert np.all(batch[:, :, :12] == np.float32(114 / 255)), "Padding kept between calls"
+
+    again = pre(frames(3, seed=1))
+    assert np.shares_memory(again, batch), "Second batch reuses the same buffer"
+    assert np.allclose(again, naive_preprocess(frames(3, seed=1)), atol=1e-7)
+    print("Pre-allocated batch: PASSED")
+
+
+def test_unscale_maps_back_to_frame():
+    pre = Preprocessor()
+    pre(frames(1))
+    det = np.array([[0, 12, 640, 372, 0.9, 0], [100, 0, 200, 384, 0.5, 24]], dtype=np.float32)
+    pre.unscale(det)
+    assert np.allclose(det[0, :4], [0, 0, 1920, 1080])
+    assert np.allclose(det[1, :4], [300, 0, 600, 1080]), "Clipped to the frame"
+    assert det[1, 5] == 24, "Other columns untouched"
+    print("Unscale: PASSED")
+
+
+def test_scaled_capture():
+    cap = ScaledCapture(FakeCapture(frames(1, (2160, 3840, 3))[0]), 1280)
+    ret, frame = cap.read()
+    assert ret and frame.shape == (720, 1280, 3)
+    assert cap.get(cv2.CAP_PROP_FRAME_WIDTH) == 1280 and cap.get(cv2.CAP_PROP_FRAME_HEIGHT) == 720
+    assert cap.get(cv2.CAP_PROP_FPS) == 25
+    cap.release()
+    assert cap.cap.released, "Other calls go to the wrapped capture"
+
+    small = ScaledCapture(FakeCapture(frames(1, (480, 640, 3))[0]), 1280)
+    assert small.read()[1].shape == (480, 640, 3), "Never upscales"
+    print("Decode downscaling: PASSED")
+
+
+if __name__ == "__main__":
+    test_rectangular_letterbox()
+    test_matches_naive_and_reuses_buffers()
+    test_unscale_maps_back_to_frame()
+    test_scaled_capture()
+    print("\nALL TESTS PASSED")
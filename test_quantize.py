@@ -0,0 +1,93 @@
+"""
+Tests for the INT8 quantization helpers that don't need ONNX Runtime
+"""
+
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from inference_backend import int8_path
+from quantize import (compare_int8, detection_agreement, head_nodes, iter_calibration_frames,
+                      match_detections)
+from test_inference_backend import StubOnnxModel
+
+
+def test_calibration_frames_from_images_and_videos():
+    folder = tempfile.mkdtemp()
+    for i in range(3):
+        cv2.imwrite(os.path.join(folder, f"img_{i}.png"), np.full((48, 64, 3), i * 50, np.uint8))
+    os.makedirs(os.path.join(folder, "cam2"))
+    writer = cv2.VideoWriter(os.path.join(folder, "cam2", "clip.avi"),
+                             cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), i * 8, np.uint8))
+    writer.release()
+    with open(os.path.join(folder, "notes.txt"), "w") as f:
+        f.write("not a frame")
+
+    frames = list(iter_calibration_frames(folder, max_frames=100, video_stride=10))
+    assert len(frames) == 3 + 3, "Images plus every 10th video frame, other files ignored"
+    assert all(f.shape == (48, 64, 3) for f in frames)
+    assert len(list(iter_calibration_frames(folder, max_frames=4, video_stride=10))) == 4
+    print("Calibration frames: PASSED")
+
+
+def test_head_nodes_keep_detect_postprocessing_in_float():
+    nodes = [
+        ("/model.0/conv/Conv", "Conv"),
+        ("/model.21/cv1/act/Mul", "Mul"),
+        ("/model.22/cv2.0/cv2.0.0/conv/Conv", "Conv"),
+        ("/model.22/Concat", "Concat"),
+        ("/model.22/dfl/Softmax", "Softmax"),
+        ("/model.22/Sigmoid", "Sigmoid"),
+    ]
+    assert head_nodes(nodes) == ["/model.22/Concat", "/model.22/dfl/Softmax", "/model.22/Sigmoid"]
+    assert head_nodes([("Conv_0", "Conv")]) == []
+    assert int8_path("onnx_cache/best-abc-640-dyn.onnx") == "onnx_cache/best-abc-640-dyn-int8.onnx"
+    print("Head nodes: PASSED")
+
+
+def test_int8_agreement_matches_same_class_boxes():
+    fp32 = np.array([[0, 0, 10, 10, 0.9, 0], [20, 20, 30, 30, 0.8, 1], [50, 50, 60, 60, 0.7, 2]],
+                    dtype=np.float32)
+    int8 = np.array([[0, 0, 10, 11, 0.85, 0],      # same box: matched
+                     [20, 20, 30, 30, 0.80, 2],    # right place, wrong class: FP (and FN)
+                     [0, 0, 10, 10, 0.40, 0]],     # duplicate of a matched box: FP
+                    dtype=np.float32)
+    assert match_detections(fp32, int8) == (1, 2, 2)
+    assert match_detections(fp32, int8[:0]) == (0, 0, 3)
+
+    stats = detection_agreement([fp32, fp32[:0]], [int8, int8[:0]])
+    assert np.isclose(stats["precision"], 1 / 3) and np.isclose(stats["recall"], 1 / 3)
+    assert detection_agreement([fp32], [fp32])["recall"] == 1.0
+    print("INT8 agreement: PASSED")
+
+
+def test_int8_report_runs_on_onnx_results():
+    folder = tempfile.mkdtemp()
+    paths = {"fp32": os.path.join(folder, "m.onnx"), "int8": os.path.join(folder, "m-int8.onnx")}
+    for name, size in (("fp32", 4096), ("int8", 1024)):
+        with open(paths[name], "wb") as f:
+            f.write(b"\0" * size)
+
+    def loader(path, threads=None):
+        # The INT8 model puts its box a little off, still well within IoU 0.5
+        return StubOnnxModel(box=(16, 16, 48, 48) if path == paths["fp32"] else (17, 16, 48, 49))
+
+    frames = [np.zeros((120, 160, 3), dtype=np.uint8)] * 4
+    report = compare_int8(paths["fp32"], paths["int8"], frames, loader=loader, conf=0.25)
+    assert report["frames"] == 4 and report["fp32"]["latency_ms"]["count"] == 4
+    assert report["int8"]["size_mb"] * 4 == report["fp32"]["size_mb"]
+    assert report["frames_same_count"] == 1.0 and 0 < report["max_box_diff_px"] < 5
+    assert report["precision"] == 1.0 and report["recall"] == 1.0
+    print("INT8 report: PASSED")
+
+
+if __name__ == "__main__":
+    test_calibration_frames_from_images_and_videos()
+    test_head_nodes_keep_detect_postprocessing_in_float()
+    test_int8_agreement_matches_same_class_boxes()
+    test_int8_report_runs_on_onnx_results()
+    print("\nALL TESTS PASSED")
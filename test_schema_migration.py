@@ -0,0 +1,130 @@
+"""
+Tests for the violations schema revision (bitmask column, indexes, migration)
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import database
+from database import (OTHER_BIT, PPE_BITS, encode_missing, decode_missing, masks_with,
+                      migrate_schema, unmapped_items)
+from violation_logic import log_violation
+
+
+def make_legacy_db():
+    """A database as created by the original init_db + migrate_db/add_date_col scripts."""
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        person_id INTEGER,
+        missing_ppe TEXT,
+        video_time TEXT,
+        timestamp TEXT,
+        status TEXT
+    )
+    """)
+    conn.execute("ALTER TABLE violations ADD COLUMN source TEXT")
+    conn.executemany(
+        "INSERT INTO violations (person_id, missing_ppe, video_time, timestamp, source, status) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (1, "Helmet, Vest", "00:00:01", "2026-01-05 10:00:00", "a.mp4", "VIOLATION"),
+            (2, "Shoes", "00:00:02", "2026-01-05 11:00:00", "a.mp4", "VIOLATION"),
+            (3, "helmet", "00:00:03", "2026-01-06 09:30:00", "b.mp4", "VIOLATION"),
+            (4, "Goggles, Helmet, Shoes", "00:00:04", "2026-01-06 09:45:00", "b.mp4", "VIOLATION"),
+            (5, "PPE Bag, Harness", "00:00:05", "2026-01-06 10:00:00", "b.mp4", "VIOLATION"),
+        ]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_mask_round_trip():
+    assert encode_missing(["Helmet", "Vest"]) == PPE_BITS["Helmet"] | PPE_BITS["Vest"]
+    assert encode_missing([]) == 0
+    assert encode_missing(["Unknown"]) == OTHER_BIT, "Unmapped items still leave a mark"
+    assert encode_missing(["PPE Bag", "ppe bag "]) == PPE_BITS["PPE Bag"]
+    assert decode_missing(encode_missing(["Vest", "Shoes"])) == ["Vest", "Shoes"]
+    assert unmapped_items("Helmet, Harness, ,ppe bag") == ["Harness"]
+    assert all(m & PPE_BITS["Vest"] for m in masks_with("Vest"))
+    assert len(masks_with("Vest")) == len(masks_with(None)) == 2 ** len(PPE_BITS)
+    print("Mask round trip: PASSED")
+
+
+def test_legacy_database_is_migrated():
+    path = make_legacy_db()
+    conn = sqlite3.connect(path)
+    old, new = migrate_schema(conn)
+    assert (old, new) == (0, database.SCHEMA_VERSION)
+
+    rows = conn.execute("SELECT person_id, date, missing_mask FROM violations ORDER BY id").fetchall()
+    assert rows == [
+        (1, "2026-01-05", PPE_BITS["Helmet"] | PPE_BITS["Vest"]),
+        (2, "2026-01-05", PPE_BITS["Shoes"]),
+        (3, "2026-01-06", PPE_BITS["Helmet"]),
+        (4, "2026-01-06", PPE_BITS["Goggles"] | PPE_BITS["Helmet"] | PPE_BITS["Shoes"]),
+        (5, "2026-01-06", PPE_BITS["PPE Bag"] | OTHER_BIT),
+    ]
+
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(violations)")}
+    assert set(database.VIOLATION_INDEXES) <= indexes
+
+    # Running it again is a no-op
+    assert migrate_schema(conn) == (database.SCHEMA_VERSION, database.SCHEMA_VERSION)
+
+    # Version 3 databases had no bit for "PPE Bag" or unmapped items
+    with conn:
+        conn.execute("UPDATE violations SET missing_mask = 0 WHERE person_id = 5")
+        conn.execute("PRAGMA user_version = 3")
+    assert migrate_schema(conn) == (3, database.SCHEMA_VERSION)
+    assert conn.execute("SELECT missing_mask FROM violations WHERE person_id = 5").fetchone() == (
+        PPE_BITS["PPE Bag"] | OTHER_BIT,)
+    conn.close()
+    print("Legacy migration: PASSED")
+
+
+def test_gear_filter_uses_index():
+    path = make_legacy_db()
+    conn = sqlite3.connect(path)
+    migrate_schema(conn)
+
+    masks = masks_with("Helmet")
+    placeholders = ", ".join("?" * len(masks))
+    query = f"SELECT person_id FROM violations WHERE missing_mask IN ({placeholders}) ORDER BY person_id"
+    assert [r[0] for r in conn.execute(query, masks)] == [1, 3, 4]
+
+    plan = " ".join(str(r[-1]) for r in conn.execute("EXPLAIN QUERY PLAN " + query, masks))
+    assert "idx_violations_missing_mask" in plan, plan
+    conn.close()
+    print("Indexed gear filter: PASSED")
+
+
+def test_new_rows_get_mask():
+    original = database.DB_NAME
+    database.DB_NAME = make_legacy_db()
+    try:
+        # First get_connection() migrates the legacy file automatically
+        log_violation(42, ["Vest", "Helmet"], "00:01:00", "c.mp4")
+        conn = database.get_connection()
+        row = conn.execute("SELECT missing_ppe, missing_mask, date, source FROM violations "
+                           "WHERE person_id = 42").fetchone()
+        conn.close()
+        assert row["missing_ppe"] == "Vest, Helmet"
+        assert row["missing_mask"] == PPE_BITS["Helmet"] | PPE_BITS["Vest"]
+        assert row["date"] is not None and row["source"] == "c.mp4"
+        print("New rows get mask: PASSED")
+    finally:
+        database.close_pools()
+        database.DB_NAME = original
+
+
+if __name__ == "__main__":
+    test_mask_round_trip()
+    test_legacy_database_is_migrated()
+    test_gear_filter_uses_index()
+    test_new_rows_get_mask()
+    print("\nALL TESTS PASSED")
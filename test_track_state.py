@@ -0,0 +1,140 @@
+"""
+Tests for TTL-evicted track state, including a memory soak test.
+
+The soak runs 20k frames by default; set PPE_SOAK_FRAMES=2000000 for the
+multi-million frame run.
+"""
+
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from association import Association
+from compliance import ComplianceState
+from track_state import TrackStateStore, track_buffer_frames
+from violation_manager import ViolationManager
+
+SOAK_FRAMES = int(os.environ.get("PPE_SOAK_FRAMES", 20000))
+
+
+def frame_people(ids):
+    """Association for persons missing all gear, with the given track ids."""
+    n = len(ids)
+    boxes = np.tile(np.array([[10, 10, 50, 150]]), (n, 1))
+    none = np.zeros(n, dtype=bool)
+    return Association(ids=np.asarray(ids), boxes=boxes, confs=np.ones(n), head=boxes,
+                       torso=boxes, foot=boxes, helmet=none, vest=none, boots=none)
+
+
+def test_track_buffer_read_from_config():
+    assert track_buffer_frames() == 60, "bytetrack.yaml sets track_buffer: 60"
+    assert track_buffer_frames(frame_rate=15) == 30, "Scaled like ByteTrack's max_time_lost"
+
+    path = os.path.join(tempfile.mkdtemp(), "tracker.yaml")
+    with open(path, "w") as f:
+        f.write("tracker_type: bytetrack\n")
+    assert track_buffer_frames(path) == 30, "Falls back to the ultralytics default"
+    print("Track buffer: PASSED")
+
+
+def test_tracks_evicted_after_ttl():
+    store = TrackStateStore(ttl=3)
+    store.tick()
+    store.touch(1)
+    store.touch(2)
+    for _ in range(3):
+        store.tick()
+        store.touch(2)
+    assert 1 in store, "Gone for exactly ttl updates: ByteTrack may still recover it"
+    store.tick()
+    store.touch(2)
+    assert 1 not in store and 2 in store
+    assert store.evicted == 1
+    print("TTL eviction: PASSED")
+
+
+def test_compliance_and_manager_share_evicted_state():
+    state = ComplianceState(warmup_frames=0, consecutive_threshold=1,
+                            tracks=TrackStateStore(ttl=5))
+    manager = ViolationManager(log_once_per_session=True, tracks=state.tracks, source="cam1")
+
+    for pid, _, missing, confirmed in state.update(frame_people([7])):
+        assert confirmed and manager.should_log_many([(pid, missing)], "cam1") == [True]
+    assert manager.should_log_many([(7, ["Helmet"])], "cam1") == [False], "Once per session"
+    assert manager.should_log(7, ["Helmet"], "cam2"), "Same ID on another camera"
+    assert manager.store("cam1") is state.tracks and manager.store("cam2") is not state.tracks
+
+    for _ in range(10):
+        state.update(frame_people([8]))
+    assert 7 not in state.tracks and len(state.tracks) == 1, "Nothing kept outside the store"
+    print("Shared eviction: PASSED")
+
+
+def test_cooldowns_on_shared_store_expire_and_evict():
+    state = ComplianceState(warmup_frames=0, consecutive_threshold=1,
+                            tracks=TrackStateStore(ttl=5))
+    manager = ViolationManager(cooldown_seconds=3, log_once_per_session=False,
+                               tracks=state.tracks, source="cam1")
+
+    confirmed = [(pid, missing) for pid, _, missing, ok in state.update(frame_people([1, 2])) if ok]
+    assert manager.should_log_many(confirmed, "cam1", now=100.0) == [True, True]
+    assert manager.should_log_many(confirmed, "cam1", now=102.9) == [False, False]
+    assert manager.cooling_down() == 2
+    assert manager.should_log_many(confirmed[:1], "cam1", now=103.0) == [True]
+    assert manager.cooling_down() == 1, "Person 2's cooldown expired without being checked"
+
+    manager.reset_session("cam2")
+    assert not manager.should_log(1, confirmed[0][1], "cam1", now=104.0), "cam2 reset leaves cam1"
+    manager.reset_session("cam1")
+    assert manager.should_log(1, confirmed[0][1], "cam1", now=104.0)
+
+    for _ in range(10):
+        state.update(frame_people([3]))
+    assert manager.cooling_down() == 0, "Cooldowns leave with their evicted tracks"
+    print("Shared-store cooldowns: PASSED")
+
+
+def test_soak_memory_stays_flat():
+    state = ComplianceState(warmup_frames=9, tracks=TrackStateStore(ttl=60))
+    manager = ViolationManager(log_once_per_session=True, tracks=state.tracks)
+
+    # A new person enters every 20 frames and stays for 100 (5 on screen at once)
+    lifetime, arrival = 100, 20
+    checkpoints = []
+    gc.collect()    # Garbage left by earlier tests would otherwise be freed mid-soak
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        for frame in range(SOAK_FRAMES):
+            first = max(0, frame - lifetime) // arrival
+            ids = list(range(first, frame // arrival + 1))
+            for pid, _, missing, confirmed in state.update(frame_people(ids)):
+                if confirmed:
+                    manager.should_log(pid, missing)
+            if frame and frame % (SOAK_FRAMES // 10) == 0:
+                checkpoints.append((len(state.tracks), tracemalloc.get_traced_memory()[0]))
+    finally:
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - t0
+
+    sizes = [n for n, _ in checkpoints]
+    memory = [m for _, m in checkpoints]
+    assert max(sizes) <= lifetime // arrival + 60 // arrival + 2, sizes
+    assert state.tracks.evicted > SOAK_FRAMES // arrival - 20
+    # Later checkpoints may not exceed the first by more than a few KB
+    assert max(memory[1:]) - memory[0] < 64 * 1024, memory
+    print(f"Soak ({SOAK_FRAMES} frames, {elapsed:.1f}s, {max(sizes)} live tracks, "
+          f"{max(memory) / 1024:.0f} KiB traced): PASSED")
+
+
+if __name__ == "__main__":
+    test_track_buffer_read_from_config()
+    test_tracks_evicted_after_ttl()
+    test_compliance_and_manager_share_evicted_state()
+    test_cooldowns_on_shared_store_expire_and_evict()
+    test_soak_memory_stays_flat()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,138 @@
+"""
+Tests for chunked upload staging and reading videos that are still being copied
+"""
+
+import io
+import os
+import struct
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from upload_store import (
+    is_streamable, stage_upload, cleanup_uploads, FollowingCapture
+)
+
+
+class SlowUpload(io.BytesIO):
+    """BytesIO that hands out data slowly, like a large upload being copied."""
+
+    def read(self, size=-1):
+        time.sleep(0.01)
+        return super().read(size)
+
+
+def write_avi(path, frames=60):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (160, 120))
+    for i in range(frames):
+        frame = np.full((120, 160, 3), 40, dtype=np.uint8)
+        cv2.putText(frame, str(i), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def box(kind, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def test_streamable_containers():
+    assert is_streamable(box(b"ftyp", b"isom") + box(b"moov") + box(b"mdat"))
+    assert not is_streamable(box(b"ftyp", b"isom") + box(b"mdat") + box(b"moov"))
+    assert is_streamable(b"RIFF\x00\x00\x00\x00AVI LIST")
+    assert is_streamable(b"\x1a\x45\xdf\xa3rest")
+    assert not is_streamable(b"")
+    print("Streamable detection: PASSED")
+
+
+def test_identical_uploads_are_stored_once():
+    upload_dir = tempfile.mkdtemp()
+    data = os.urandom(300 * 1024)
+
+    first = stage_upload(io.BytesIO(data), "shift.MP4", upload_dir, chunk_size=64 * 1024)
+    first.wait()
+    second = stage_upload(io.BytesIO(data), "copy.mp4", upload_dir, chunk_size=64 * 1024)
+    second.wait()
+
+    assert first.path == second.path and first.path.endswith(".mp4")
+    assert second.reused and not first.reused
+    assert os.listdir(upload_dir) == [os.path.basename(first.path)], "Part files should be gone"
+    with open(first.path, "rb") as f:
+        assert f.read() == data
+    print("Content-hash dedupe: PASSED")
+
+
+def test_cleanup_by_age_and_size():
+    upload_dir = tempfile.mkdtemp()
+    paths = []
+    for i in range(3):
+        path = os.path.join(upload_dir, f"{i}.mp4")
+        with open(path, "wb") as f:
+            f.write(b"x" * 1000)
+        os.utime(path, (time.time() - 100 * (3 - i),) * 2)  # 0 is the oldest
+        paths.append(path)
+
+    assert cleanup_uploads(upload_dir, max_age=250, max_bytes=10 ** 9) == 1
+    assert not os.path.exists(paths[0])
+    assert cleanup_uploads(upload_dir, max_age=10 ** 6, max_bytes=1000) == 1
+    assert os.listdir(upload_dir) == ["2.mp4"]
+    print("Cleanup: PASSED")
+
+
+def test_cleanup_spares_uploads_in_use():
+    upload_dir = tempfile.mkdtemp()
+    reading = stage_upload(io.BytesIO(b"r" * 1000), "reading.mp4", upload_dir)
+    reading.wait()
+    copying = stage_upload(SlowUpload(b"c" * 1000), "copying.mp4", upload_dir, chunk_size=10)
+    old = time.time() - 100
+    os.utime(reading.path, (old, old))
+    for name in ("other.mp4", "abandoned.mp4.part"):
+        with open(os.path.join(upload_dir, name), "wb") as f:
+            f.write(b"x" * 1000)
+        os.utime(os.path.join(upload_dir, name), (old, old))
+
+    # Over the size limit: only the unused finished file may go
+    assert cleanup_uploads(upload_dir, max_age=10 ** 6, max_bytes=0) == 1
+    assert not os.path.exists(os.path.join(upload_dir, "other.mp4"))
+    assert os.path.exists(reading.path) and os.path.exists(copying.path)
+    # Too old: the abandoned part file goes, the one being read stays
+    assert cleanup_uploads(upload_dir, max_age=50, max_bytes=0) == 1
+    assert os.path.exists(reading.path)
+
+    reading.close()
+    copying.wait()
+    copying.close()
+    assert cleanup_uploads(upload_dir, max_age=10 ** 6, max_bytes=0) == 2
+    assert os.listdir(upload_dir) == []
+    print("Cleanup spares uploads in use: PASSED")
+
+
+def test_capture_reads_every_frame_while_copying():
+    data = write_avi(os.path.join(tempfile.mkdtemp(), "source.avi"))
+    upload = stage_upload(SlowUpload(data), "cam.avi", tempfile.mkdtemp(),
+                          chunk_size=max(1024, len(data) // 20))
+
+    cap = FollowingCapture(upload, start_bytes=1024)
+    assert not upload.done.is_set(), "A streamable upload should open before the copy finishes"
+    frames = 0
+    while True:
+        ret, _ = cap.read()
+        if not ret:
+            break
+        frames += 1
+    cap.release()
+    assert upload.done.is_set()
+    assert frames == 60
+    print("Read while copying: PASSED")
+
+
+if __name__ == "__main__":
+    test_streamable_containers()
+    test_identical_uploads_are_stored_once()
+    test_cleanup_by_age_and_size()
+    test_cleanup_spares_uploads_in_use()
+    test_capture_reads_every_frame_while_copying()
+    print("\nALL TESTS PASSED")
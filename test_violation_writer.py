@@ -0,0 +1,85 @@
+"""
+Tests for the background, batched violation writer
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import database
+from violation_writer import ViolationWriter
+
+
+def use_temp_db():
+    path = os.path.join(tempfile.mkdtemp(), "writer_test.db")
+    original = database.DB_NAME
+    database.DB_NAME = path
+    database.init_db()
+    return path, original
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_burst_is_written_in_batches():
+    path, original = use_temp_db()
+    try:
+        writer = ViolationWriter(flush_interval=0.2, max_batch=50).start()
+        for pid in range(120):
+            writer.submit(pid, ["Helmet", "Vest"], "00:00:01", "burst.mp4")
+        writer.flush()
+
+        stats = writer.stats()
+        assert count_rows(path) == 120
+        assert stats["rows_written"] == 120
+        assert stats["queue_depth"] == 0
+        assert stats["batches_written"] < 120, "Rows should be grouped into transactions"
+        writer.stop()
+        print(f"Burst batching: PASSED ({stats['batches_written']} batches)")
+    finally:
+        database.DB_NAME = original
+
+
+def test_stop_flushes_pending_rows():
+    path, original = use_temp_db()
+    try:
+        writer = ViolationWriter(flush_interval=5.0).start()
+        for pid in range(10):
+            writer.submit(pid, ["Helmet"], "00:00:02", "shutdown.mp4")
+        t0 = time.perf_counter()
+        writer.stop()
+
+        assert count_rows(path) == 10
+        assert time.perf_counter() - t0 < 5.0, "Shutdown should not wait for the flush interval"
+        print("Flush on shutdown: PASSED")
+    finally:
+        database.DB_NAME = original
+
+
+def test_compliant_events_are_ignored():
+    path, original = use_temp_db()
+    try:
+        writer = ViolationWriter(flush_interval=0.05).start()
+        writer.submit(1, [], "00:00:03", "ok.mp4", status="COMPLIANT")
+        writer.submit(2, ["Vest"], "00:00:03", "ok.mp4")
+        writer.stop()
+
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT person_id, missing_ppe, source FROM violations").fetchall()
+        conn.close()
+        assert rows == [(2, "Vest", "ok.mp4")]
+        print("Compliant events ignored: PASSED")
+    finally:
+        database.DB_NAME = original
+
+
+if __name__ == "__main__":
+    test_burst_is_written_in_batches()
+    test_stop_flushes_pending_rows()
+    test_compliant_events_are_ignored()
+    print("\nALL TESTS PASSED")
@@ -0,0 +1,113 @@
+"""
+Per-track state that forgets tracks ByteTrack has forgotten.
+
+ComplianceState and ViolationManager used to keep dicts keyed by every track
+ID ever seen, which grow without bound on a 24/7 feed. TrackStateStore keeps
+one small TrackState per live track, ordered by when it was last seen, and
+drops a track once it has been missing for longer than ByteTrack keeps lost
+tracks (track_buffer in bytetrack.yaml). ByteTrack never reuses an ID, so an
+evicted track can't come back.
+
+The store's clock advances once per ComplianceState.update (one per frame
+with tracks), which never runs ahead of ByteTrack's own frame counter, so
+eviction always happens after ByteTrack has removed the track.
+"""
+
+from collections import OrderedDict
+
+from inference import TRACKER_CONFIG
+
+DEFAULT_TRACK_BUFFER = 30   # ultralytics default when the yaml doesn't set it
+
+
+def read_tracker_config(config_path=TRACKER_CONFIG):
+    """Tracker yaml as a dict (plain "key: value" lines if PyYAML is unavailable)."""
+    try:
+        import yaml
+    except ImportError:
+        yaml = None
+
+    with open(config_path) as f:
+        if yaml is not None:
+            return yaml.safe_load(f) or {}
+        cfg = {}
+        for line in f:
+            key, _, value = line.split("#", 1)[0].partition(":")
+            if key.strip() and value.strip():
+                cfg[key.strip()] = value.strip()
+        return cfg
+
+
+def track_buffer_frames(config_path=TRACKER_CONFIG, frame_rate=30):
+    """Tracker updates a lost track survives for (ByteTrack's max_time_lost)."""
+    try:
+        buffer = int(read_tracker_config(config_path).get("track_buffer", DEFAULT_TRACK_BUFFER))
+    except (OSError, ValueError):
+        buffer = DEFAULT_TRACK_BUFFER
+    return int(frame_rate / 30.0 * buffer)
+
+
+class TrackState:
+    __slots__ = ("last_seen", "frames", "streaks", "logged", "cooldowns")
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.frames = 0          # Source frames tracked (warm-up)
+        self.streaks = None      # {missing_tuple: consecutive observations} while violating
+        self.logged = False      # Logged this session (ViolationManager session mode)
+        self.cooldowns = None    # {missing_tuple: last logged time} (cooldown mode)
+
+
+class TrackStateStore:
+    def __init__(self, ttl=None, tracker_config=TRACKER_CONFIG, frame_rate=30):
+        """
+        Args:
+            ttl: Updates a track may be missing before it is evicted
+                 (default: track_buffer from the tracker config)
+            tracker_config: ByteTrack yaml to read track_buffer from
+            frame_rate: Frame rate given to ByteTrack (scales track_buffer like it does)
+        """
+        self.ttl = ttl if ttl is not None else track_buffer_frames(tracker_config, frame_rate)
+        self.clock = 0
+        self.evicted = 0
+        self._tracks = OrderedDict()   # track_id -> TrackState, least recently seen first
+
+    def tick(self):
+        """Advances the clock by one update and evicts expired tracks."""
+        self.clock += 1
+        self.evict()
+
+    def touch(self, track_id):
+        """State for a track seen in the current update (created if new)."""
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = TrackState(self.clock)
+        else:
+            state.last_seen = self.clock
+            self._tracks.move_to_end(track_id)
+        return state
+
+    def get(self, track_id):
+        return self._tracks.get(track_id)
+
+    def evict(self):
+        """Drops tracks unseen for more than ttl updates; oldest first, so O(evicted)."""
+        tracks = self._tracks
+        while tracks:
+            track_id, state = next(iter(tracks.items()))
+            if self.clock - state.last_seen <= self.ttl:
+                break
+            del tracks[track_id]
+            self.evicted += 1
+
+    def states(self):
+        return self._tracks.values()
+
+    def clear(self):
+        self._tracks.clear()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
@@ -0,0 +1,275 @@
+"""
+Disk staging for uploaded videos.
+
+Uploads are copied to disk in fixed-size chunks on a background thread
+(constant memory per upload beyond what Streamlit itself holds), hashed on the
+way, and stored as <sha256><ext> so the same video uploaded twice is kept
+once. Old files are removed by age and total size whenever a new upload
+starts; files another session is still copying or reading are left alone.
+
+When the container can be read from the front (MKV/WebM, AVI, MP4/MOV with
+the moov atom first) processing starts as soon as the first chunks are on
+disk; otherwise it starts once the copy has finished.
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "ppe_uploads")
+CHUNK_SIZE = 8 * 1024 * 1024            # Bytes per read/write
+START_BYTES = 4 * 1024 * 1024           # On disk before a streamable video is opened
+MAX_AGE_SECONDS = 24 * 3600             # Staged files older than this are removed
+MAX_CACHE_BYTES = 20 * 1024 ** 3        # ...and the oldest beyond this total size
+PART_SUFFIX = ".part"
+
+_in_use = weakref.WeakSet()             # StagedUploads not yet closed, in any session
+_in_use_lock = threading.Lock()
+
+
+def in_use_paths():
+    """Paths of staged uploads that are still being copied or read."""
+    with _in_use_lock:
+        return {upload.path for upload in _in_use}
+
+
+def is_streamable(header):
+    """True if a container can be decoded while it is still being written."""
+    if header[:4] == b"\x1a\x45\xdf\xa3":               # Matroska / WebM
+        return True
+    if header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return True
+    # MP4/MOV: walk top-level boxes; moov before mdat means "fast start"
+    offset = 0
+    while offset + 8 <= len(header):
+        size, kind = struct.unpack(">I4s", header[offset:offset + 8])
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            return False
+        if size == 1:
+            if offset + 16 > len(header):
+                return False
+            size = struct.unpack(">Q", header[offset + 8:offset + 16])[0]
+        if size < 8:
+            return False
+        offset += size
+    return False
+
+
+def cleanup_uploads(upload_dir=UPLOAD_DIR, max_age=MAX_AGE_SECONDS,
+                    max_bytes=MAX_CACHE_BYTES, keep=()):
+    """
+    Removes stale staged files (oldest first once over max_bytes). Returns files removed.
+
+    Files of open uploads are never removed, and part files only by age: a
+    copy in progress keeps touching its part file, so an old one was abandoned.
+    """
+    if not os.path.isdir(upload_dir):
+        return 0
+    keep = {os.path.abspath(path) for path in set(keep) | in_use_paths()}
+    now = time.time()
+    files = []
+    for name in os.listdir(upload_dir):
+        path = os.path.join(upload_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+
+    removed = 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if os.path.abspath(path) in keep:
+            continue
+        if now - mtime > max_age or (total > max_bytes and not path.endswith(PART_SUFFIX)):
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # Still open elsewhere (Windows); try again next time
+            total -= size
+            removed += 1
+    return removed
+
+
+class StagedUpload:
+    def __init__(self, fileobj, filename, upload_dir=UPLOAD_DIR, chunk_size=CHUNK_SIZE):
+        """
+        Copies fileobj to disk on a background thread; see start(). The file
+        is protected from cleanup_uploads() until close().
+
+        Attributes:
+            path: Where the video currently is (the .part file until the copy finishes)
+            bytes_written / total_bytes: Copy progress (total_bytes may be None)
+            sha256: Content hash once finished
+            reused: True if identical content was already staged
+        """
+        self.fileobj = fileobj
+        self.ext = os.path.splitext(filename)[1].lower() or ".bin"
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.total_bytes = getattr(fileobj, "size", None)
+        self.bytes_written = 0
+        self.header = b""
+        self.sha256 = None
+        self.reused = False
+        self.error = None
+        self.done = threading.Event()
+        self._progress = threading.Condition()
+        fd, self.path = tempfile.mkstemp(suffix=self.ext + PART_SUFFIX, dir=upload_dir)
+        os.close(fd)
+        self._thread = None
+        with _in_use_lock:
+            _in_use.add(self)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._copy, name="ppe-upload-copy", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, min_bytes=None, timeout=None):
+        """
+        Blocks until min_bytes are on disk (None = the whole file) or the copy
+        ends. Raises the copy error if there was one.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._progress:
+            while not self.done.is_set() and (min_bytes is None or self.bytes_written < min_bytes):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._progress.wait(remaining if remaining is not None else 0.5)
+        if self.error is not None:
+            raise self.error
+        return self.done.is_set()
+
+    def close(self):
+        """Done reading: the staged file may be cleaned up from now on."""
+        with _in_use_lock:
+            _in_use.discard(self)
+
+    def streamable(self):
+        return is_streamable(self.header)
+
+    def _copy(self):
+        digest = hashlib.sha256()
+        try:
+            if hasattr(self.fileobj, "seek"):
+                self.fileobj.seek(0)
+            with open(self.path, "wb") as out:
+                while True:
+                    chunk = self.fileobj.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    out.flush()
+                    digest.update(chunk)
+                    with self._progress:
+                        if len(self.header) < 64 * 1024:
+                            self.header += chunk[:64 * 1024 - len(self.header)]
+                        self.bytes_written += len(chunk)
+                        self._progress.notify_all()
+            self.sha256 = digest.hexdigest()
+            self._finalize()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._progress:
+                self.done.set()
+                self._progress.notify_all()
+
+    def _finalize(self):
+        final = os.path.join(self.upload_dir, self.sha256 + self.ext)
+        try:
+            if os.path.exists(final):
+                os.remove(self.path)
+                os.utime(final)   # Counts as recently used for cleanup
+                self.reused = True
+            else:
+                os.replace(self.path, final)
+        except OSError:
+            return  # Part file is still open elsewhere (Windows); keep using it
+        self.path = final
+
+
+def stage_upload(fileobj, filename, upload_dir=UPLOAD_DIR, chunk_size=CHUNK_SIZE):
+    """Starts staging an upload (cleaning up old ones first) and returns the StagedUpload."""
+    os.makedirs(upload_dir, exist_ok=True)
+    cleanup_uploads(upload_dir)
+    return StagedUpload(fileobj, filename, upload_dir, chunk_size).start()
+
+
+class FollowingCapture:
+    def __init__(self, upload, start_bytes=START_BYTES):
+        """
+        cv2.VideoCapture over a StagedUpload that may still be copying.
+
+        Streamable containers are opened once start_bytes are on disk; when
+        the decoder reaches the end of what has been written so far the
+        capture waits for more data, reopens the file and seeks back to the
+        next frame. Other containers are opened after the copy finishes.
+        """
+        import cv2
+
+        self._cv2 = cv2
+        self.upload = upload
+        self.position = 0
+        upload.wait(min_bytes=start_bytes)
+        if not upload.done.is_set() and not upload.streamable():
+            upload.wait()
+        self._complete = upload.done.is_set()
+        self.cap = self._open()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self):
+        while True:
+            ret, frame = self.cap.read()
+            if ret:
+                self.position += 1
+                return ret, frame
+            if not self._catch_up():
+                return False, None
+
+    def grab(self):
+        while True:
+            if self.cap.grab():
+                self.position += 1
+                return True
+            if not self._catch_up():
+                return False
+
+    def release(self):
+        self.cap.release()
+        self.upload.close()
+
+    def _catch_up(self):
+        """Waits for more of the upload and reopens at the current frame. False at the real end."""
+        if self._complete:
+            return False
+        self.upload.wait(min_bytes=self.upload.bytes_written + self.upload.chunk_size)
+        self._complete = self.upload.done.is_set()
+        self.cap.release()
+        self.cap = self._open()
+        if self.position:
+            self.cap.set(self._cv2.CAP_PROP_POS_FRAMES, self.position)
+        return self.cap.isOpened()
+
+    def _open(self):
+        while True:
+            cap = self._cv2.VideoCapture(self.upload.path)
+            if cap.isOpened() or self._complete:
+                return cap
+            # Headers not fully written yet (or the part file was just renamed)
+            cap.release()
+            self.upload.wait(min_bytes=self.upload.bytes_written + self.upload.chunk_size)
+            self._complete = self.upload.done.is_set()
@@ -0,0 +1,166 @@
+"""
+Saves the annotated detection stream to a video file.
+
+The detection loop only queues (frame, decisions, header); drawing, resizing
+and encoding happen on a background thread. The queue is bounded and a full
+queue drops the frame instead of waiting, so a slow disk or codec can never
+hold up detection. Gaps (sampled or dropped frames) are filled by repeating
+the previous output frame, so the file plays back at real speed.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+
+import cv2
+
+from display import draw_overlay
+
+CODECS = {          # fourcc -> container extension
+    "mp4v": ".mp4",
+    "avc1": ".mp4",  # H.264; needs an OpenCV build with it
+    "XVID": ".avi",
+    "MJPG": ".avi",
+}
+DEFAULT_CODEC = "mp4v"
+OUTPUT_DIR = os.environ.get("PPE_ANNOTATED_DIR", "annotated_videos")
+
+_STOP = object()
+
+
+def output_path(source, codec=DEFAULT_CODEC, directory=OUTPUT_DIR):
+    """<directory>/<source>_<timestamp><ext>, with the source name made file-safe."""
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(os.path.basename(source))[0])
+    return os.path.join(directory, f"{stem or 'stream'}_{time.strftime('%Y%m%d_%H%M%S')}"
+                                   f"{CODECS.get(codec, '.mp4')}")
+
+
+class AnnotatedVideoWriter:
+    def __init__(self, path, source_fps, fps=None, width=None, codec=DEFAULT_CODEC,
+                 max_queue=32):
+        """
+        Args:
+            path: Output file; its directory is created if needed
+            source_fps: Frame rate of the source, to place frames in time
+            fps: Output frame rate (None = source_fps); lower values drop frames
+            width: Output width (None = source width); height keeps the aspect ratio
+            codec: fourcc from CODECS
+            max_queue: Frames waiting for the writer thread; more are dropped
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec} (choose from {', '.join(CODECS)})")
+        self.path = path
+        self.source_fps = source_fps or 30
+        self.fps = min(fps or self.source_fps, self.source_fps)
+        self.width = width
+        self.codec = codec
+        self.queue = queue.Queue(maxsize=max(1, max_queue))
+
+        self._writer = None
+        self._thread = None
+        self._size = None
+        self._last_slot = -1        # Output slot of the last frame queued
+        self._written_slot = -1     # Output slot of the last frame written
+        self._previous = None       # Last written image, repeated to fill gaps
+
+        self.frames_queued = 0
+        self.frames_dropped = 0
+        self.frames_written = 0
+        self.error = None
+
+    def _open(self, frame_shape):
+        h, w = frame_shape[:2]
+        scale = min(1.0, self.width / w) if self.width else 1.0
+        # Even sizes: most encoders reject odd ones
+        self._size = (max(2, round(w * scale) // 2 * 2), max(2, round(h * scale) // 2 * 2))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec),
+                                       self.fps, self._size)
+        if not self._writer.isOpened():
+            self._writer = None
+            self.error = f"Could not open video writer for {self.path} ({self.codec})"
+            return
+        self._thread = threading.Thread(target=self._run, name="ppe-video-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame_idx, frame, decisions, header):
+        """
+        Queues a processed frame. Never blocks: returns False if the frame was
+        not needed at the output frame rate or the queue was full.
+
+        The frame must not be modified afterwards; it is drawn on a copy.
+        """
+        if self.error is not None:
+            return False
+        if self._writer is None:
+            self._open(frame.shape)
+            if self._writer is None:
+                return False
+
+        slot = int(frame_idx / self.source_fps * self.fps)
+        if slot <= self._last_slot:
+            return False  # Output frame rate already has a frame for this slot
+        try:
+            self.queue.put_nowait((slot, frame, decisions, header))
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+        self._last_slot = slot
+        self.frames_queued += 1
+        return True
+
+    def close(self):
+        """Writes everything queued, then finalizes the file. Returns its path."""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        return self.path
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "frames_queued": self.frames_queued,
+            "frames_dropped": self.frames_dropped,
+            "frames_written": self.frames_written,
+            "seconds": self.frames_written / self.fps,
+            "queue_depth": self.queue.qsize(),
+            "error": self.error,
+        }
+
+    def _render(self, frame, decisions, header):
+        if frame.shape[1::-1] != self._size:
+            image = cv2.resize(frame, self._size, interpolation=cv2.INTER_LINEAR)
+        else:
+            image = frame.copy()
+        return draw_overlay(image, decisions, header, self._size[0] / frame.shape[1])
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                slot, frame, decisions, header = item
+                image = self._render(frame, decisions, header)
+                # Slots skipped since the last frame keep showing that frame
+                if self._previous is not None:
+                    for _ in range(slot - self._written_slot - 1):
+                        self._writer.write(self._previous)
+                        self.frames_written += 1
+                self._writer.write(image)
+                self.frames_written += 1
+                self._previous = image
+                self._written_slot = slot
+        except Exception as e:
+            self.error = str(e)
+            # Keep draining so submit() never sees a full queue forever
+            while self.queue.get() is not _STOP:
+                pass
@@ -1,5 +1,6 @@
 from datetime import datetime
-from database import get_connection
+from database import get_connection, encode_missing
+import metrics
 
 def evaluate_violation(person_id, missing_ppe_list):
     """
@@ -13,6 +14,29 @@ def evaluate_violation(person_id, missing_ppe_list):
     return False, "VIOLATION"
 
 
+INSERT_VIOLATION_SQL = """
+INSERT INTO violations
+(person_id, missing_ppe, missing_mask, video_time, timestamp, date, source, status)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def violation_row(person_id, missing_ppe_list, video_time,
+                  source="Unknown", status="VIOLATION", now=None):
+    """Builds the parameter tuple for INSERT_VIOLATION_SQL."""
+    now = now or datetime.now()
+    return (
+        person_id,
+        ", ".join(missing_ppe_list),
+        encode_missing(missing_ppe_list),
+        video_time,
+        now.strftime("%Y-%m-%d %H:%M:%S"),
+        now.strftime("%Y-%m-%d"),
+        source,
+        status
+    )
+
+
 def log_violation(person_id, missing_ppe_list, video_time,
                   source="Unknown", status="VIOLATION"):
     """
@@ -24,24 +48,13 @@ def log_violation(person_id, missing_ppe_list, video_time,
     conn = get_connection()
     c = conn.cursor()
 
-    now = datetime.now()
-    missing_str = ", ".join(missing_ppe_list)
-
     try:
-        c.execute("""
-        INSERT INTO violations
-        (person_id, missing_ppe, video_time, timestamp, date, source, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            person_id,
-            missing_str,
-            video_time,
-            now.strftime("%Y-%m-%d %H:%M:%S"),
-            now.strftime("%Y-%m-%d"),
-            source,
-            status
-        ))
-        conn.commit()
+        with metrics.timed("db_log"):
+            c.execute(INSERT_VIOLATION_SQL, violation_row(
+                person_id, missing_ppe_list, video_time, source, status
+            ))
+            conn.commit()
+        metrics.inc("ppe_violations_logged_total")
     except Exception as e:
         print("Violation logging error:", e)
     finally:
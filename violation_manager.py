@@ -1,51 +1,123 @@
 import time
+from collections import deque
+
+from track_state import TrackStateStore
 
 class ViolationManager:
-    def __init__(self, cooldown_seconds=3, log_once_per_session=True):
+    def __init__(self, cooldown_seconds=3, log_once_per_session=True, tracks=None, source=None):
         """
         Manages violation logging to prevent duplicates.
-        
+
+        Per-person state lives on the track (track_state.TrackState), in one
+        TrackStateStore per source, so cameras whose trackers hand out the same
+        IDs don't suppress each other.
+
         Args:
             cooldown_seconds: Minimum seconds between logs for same person/violation
             log_once_per_session: If True, log each person only once per session
+            tracks: TrackStateStore of the stream this manager serves (e.g.
+                    ComplianceState.tracks); its state is evicted with the track.
+                    Other sources get a store of their own, which nothing evicts.
+            source: Source the tracks store belongs to
         """
         self.cooldown = cooldown_seconds
         self.log_once_per_session = log_once_per_session
-        self.last_logged = {}  # key = (person_id, missing_tuple), value = timestamp
-        self.session_logged = set()  # person_ids already logged this session
+        self.tracks = tracks
+        self._stores = {} if tracks is None else {source: tracks}
+        # (expires_at, state, key) in logging order. The cooldown is the same
+        # for every key, so entries expire in the order they were added and the
+        # oldest are always at the front: expiring is O(1) amortized per entry.
+        self._expiry = deque()
 
-    def should_log(self, person_id, missing_items):
+    def should_log(self, person_id, missing_items, source=None, now=None):
         """
         Returns True only if violation should be logged.
-        
+
         In session mode: logs each person once per session
         In cooldown mode: logs after cooldown period expires
+
+        Args:
+            source: Camera/video the person was seen in
+            now: time.monotonic() value to use (saves a clock read per call)
         """
         if not missing_items:
             return False
 
+        if now is None:
+            now = time.monotonic()
+        state = self.store(source).touch(person_id)
+
         # Session-based: log each person only once
         if self.log_once_per_session:
-            if person_id in self.session_logged:
+            if state.logged:
                 return False
-            self.session_logged.add(person_id)
+            state.logged = True
             return True
-        
-        # Cooldown-based: log after cooldown expires
-        key = (person_id, tuple(sorted(missing_items)))
-        now = time.time()
 
-        if key not in self.last_logged:
-            self.last_logged[key] = now
-            return True
+        # Cooldown-based: log after cooldown expires. Expired entries are
+        # dropped first, so any entry still present is cooling down.
+        self._expire(now)
+        key = tuple(sorted(missing_items))
+        if state.cooldowns is None:
+            state.cooldowns = {}
+        elif key in state.cooldowns:
+            return False
 
-        if now - self.last_logged[key] >= self.cooldown:
-            self.last_logged[key] = now
-            return True
+        state.cooldowns[key] = now
+        self._expiry.append((now + self.cooldown, state, key))
+        return True
+
+    def should_log_many(self, violations, source=None, now=None):
+        """
+        Bulk should_log for every person in a frame.
 
-        return False
-    
-    def reset_session(self):
-        """Reset session-logged persons (for new video/session)."""
-        self.session_logged.clear()
-        self.last_logged.clear()
+        Args:
+            violations: Iterable of (person_id, missing_items)
+            source: Camera/video they were seen in
+
+        Returns:
+            List of bools, one per violation, in order.
+        """
+        if now is None:
+            now = time.monotonic()
+        return [
+            self.should_log(person_id, missing_items, source, now)
+            for person_id, missing_items in violations
+        ]
+
+    def store(self, source=None):
+        """TrackStateStore holding the state of a source (created if new)."""
+        store = self._stores.get(source)
+        if store is None:
+            store = self._stores[source] = TrackStateStore()
+        return store
+
+    def cooling_down(self):
+        """Number of (person, violation) cooldowns still running."""
+        return sum(len(state.cooldowns or ()) for store in self._stores.values()
+                   for state in store.states())
+
+    def _expire(self, now):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            _, state, key = expiry.popleft()
+            logged = state.cooldowns.get(key) if state.cooldowns else None
+            # Skip if the key was reset and logged again since this entry was queued
+            if logged is not None and logged + self.cooldown <= now:
+                del state.cooldowns[key]
+
+    def reset_session(self, source=None):
+        """
+        Reset session-logged persons (for new video/session).
+
+        Args:
+            source: Only reset this source (None = everything)
+        """
+        stores = self._stores.values() if source is None else [self.store(source)]
+        for store in stores:
+            for state in store.states():
+                state.logged = False
+                state.cooldowns = None
+        if source is None:
+            self._expiry.clear()
+        # Otherwise their queued expiry entries are skipped when they come due
@@ -0,0 +1,158 @@
+import atexit
+import queue
+import threading
+import time
+
+import metrics
+from database import get_connection
+from violation_logic import INSERT_VIOLATION_SQL, violation_row
+
+_STOP = object()
+
+
+class ViolationWriter:
+    def __init__(self, flush_interval=0.5, max_batch=256, max_queue=10000):
+        """
+        Writes violations to the database from a background thread so the
+        detection loop never waits on SQLite.
+
+        Events are grouped and inserted in one transaction per batch, so the
+        commit (and fsync) cost is paid once per batch instead of once per row.
+
+        Args:
+            flush_interval: Max seconds an event waits before its batch is written
+            max_batch: Max rows per transaction
+            max_queue: Max pending events; submit() blocks beyond this
+        """
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+        self._batch_ms_total = 0.0
+        self.last_event_latency_ms = 0.0
+        self.max_event_latency_ms = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="ppe-violation-writer", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def submit(self, person_id, missing_ppe_list, video_time,
+               source="Unknown", status="VIOLATION"):
+        """Queues a violation; same arguments as violation_logic.log_violation."""
+        if status != "VIOLATION":
+            return  # Do NOT log compliant workers
+        if self._thread is None:
+            self.start()
+        row = violation_row(person_id, missing_ppe_list, video_time, source, status)
+        self.queue.put((time.perf_counter(), row))
+
+    def flush(self):
+        """Blocks until every queued violation has been written."""
+        # Poll instead of queue.join() so a dead writer thread can't hang the caller
+        while (self.queue.unfinished_tasks and self._thread is not None
+               and self._thread.is_alive()):
+            time.sleep(0.01)
+
+    def stop(self):
+        """Writes everything still queued, then stops the writer thread."""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "errors": self.errors,
+            "last_batch_ms": self.last_batch_ms,
+            "avg_batch_ms": self._batch_ms_total / max(self.batches_written, 1),
+            "max_batch_ms": self.max_batch_ms,
+            "last_event_latency_ms": self.last_event_latency_ms,
+            "max_event_latency_ms": self.max_event_latency_ms,
+        }
+
+    def _run(self):
+        conn = get_connection()
+        try:
+            running = True
+            while running:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch = []
+                deadline = time.perf_counter() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        running = False
+                        self.queue.task_done()
+                        break
+                    batch.append(item)
+                    remaining = deadline - time.perf_counter()
+                    if len(batch) >= self.max_batch or remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._write(conn, batch)
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        t0 = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(INSERT_VIOLATION_SQL, [row for _, row in batch])
+        except Exception as e:
+            self.errors += 1
+            print("Violation logging error:", e)
+            return
+
+        done = time.perf_counter()
+        batch_ms = 1000 * (done - t0)
+        self.rows_written += len(batch)
+        self.batches_written += 1
+        self.last_batch_ms = batch_ms
+        self.max_batch_ms = max(self.max_batch_ms, batch_ms)
+        self._batch_ms_total += batch_ms
+        metrics.observe_stage("db_write", done - t0)
+        metrics.inc("ppe_violations_logged_total", len(batch))
+
+        oldest_ms = 1000 * (done - batch[0][0])
+        self.last_event_latency_ms = 1000 * (done - batch[-1][0])
+        self.max_event_latency_ms = max(self.max_event_latency_ms, oldest_ms)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_violation_writer():
+    """Process-wide writer, started on first use and flushed at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ViolationWriter().start()
+            atexit.register(_writer.stop)
+        return _writer